@@ -3,7 +3,27 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from scipy import stats
+from core.experiments import (
+    CONTROL_PATTERN, RESERVED_COLUMNS, two_proportion_ztest, analyze_experiments, stratified_analysis,
+    control_and_test, bayesian_ab, bayesian_experiments, bootstrap_ci, cuped_moments, cuped_test,
+    EventAggregator, SequentialMonitor, simulate_power
+)
+from core.profiling import stage
+from core.datastore import DatasetStore, read_upload
+
+
+@st.cache_data(show_spinner=False)
+def power_table(baselines, mdes, sample_sizes, n_sims=2000, alpha=0.05):
+    # Arayüzden anlık sorgular için önbelleğe alınmış güç tablosu
+    return simulate_power(list(baselines), list(mdes), list(sample_sizes), n_sims=n_sims, alpha=alpha)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def revenue_bootstrap(dataset_key, test_group, _revenue_a, _revenue_b, n_resamples=10000):
+    # Yeniden çalıştırmalarda bootstrap tekrarlanmaz; diziler hash'lenmez, anahtar yüklenen
+    # dosyanın içerik hash'i ve test grubudur
+    return bootstrap_ci(_revenue_a, _revenue_b, n_resamples=n_resamples)
+
 
 def run(lang='en'):
     content = {
@@ -49,7 +69,23 @@ def run(lang='en'):
         "simulator": {"en": "🎮 Interactive Simulator", "tr": "🎮 İnteraktif Simülatör"},
         "upload": {"en": "📂 Upload Your A/B Test Data", "tr": "📂 Kendi A/B Test Verinizi Yükleyin"},
         "results": {"en": "📊 Test Results", "tr": "📊 Test Sonuçları"},
-        "conclusion": {"en": "Conclusion", "tr": "Sonuç"}
+        "conclusion": {"en": "Conclusion", "tr": "Sonuç"},
+        "bootstrap": {"en": "💵 Revenue per Visitor (Bootstrap 95% CI)", "tr": "💵 Ziyaretçi Başına Gelir (Bootstrap %95 GA)"},
+        "bootstrap_groups": {
+            "en": "Revenue data needs a Group column with a control group (A / Control) and at least one test group.",
+            "tr": "Gelir verisinde kontrol grubu (A / Control) ve en az bir test grubu içeren Group sütunu olmalı."
+        },
+        "cuped": {"en": "📉 CUPED Variance Reduction", "tr": "📉 CUPED Varyans Azaltımı"},
+        "bayesian": {"en": "🎯 Bayesian Analysis (Beta-Binomial)", "tr": "🎯 Bayesçi Analiz (Beta-Binom)"},
+        "sequential": {"en": "🔁 Sequential Monitoring (mSPRT)", "tr": "🔁 Sıralı İzleme (mSPRT)"},
+        "sequential_note": {
+            "en": "The always-valid p-value stays correct no matter how often you check the results, so you can stop as soon as it drops below 0.05.",
+            "tr": "Her zaman geçerli p-değeri sonuçlara ne sıklıkla bakarsanız bakın doğru kalır; 0.05'in altına düştüğü anda testi durdurabilirsiniz."
+        },
+        "power_sim": {"en": "🎲 Monte Carlo Power Curve", "tr": "🎲 Monte Carlo Güç Eğrisi"},
+        "power_mde": {"en": "Minimum Detectable Effect (relative %)", "tr": "Minimum Tespit Edilebilir Etki (göreli %)"},
+        "stratified": {"en": "🧩 Stratified Analysis (per-slice Z-tests + Cochran–Mantel–Haenszel)", "tr": "🧩 Katmanlı Analiz (dilim bazlı Z-testleri + Cochran–Mantel–Haenszel)"},
+        "batch": {"en": "📚 Batch Experiment Analysis (Benjamini–Hochberg FDR)", "tr": "📚 Toplu Deney Analizi (Benjamini–Hochberg FDR)"}
     }
 
     with st.expander(content["summary"][lang], expanded=True):
@@ -67,7 +103,7 @@ def run(lang='en'):
     uploaded_file = st.file_uploader(
         content["upload"][lang],
         type=["csv"],
-        help="CSV format: group, conversions, visitors"
+        help="CSV format: Group, Visitors, Conversions (batch mode: Experiment, Variant, Visitors, Conversions; raw events: user_id, variant, event; revenue: Group, Revenue per user, optional Pre_Revenue for CUPED)"
     )
 
     # SİMÜLATÖR VEYA GERÇEK VERİ
@@ -102,23 +138,113 @@ def run(lang='en'):
     
     else:
         try:
-            df = pd.read_csv(uploaded_file)
+            with stage("ingest"):
+                df = read_upload(uploaded_file)
+            # Ham olay kaydı (user_id, variant, event) ise tekil kullanıcı sayımlarına dönüştür
+            if {'user_id', 'variant', 'event'}.issubset(df.columns):
+                with stage("event_aggregation"):
+                    df = EventAggregator().update(df).to_frame()
             st.success("✅ Data loaded!" if lang == 'en' else "✅ Veri yüklendi!")
-            df['Conversion_Rate'] = (df['Conversions'] / df['Visitors'] * 100).round(2)
+            if 'Visitors' in df.columns:
+                df['Conversion_Rate'] = (df['Conversions'] / df['Visitors'] * 100).round(2)
         except Exception as e:
             st.error(f"Error: {e}")
-            st.stop()
+            return
+
+        # KULLANICI BAZLI GELİR VERİSİ (Group, Revenue): BOOTSTRAP GÜVEN ARALIKLARI
+        if 'Revenue' in df.columns and 'Visitors' not in df.columns:
+            st.divider()
+            st.subheader(content["bootstrap"][lang])
+            groups = df['Group'] if 'Group' in df.columns else pd.Series(dtype=str)
+            is_control = groups.astype(str).str.contains(CONTROL_PATTERN, case=False, regex=True)
+            test_groups = groups[~is_control].dropna().unique()
+            if not is_control.any() or len(test_groups) == 0:
+                st.error(content["bootstrap_groups"][lang])
+                return
+            test_group = test_groups[0]
+            revenue_a = df.loc[is_control, 'Revenue'].to_numpy(dtype=float)
+            revenue_b = df.loc[groups == test_group, 'Revenue'].to_numpy(dtype=float)
+            with stage("bootstrap"):
+                boot = revenue_bootstrap(DatasetStore.content_key(uploaded_file.getvalue()), str(test_group),
+                                         revenue_a, revenue_b)
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("RPV (A)", f"₺{boot['Mean A']:,.2f}", help=f"95% CI: ₺{boot['CI A'][0]:,.2f} – ₺{boot['CI A'][1]:,.2f}")
+            col2.metric("RPV (B)", f"₺{boot['Mean B']:,.2f}", help=f"95% CI: ₺{boot['CI B'][0]:,.2f} – ₺{boot['CI B'][1]:,.2f}")
+            col3.metric("Uplift 95% CI", f"{boot['Uplift CI %'][0]:+.1f}% … {boot['Uplift CI %'][1]:+.1f}%")
+            col4.metric("p-value", f"{boot['p-value']:.4f}",
+                        delta="Significant ✅" if boot['p-value'] < 0.05 else "Not Significant ❌")
+
+            # CUPED: ön-dönem geliri (Pre_Revenue) varsa varyans azaltımlı test
+            if 'Pre_Revenue' in df.columns:
+                st.markdown("### " + content["cuped"][lang])
+                pre = df['Pre_Revenue'].to_numpy(dtype=float)
+                with stage("cuped"):
+                    cuped = cuped_test(
+                        cuped_moments(revenue_a, pre[is_control.to_numpy()]),
+                        cuped_moments(revenue_b, pre[(groups == test_group).to_numpy()])
+                    )
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Variance Reduction" if lang == 'en' else "Varyans Azalması", f"{cuped['Variance Reduction %']:.1f}%")
+                col2.metric("Diff (CUPED)" if lang == 'en' else "Fark (CUPED)", f"₺{cuped['Diff']:,.3f}",
+                            help=f"95% CI: ₺{cuped['Diff CI'][0]:,.3f} – ₺{cuped['Diff CI'][1]:,.3f}")
+                col3.metric("p-value (CUPED)", f"{cuped['p-value']:.4f}",
+                            delta="Significant ✅" if cuped['p-value'] < 0.05 else "Not Significant ❌")
+                col4.metric("Required N (CUPED)" if lang == 'en' else "Gerekli N (CUPED)",
+                            f"{cuped['Required N (CUPED)']:,.0f}",
+                            delta=f"{cuped['Required N (CUPED)'] - cuped['Required N']:,.0f}", delta_color="inverse")
+            return
+
+        # KATMANLI ANALİZ: Device, Country, User_Type gibi ek dilim sütunları içeren dosyalar
+        # Dilim sütunlarını kullanıcı seçer; varsayılan: metin/kategori sütunları (sayısal sütunlar dilim değildir)
+        candidates = [col for col in df.columns if col not in RESERVED_COLUMNS]
+        if candidates and 'Visitors' in df.columns:
+            st.divider()
+            st.subheader(content["stratified"][lang])
+            strata = st.multiselect(
+                "Slice columns" if lang == 'en' else "Dilim sütunları", candidates,
+                default=[col for col in candidates if not pd.api.types.is_numeric_dtype(df[col])],
+                key="ab_strata"
+            )
+            if strata:
+                try:
+                    with stage("stratified_analysis"):
+                        stratified = stratified_analysis(df, strata)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+                    return
+                st.dataframe(stratified, use_container_width=True, hide_index=True)
+                return
+
+        # TOPLU ANALİZ: birden fazla deney (Experiment sütunu) içeren dosyalar
+        if 'Experiment' in df.columns:
+            st.divider()
+            st.subheader(content["batch"][lang])
+            with stage("batch_analysis"):
+                batch = analyze_experiments(df)
+                posterior = bayesian_experiments(df)
+                batch[['P(B > A)', 'Expected Loss (B)']] = posterior[['P(B > A)', 'Expected Loss (B)']].to_numpy()
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Experiments" if lang == 'en' else "Deney Sayısı", f"{batch['Experiment'].nunique():,}")
+            col2.metric("Comparisons" if lang == 'en' else "Karşılaştırma", f"{len(batch):,}")
+            col3.metric("Significant (FDR 5%)" if lang == 'en' else "Anlamlı (FDR %5)", f"{int(batch['Significant'].sum()):,}")
+            st.dataframe(batch, use_container_width=True, hide_index=True)
+            return
 
     # İSTATİSTİKSEL TEST
     st.divider()
     st.subheader(content["results"][lang])
 
+    # Kontrol: "A" / "Control" ile başlayan varyant; test: aynı deneydeki ilk diğer varyant
+    try:
+        control, test = control_and_test(df)
+    except ValueError as e:
+        st.error(f"Error: {e}")
+        return
+
     # Metrikler
     col1, col2, col3, col4 = st.columns(4)
     
-    control = df[df['Group'].str.contains('A|Control', case=False, na=False)].iloc[0]
-    test = df[df['Group'].str.contains('B|Test', case=False, na=False)].iloc[0]
-    
     col1.metric("Control CVR", f"{control['Conversion_Rate']:.2f}%")
     col2.metric("Test CVR", f"{test['Conversion_Rate']:.2f}%")
     
@@ -130,42 +256,43 @@ def run(lang='en'):
     p1, p2 = control['Conversions']/n1, test['Conversions']/n2
     
     p_pool = (control['Conversions'] + test['Conversions']) / (n1 + n2)
-    se = np.sqrt(p_pool * (1 - p_pool) * (1/n1 + 1/n2))
-    z_score = (p2 - p1) / se
-    p_value = 2 * (1 - stats.norm.cdf(abs(z_score)))
+    with stage("ztest"):
+        z_score, p_value = two_proportion_ztest(control['Conversions'], n1, test['Conversions'], n2)
     
     col4.metric("p-value", f"{p_value:.4f}", 
                 delta="Significant ✅" if p_value < 0.05 else "Not Significant ❌")
 
     # GÖRSELLEŞTİRME
-    fig = go.Figure()
+    with stage("figure_build"):
+        fig = go.Figure()
     
-    fig.add_trace(go.Bar(
-        name='Control (A)',
-        x=['Conversion Rate'],
-        y=[control['Conversion_Rate']],
-        marker_color='#636EFA',
-        text=[f"{control['Conversion_Rate']:.2f}%"],
-        textposition='auto'
-    ))
+        fig.add_trace(go.Bar(
+            name='Control (A)',
+            x=['Conversion Rate'],
+            y=[control['Conversion_Rate']],
+            marker_color='#636EFA',
+            text=[f"{control['Conversion_Rate']:.2f}%"],
+            textposition='auto'
+        ))
     
-    fig.add_trace(go.Bar(
-        name='Test (B)',
-        x=['Conversion Rate'],
-        y=[test['Conversion_Rate']],
-        marker_color='#00CC96' if p_value < 0.05 else '#EF553B',
-        text=[f"{test['Conversion_Rate']:.2f}%"],
-        textposition='auto'
-    ))
+        fig.add_trace(go.Bar(
+            name='Test (B)',
+            x=['Conversion Rate'],
+            y=[test['Conversion_Rate']],
+            marker_color='#00CC96' if p_value < 0.05 else '#EF553B',
+            text=[f"{test['Conversion_Rate']:.2f}%"],
+            textposition='auto'
+        ))
     
-    fig.update_layout(
-        title="Conversion Rate Comparison" if lang == 'en' else "Dönüşüm Oranı Karşılaştırması",
-        barmode='group',
-        height=400,
-        showlegend=True
-    )
+        fig.update_layout(
+            title="Conversion Rate Comparison" if lang == 'en' else "Dönüşüm Oranı Karşılaştırması",
+            barmode='group',
+            height=400,
+            showlegend=True
+        )
     
-    st.plotly_chart(fig, use_container_width=True)
+    with stage("figure_render"):
+        st.plotly_chart(fig, use_container_width=True)
 
     # SONUÇ YORUMLAMA
     st.divider()
@@ -210,6 +337,40 @@ def run(lang='en'):
             - **Gerekli Örnek Boyutu:** Minimum gerekli örnek için güç analizi yap
             """)
 
+    # BAYESÇİ ANALİZ
+    st.divider()
+    st.markdown("### " + content["bayesian"][lang])
+    with stage("bayesian"):
+        posterior = bayesian_ab(control['Conversions'], n1, test['Conversions'], n2).iloc[0]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("P(B > A)", f"{posterior['P(B > A)'] * 100:.1f}%")
+    col2.metric("Expected Loss (B)" if lang == 'en' else "Beklenen Kayıp (B)", f"{posterior['Expected Loss (B)'] * 100:.3f}pp")
+    col3.metric("95% CI (A)" if lang == 'en' else "%95 GA (A)",
+                f"{posterior['CI A Low'] * 100:.2f}–{posterior['CI A High'] * 100:.2f}%")
+    col4.metric("95% CI (B)" if lang == 'en' else "%95 GA (B)",
+                f"{posterior['CI B Low'] * 100:.2f}–{posterior['CI B High'] * 100:.2f}%")
+
+    # SIRALI İZLEME (mSPRT)
+    st.divider()
+    st.markdown("### " + content["sequential"][lang])
+    # İzleyici oturumda saklanır: her yeniden çalıştırma bir bakıştır, sadece yeni gelen sayımlar
+    # (toplamlardaki artış) eklenir. Toplamlar azalırsa yeni bir deney sayılır ve izleyici sıfırlanır.
+    # Karışım genişliği: kontrol oranının %10'u kadar göreli etki beklentisi
+    with stage("sequential"):
+        totals = np.array([n1, control['Conversions'], n2, test['Conversions']], dtype=float)
+        monitor = st.session_state.get("ab_monitor")
+        if monitor is None or len(monitor.counts) == 0 or np.any(totals < monitor.counts[0]):
+            monitor = SequentialMonitor(alpha=0.05, tau=max(0.1 * p1, 0.001))
+            st.session_state["ab_monitor"] = monitor
+        added = totals - monitor.counts[0] if len(monitor.counts) else totals
+        if len(monitor.counts) == 0 or added.any():
+            monitor.update(['current'], *([value] for value in added))
+        seq_p = monitor.p_value[0]
+    col1, col2 = st.columns(2)
+    col1.metric("Always-valid p (mSPRT)", f"{seq_p:.4f}",
+                delta="Stop ✅" if seq_p < 0.05 else "Continue ⏳")
+    col2.markdown(content["sequential_note"][lang])
+
     # GÜÇ ANALİZİ
     st.divider()
     st.markdown("### " + ("📐 Power Analysis" if lang == 'en' else "📐 Güç Analizi"))
@@ -235,3 +396,26 @@ def run(lang='en'):
         - Mevcut örnek: Kontrol={n1:,}, Test={n2:,}
         - {effect_size*100:.2f}pp farkı %80 güç ve %95 güvenle tespit etmek için
         """)
+
+    # SİMÜLASYON TABANLI GÜÇ EĞRİSİ
+    with st.expander(content["power_sim"][lang], expanded=False):
+        relative_mde = st.slider(content["power_mde"][lang], 1, 50, 10) / 100
+        baseline = round(float(p1), 4)
+        sizes = tuple(int(x) for x in np.unique(np.geomspace(500, 200000, 25).round(-2)))
+        with stage("power_simulation"):
+            table = power_table((baseline,), (relative_mde,), sizes)
+        with stage("figure_build"):
+            fig_power = px.line(table, x='N', y='Power', log_x=True, markers=True,
+                                labels={'N': 'Visitors per group' if lang == 'en' else 'Grup başına ziyaretçi'})
+            fig_power.add_hline(y=0.8, line_dash="dash", line_color="green")
+            fig_power.update_layout(height=350, yaxis_range=[0, 1])
+        with stage("figure_render"):
+            st.plotly_chart(fig_power, use_container_width=True)
+        reached = table.loc[table['Power'] >= 0.8, 'N']
+        st.caption(
+            (f"Empirical 80% power reached at ~{int(reached.iloc[0]):,} visitors per group" if lang == 'en'
+             else f"Deneysel %80 güce grup başına ~{int(reached.iloc[0]):,} ziyaretçide ulaşılıyor")
+            if len(reached) else
+            ("80% power not reached within 200,000 visitors per group" if lang == 'en'
+             else "Grup başına 200.000 ziyaretçiye kadar %80 güce ulaşılamıyor")
+        )
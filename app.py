@@ -1,8 +1,64 @@
+import importlib
+import os
+import sys
+import threading
+import time
 import streamlit as st
-import demand_forecasting
-import clv_model
-import pricing_model
-import ab_test_simulator
+from core.profiling import env_enabled, enable_logging, start_trace, current_trace, logger
+from core.governor import get_governor
+
+# Analiz modülleri ve ağır bağımlılıkları sadece ilgili menü seçildiğinde yüklenir
+MODULE_DEPS = {
+    "demand_forecasting": ["pandas", "plotly.graph_objects", "xgboost", "sklearn.metrics"],
+    "clv_model": ["pandas", "plotly.express", "sklearn.cluster", "sklearn.preprocessing", "scipy.optimize"],
+    "pricing_model": ["pandas", "plotly.express", "sklearn.ensemble"],
+    "ab_test_simulator": ["pandas", "plotly.express", "scipy.stats"]
+}
+
+
+@st.cache_resource
+def import_times():
+    # Süreç boyunca ölçülen ilk yükleme süreleri (saniye)
+    return {}
+
+
+def load_module(name):
+    times = import_times()
+    for dep in MODULE_DEPS.get(name, []) + [name]:
+        if dep not in sys.modules:
+            start = time.perf_counter()
+            importlib.import_module(dep)
+            times[dep] = time.perf_counter() - start
+    return sys.modules[name]
+
+
+def _warm_demo_models():
+    # Demo verileriyle eğitilen modeller kayıttan yüklenir (yoksa eğitilip kaydedilir).
+    # Sayfalar aynı veri + parametrelerle çağırdığı için ilk görüntülemede eğitim beklenmez
+    from core import registry
+    if not registry.enabled():
+        return
+    from core.forecasting import generate_synthetic_data, process_data, train_forecast
+    from core.segmentation import generate_rfm_data, cluster_rfm
+    from core.valuation import DISTRICTS, generate_market_data, train_valuation
+
+    for warm in (lambda: train_forecast(process_data(generate_synthetic_data()), cache=True),
+                 lambda: cluster_rfm(generate_rfm_data(), cache=True),
+                 lambda: train_valuation(generate_market_data(DISTRICTS), cache=True)):
+        try:
+            warm()
+        except Exception as e:
+            logger.warning("Model pre-warm failed: %s", e, exc_info=True)
+
+
+@st.cache_resource
+def prewarm_models():
+    # Süreç başına bir kez, arka planda (ilk sayfa çizimini bekletmez).
+    # Ağır kütüphaneleri hemen yüklediği için varsayılan olarak kapalı: PORTFOLIO_PREWARM_MODELS=1
+    thread = threading.Thread(target=_warm_demo_models, name="model-prewarm", daemon=True)
+    thread.start()
+    return thread
+
 
 # Sayfa Ayarları
 st.set_page_config(
@@ -10,6 +66,8 @@ st.set_page_config(
     page_icon="📊",
     layout="wide"
 )
+if os.environ.get("PORTFOLIO_PREWARM_MODELS", "0") == "1":
+    prewarm_models()
 
 # --- DİL AYARLARI (SESSION STATE) ---
 if 'lang' not in st.session_state:
@@ -58,6 +116,13 @@ with st.sidebar:
     st.info(
         f"**{contact}:**\n\n🔗 [LinkedIn](https://www.linkedin.com/in/ulasaksac/)\n💻 [GitHub](https://github.com/Salu-mov)")
 
+    # 4. Performans izleme (kapalıyken ölçüm yapılmaz)
+    debug = st.toggle("🐞 " + ("Performans İzleme" if lang == 'tr' else "Performance Debug"), value=env_enabled())
+
+if debug:
+    enable_logging()
+start_trace(selection, enabled=debug)
+
 # --- İÇERİK YÖNETİMİ ---
 
 # A) ANA SAYFA (HOME)
@@ -415,14 +480,87 @@ if selection in ["🏠 Ana Sayfa", "🏠 Home"]:
 
 # B) MODÜL ÇAĞRILARI
 elif selection in ["📈 Talep Tahmini (Yapay Zeka)", "📈 Demand Forecasting (AI)"]:
-    demand_forecasting.run(lang)
+    load_module("demand_forecasting").run(lang)
 
 elif selection in ["🛍️ Müşteri Analizi (CLV)", "🛍️ Customer Analysis (CLV)"]:
-    clv_model.run(lang)
+    load_module("clv_model").run(lang)
 
 elif selection in ["💰 Gayrimenkul Değerleme", "💰 Real Estate Valuation"]:
-    pricing_model.run(lang)
+    load_module("pricing_model").run(lang)
 
 elif selection in ["🧪 A/B Test Analizi", "🧪 A/B Test Analyzer"]:
-    ab_test_simulator.run(lang)
+    load_module("ab_test_simulator").run(lang)
+
+# --- YÜKLEME SÜRELERİ RAPORU ---
+# Sayfa modülü yüklendikten sonra çizilir, böylece bu çalıştırmadaki ölçümler de görünür
+with st.sidebar:
+    with st.expander("⏱️ " + ("Modül Yükleme Süreleri" if lang == 'tr' else "Module Import Times"), expanded=False):
+        times = import_times()
+        if times:
+            for dep, seconds in sorted(times.items(), key=lambda item: -item[1]):
+                st.caption(f"`{dep}` — {seconds * 1000:,.0f} ms")
+            st.caption(("Toplam" if lang == 'tr' else "Total") + f": {sum(times.values()):.2f} s")
+        else:
+            st.caption("Henüz analiz modülü yüklenmedi." if lang == 'tr' else "No analysis module loaded yet.")
+
+# --- AŞAMA SÜRELERİ (DEBUG) ---
+trace = current_trace()
+if trace is not None:
+    with st.sidebar:
+        with st.expander("🐞 " + ("Aşama Süreleri" if lang == 'tr' else "Stage Timings"), expanded=True):
+            if trace.records:
+                # Kayıtlar aşama bitişinde eklenir; başlangıç sırasına göre, iç içe aşamalar girintili
+                st.dataframe([{
+                    'Stage': "\u2003" * r['depth'] + r['stage'],
+                    'Wall ms': r['wall_ms'],
+                    'CPU ms': r['cpu_ms'],
+                    'Mem Δ MB': r['mem_delta_mb']
+                } for r in sorted(trace.records, key=lambda r: r['start_ms'])], hide_index=True)
+                st.caption(("Toplam" if lang == 'tr' else "Total") + f": {trace.total_ms():,.0f} ms")
+                st.download_button(
+                    "⬇️ Trace (chrome://tracing)", trace.to_chrome_trace(),
+                    file_name="trace.json", mime="application/json"
+                )
+            else:
+                st.caption("Bu sayfada ölçülen aşama yok." if lang == 'tr' else "No instrumented stages on this page.")
+
+        # CPU bütçesi: ağır görevlere verilen iş parçacığı sayıları (tüm oturumlar)
+        with st.expander("🧮 " + ("CPU Dağıtımı" if lang == 'tr' else "CPU Governor"), expanded=False):
+            gov = get_governor().snapshot()
+            st.caption(
+                f"Budget: {gov['budget']} threads · Max heavy jobs: {gov['max_heavy']} · "
+                f"Active: {gov['active_tasks']} ({gov['active_threads']} threads) · Waiting: {gov['waiting_tasks']} · "
+                f"Load: {gov['load']} · "
+                f"Reserved: {sum(gov['reserved_threads'].values())}"
+            )
+            recent = get_governor().recent()
+            if recent:
+                st.dataframe([{
+                    'Task': r['task'], 'PID': r['pid'], 'Threads': r['threads'], 'Concurrent': r['concurrent'],
+                    'Wait ms': r['wait_ms'], 'Run ms': r['run_ms']
+                } for r in reversed(recent)], hide_index=True)
+
+        # Model kaydı: diskteki modeller ve bu süreçte yüklü olanlar
+        with st.expander("🗂️ " + ("Model Kaydı" if lang == 'tr' else "Model Registry"), expanded=False):
+            from core.registry import get_registry
+            models = get_registry()
+            loaded = {key for _, key in models.loaded()}
+            entries = models.entries()
+            if entries:
+                st.dataframe([{
+                    'Kind': m['kind'], 'Key': m['key'][:10], 'Rows': m.get('rows'),
+                    'Loaded': m['key'] in loaded,
+                    'Created': time.strftime('%Y-%m-%d %H:%M', time.localtime(m['created_at']))
+                } for m in reversed(entries)], hide_index=True)
+                st.caption(f"`{models.root}`")
+            else:
+                st.caption("Kayıtlı model yok." if lang == 'tr' else "No registered models.")
 
+        # Şekil önbelleği: tüm oturumlarda yeniden kurulmadan gönderilen Plotly şekilleri
+        with st.expander("🖼️ " + ("Şekil Önbelleği" if lang == 'tr' else "Figure Cache"), expanded=False):
+            from core.figures import get_figure_cache
+            fig_stats = get_figure_cache().stats()
+            st.caption(
+                f"Entries: {fig_stats['entries']} · {fig_stats['bytes'] / 2**20:.1f} / "
+                f"{fig_stats['budget_bytes'] / 2**20:.0f} MB · Hits: {fig_stats['hits']} · Misses: {fig_stats['misses']}"
+            )
@@ -0,0 +1,237 @@
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from core.memory import lean_frame
+
+# Dört boru hattını farklı veri ölçeklerinde zamanlar; sonuçlar sürümler arası karşılaştırma için JSON'a yazılır
+# Örnek: python benchmark.py --sizes 1000 100000 --output bench.json --compare baseline.json
+# --memory both: her durum varsayılan ve düşük bellek modunda (core.memory) ayrı ayrı ölçülür
+
+PIPELINES = ['forecast', 'valuation', 'segmentation', 'abtest']
+MEMORY_MODES = ['default', 'lean']
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+# --- ÖLÇEKLENEBİLİR VERİ ÜRETİCİLERİ ---
+def synthetic_sales(n, seed=42):
+    rng = np.random.default_rng(seed)
+    steps = np.linspace(0, 1, n)
+    sales = 100 + 50 * steps + 20 * np.sin(3 * np.pi * steps) + rng.normal(0, 10, n)
+    # Günlük frekans 10M satırda pandas tarih aralığını aşar; dakika frekansı kullanılır
+    dates = pd.date_range('2023-01-01', periods=n, freq='min')
+    return pd.DataFrame({'Date': dates, 'Sales': np.maximum(sales, 0)})
+
+
+def synthetic_rfm(n, seed=42):
+    rng = np.random.default_rng(seed)
+    centers = np.array([[15, 35, 5000], [15, 3, 500], [230, 5, 1000], [60, 10, 2000]])
+    spread = np.array([8, 5, 1000])
+    labels = rng.integers(0, len(centers), n)
+    values = np.abs(centers[labels] + rng.normal(0, 1, (n, 3)) * spread)
+    return pd.DataFrame(values, columns=['Recency', 'Frequency', 'Monetary'])
+
+
+def synthetic_experiments(n, seed=42):
+    # n satır: her deneyde bir kontrol ve iki test varyantı
+    rng = np.random.default_rng(seed)
+    variants = np.array(['A', 'B', 'C'])
+    visitors = rng.integers(1_000, 50_000, n)
+    rates = rng.uniform(0.02, 0.08, n)
+    return pd.DataFrame({
+        'Experiment': np.arange(n) // 3,
+        'Variant': variants[np.arange(n) % 3],
+        'Visitors': visitors,
+        'Conversions': rng.binomial(visitors, rates)
+    })
+
+
+# --- BORU HATLARI (her biri aşama adı -> fonksiyon sırası) ---
+def stages_forecast(n):
+    from core.forecasting import process_data, train_forecast
+    state = {}
+    return [
+        ('generate', lambda: state.update(df=lean_frame(synthetic_sales(n)))),
+        ('process_data', lambda: state.update(df=process_data(state['df']))),
+        ('train_predict', lambda: train_forecast(state['df']))
+    ]
+
+
+def stages_valuation(n):
+    from core.valuation import generate_market_data, train_valuation, value_properties
+    state = {}
+    return [
+        ('generate_market_data', lambda: state.update(df=lean_frame(generate_market_data(n_samples=n)))),
+        ('train', lambda: state.update(fit=train_valuation(state['df']))),
+        ('predict', lambda: value_properties(state['fit'][0], state['fit'][1], state['df']))
+    ]
+
+
+def stages_segmentation(n):
+    from core.segmentation import cluster_rfm
+    state = {}
+    return [
+        ('generate', lambda: state.update(df=lean_frame(synthetic_rfm(n)))),
+        ('scale_kmeans_silhouette', lambda: cluster_rfm(state['df']))
+    ]
+
+
+def stages_abtest(n):
+    from core.experiments import analyze_experiments
+    state = {}
+    return [
+        ('generate', lambda: state.update(df=lean_frame(synthetic_experiments(n)))),
+        ('ztest_bh', lambda: analyze_experiments(state['df']))
+    ]
+
+
+STAGES = {
+    'forecast': stages_forecast,
+    'valuation': stages_valuation,
+    'segmentation': stages_segmentation,
+    'abtest': stages_abtest
+}
+
+
+def _run_case(pipeline, n, queue, memory_mode):
+    # Ayrı süreçte çalışır: bellek tepe değerleri diğer ölçümlerden etkilenmez
+    os.environ["PORTFOLIO_LEAN_MEMORY"] = "1" if memory_mode == 'lean' else "0"
+    stages = STAGES[pipeline](n)
+    timings = {}
+    tracemalloc.start()
+    for name, stage in stages:
+        start = time.perf_counter()
+        stage()
+        timings[name] = round(time.perf_counter() - start, 4)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Linux'ta ru_maxrss KB cinsinden
+    queue.put({
+        'stages': timings,
+        'seconds': round(sum(timings.values()), 4),
+        'peak_traced_mb': round(traced_peak / 2**20, 1),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    })
+
+
+def run_case(pipeline, n, timeout, memory_mode='default'):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(pipeline, n, queue, memory_mode))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+        status = 'ok'
+    except Exception:
+        result = {}
+        status = 'timeout' if process.is_alive() else 'error'
+        process.terminate()
+    process.join()
+    return {'pipeline': pipeline, 'rows': n, 'memory_mode': memory_mode, 'status': status, **result}
+
+
+def environment():
+    import sklearn
+    import xgboost
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__,
+                     'scikit-learn': sklearn.__version__, 'xgboost': xgboost.__version__}
+    }
+
+
+def compare(results, baseline_path):
+    # Aynı (pipeline, rows) çiftleri için süre ve bellek oranları (>1: yavaşlama)
+    with open(baseline_path) as f:
+        baseline = {(r['pipeline'], r['rows'], r.get('memory_mode', 'default')): r
+                    for r in json.load(f)['results'] if r['status'] == 'ok'}
+    rows = []
+    for r in results:
+        base = baseline.get((r['pipeline'], r['rows'], r['memory_mode']))
+        if r['status'] != 'ok' or base is None:
+            continue
+        rows.append({
+            'pipeline': r['pipeline'], 'rows': r['rows'], 'memory_mode': r['memory_mode'],
+            'seconds': r['seconds'], 'baseline_s': base['seconds'],
+            'time_ratio': round(r['seconds'] / max(base['seconds'], 1e-9), 2),
+            'rss_ratio': round(r['peak_rss_mb'] / max(base['peak_rss_mb'], 1e-9), 2)
+        })
+    return pd.DataFrame(rows)
+
+
+def compare_memory(results):
+    # Aynı çalıştırmadaki varsayılan ve düşük bellek modu tepe değerleri (öncesi / sonrası)
+    lean = {(r['pipeline'], r['rows']): r for r in results if r['status'] == 'ok' and r['memory_mode'] == 'lean'}
+    rows = []
+    for r in results:
+        after = lean.get((r['pipeline'], r['rows']))
+        if r['status'] != 'ok' or r['memory_mode'] != 'default' or after is None:
+            continue
+        rows.append({
+            'pipeline': r['pipeline'], 'rows': r['rows'],
+            'traced_mb': r['peak_traced_mb'], 'lean_traced_mb': after['peak_traced_mb'],
+            'rss_mb': r['peak_rss_mb'], 'lean_rss_mb': after['peak_rss_mb'],
+            'traced_ratio': round(after['peak_traced_mb'] / max(r['peak_traced_mb'], 1e-9), 2),
+            'seconds': r['seconds'], 'lean_seconds': after['seconds']
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory benchmark for the four pipelines.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Row counts to benchmark")
+    parser.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=PIPELINES)
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds per case; larger sizes are skipped after a timeout")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="Earlier JSON result to compare against")
+    parser.add_argument('--memory', choices=MEMORY_MODES + ['both'], default='default',
+                        help="Run in default and/or memory-lean (float32/int32/categorical) mode")
+    args = parser.parse_args(argv)
+    modes = MEMORY_MODES if args.memory == 'both' else [args.memory]
+
+    results = []
+    for pipeline in args.pipelines:
+        for mode in modes:
+            exceeded = False
+            for n in sorted(args.sizes):
+                if exceeded:
+                    result = {'pipeline': pipeline, 'rows': n, 'memory_mode': mode, 'status': 'skipped'}
+                else:
+                    result = run_case(pipeline, n, args.timeout, mode)
+                    exceeded = result['status'] != 'ok'
+                results.append(result)
+                print(json.dumps(result), flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Saved {len(results)} results to {args.output}")
+
+    if args.memory == 'both':
+        print(compare_memory(results).to_string(index=False))
+    if args.compare:
+        print(compare(results, args.compare).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+from core.memory import lean_frame
+
+# Streamlit'ten bağımsız toplu çalıştırma: her girdi dosyası ayrı bir süreçte işlenir
+# Örnek: python cli.py forecast data/*.csv --out results/ --workers 8
+
+
+def _output_path(out_dir, path, suffix):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, f"{stem}_{suffix}.csv")
+
+
+def run_forecast(path, out_dir, options):
+    from core.forecasting import process_data, train_forecast
+
+    df = process_data(lean_frame(pd.read_csv(path)))
+    forecast = train_forecast(df, train_ratio=options['train_ratio'])
+    test_dates = df['Date'].iloc[forecast['split_point']:]
+    pd.DataFrame({
+        'Date': test_dates.to_numpy(),
+        'Actual': forecast['y_test'].to_numpy(),
+        'Forecast': forecast['predictions']
+    }).to_csv(_output_path(out_dir, path, 'forecast'), index=False)
+    return {**forecast['metrics'], 'reorder_point': float(forecast['reorder_point'])}
+
+
+def run_segment(path, out_dir, options):
+    from core.segmentation import RFM_COLUMNS, cluster_rfm
+
+    df = lean_frame(pd.read_csv(path))
+    df, silhouette_avg, _ = cluster_rfm(df, n_clusters=options['clusters'])
+    df.to_csv(_output_path(out_dir, path, 'segments'), index=False)
+    summary = df.groupby('Segment')[RFM_COLUMNS].mean().round(2)
+    summary['Count'] = df.groupby('Segment').size()
+    return {'silhouette': float(silhouette_avg), 'segments': summary['Count'].to_dict()}
+
+
+def run_value(path, out_dir, options):
+    from core.valuation import value_properties
+
+    model, columns = _VALUATION_MODEL
+    df = lean_frame(pd.read_csv(path))
+    df['Estimated_Price'] = value_properties(model, columns, df)
+    df['Unit_Price'] = df['Estimated_Price'] / df['Size']
+    df.to_csv(_output_path(out_dir, path, 'valuation'), index=False)
+    return {'rows': len(df), 'mean_price': float(df['Estimated_Price'].mean())}
+
+
+def run_abtest(path, out_dir, options):
+    from core.experiments import analyze_experiments
+
+    df = lean_frame(pd.read_csv(path))
+    if 'Experiment' not in df.columns:
+        df.insert(0, 'Experiment', os.path.splitext(os.path.basename(path))[0])
+    result = analyze_experiments(df, alpha=options['alpha'])
+    result.to_csv(_output_path(out_dir, path, 'abtest'), index=False)
+    return {'comparisons': len(result), 'significant': int(result['Significant'].sum())}
+
+
+COMMANDS = {
+    'forecast': run_forecast,
+    'segment': run_segment,
+    'value': run_value,
+    'abtest': run_abtest
+}
+
+# Değerleme modeli ana süreçte bir kez eğitilir, işçilere başlatıcı ile aktarılır
+_VALUATION_MODEL = None
+
+
+def _init_worker(valuation_model, cpu_budget=None):
+    global _VALUATION_MODEL
+    _VALUATION_MODEL = valuation_model
+    if cpu_budget is not None:
+        # Her işçi çekirdeklerin kendi payını kullanır (süreç x iş parçacığı aşırı paylaşımı olmaz)
+        from core import governor
+        governor.configure(budget=cpu_budget, max_heavy=1)
+
+
+def _run_job(job):
+    command, path, out_dir, options = job
+    start = time.perf_counter()
+    try:
+        result = COMMANDS[command](path, out_dir, options)
+        status = 'ok'
+    except Exception as e:
+        result = {'error': str(e)}
+        status = 'error'
+    return {'file': path, 'status': status, 'seconds': round(time.perf_counter() - start, 3), **result}
+
+
+def _train_valuation_model(train_path):
+    from core.valuation import PROPERTY_COLUMNS, generate_market_data, train_valuation
+
+    df = pd.read_csv(train_path) if train_path else generate_market_data()
+    # Sadece ilan özellikleri (ör. Date sütunu modele girmez; sayfadaki eğitimle aynı)
+    model, columns, _ = train_valuation(df[PROPERTY_COLUMNS + ['Price']])
+    return model, columns
+
+
+def _report(results):
+    failed = 0
+    for result in results:
+        failed += result['status'] != 'ok'
+        print(json.dumps(result, default=str), flush=True)
+    return failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch runner for the portfolio pipelines (no Streamlit needed).")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(p):
+        p.add_argument('inputs', nargs='+', help="Input CSV files")
+        p.add_argument('--out', default='results', help="Output directory")
+        p.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+
+    p = sub.add_parser('forecast', help="XGBoost demand forecast per file (Date, Sales)")
+    add_common(p)
+    p.add_argument('--train-ratio', type=float, default=0.8)
+
+    p = sub.add_parser('segment', help="RFM K-Means segmentation per file (Recency, Frequency, Monetary)")
+    add_common(p)
+    p.add_argument('--clusters', type=int, default=4)
+
+    p = sub.add_parser('value', help="Property valuation per file (District, Size, Age, Rooms)")
+    add_common(p)
+    p.add_argument('--train', default=None, help="Training CSV with Price column (default: synthetic Istanbul data)")
+
+    p = sub.add_parser('abtest', help="Z-tests per file (Group/Variant, Visitors, Conversions[, Experiment])")
+    add_common(p)
+    p.add_argument('--alpha', type=float, default=0.05)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.out, exist_ok=True)
+    options = {k: v for k, v in vars(args).items() if k not in ('command', 'inputs', 'out', 'workers')}
+
+    valuation_model = _train_valuation_model(args.train) if args.command == 'value' else None
+    jobs = [(args.command, path, args.out, options) for path in args.inputs]
+
+    workers = max(1, min(args.workers or 1, len(jobs)))
+    if workers == 1:
+        _init_worker(valuation_model)
+        failed = _report(map(_run_job, jobs))
+    else:
+        cpu_budget = max(1, (os.cpu_count() or 1) // workers)
+        with Pool(workers, initializer=_init_worker, initargs=(valuation_model, cpu_budget)) as pool:
+            failed = _report(pool.imap_unordered(_run_job, jobs))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import io
+import os
+import tempfile
+import zipfile
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
+from core.segmentation import (
+    RFM_COLUMNS, RENDER_POINT_BUDGET, ACTIONS, generate_rfm_data, cluster_rfm, bin_rfm_3d, sample_rfm,
+    predict_clv, build_rfm_sketches, score_rfm, segment_snapshot, segment_migration, export_segments
+)
+from core.profiling import stage
+from core.datastore import read_upload
+from core.figures import get_figure_cache
+from ui_helpers import run_job, render_payload
 
 def run(lang='en'):
     content = {
@@ -39,6 +48,7 @@ def run(lang='en'):
             3. **K-Means Clustering** → Unsupervised learning to find 4 natural customer groups
             4. **Segment Labeling** → Assign business-friendly names based on spending patterns
             5. **Action Planning** → Tailored marketing strategies per segment
+            6. **Probabilistic CLV** → BG/NBD (expected purchases) + Gamma-Gamma (expected order value)
             
             **Use Case:** Upload your own customer data (columns: Recency, Frequency, Monetary) to segment your audience.
             """,
@@ -50,6 +60,7 @@ def run(lang='en'):
             3. **K-Means Kümeleme** → Denetimsiz öğrenme ile 4 doğal müşteri grubu bul
             4. **Segment İsimlendirme** → Harcama paternlerine göre iş dostu isimler ver
             5. **Aksiyon Planı** → Her segment için özel pazarlama stratejileri
+            6. **Olasılıksal CLV** → BG/NBD (beklenen alım sayısı) + Gamma-Gamma (beklenen sipariş değeri)
             
             **Kullanım:** Kendi müşteri verinizi yükleyin (sütunlar: Recency, Frequency, Monetary) ve kitlenizi segmentlere ayırın.
             """
@@ -64,8 +75,27 @@ def run(lang='en'):
             "tr": {'Recency': 'Yenilik', 'Frequency': 'Sıklık', 'Monetary': 'Harcama'}
         },
         "upload_label": {"en": "📂 Upload Your Customer Data (CSV)", "tr": "📂 Müşteri Verinizi Yükleyin (CSV)"},
-        "upload_help": {"en": "Required columns: Recency, Frequency, Monetary", "tr": "Gerekli sütunlar: Recency, Frequency, Monetary"},
+        "upload_help": {"en": "Required columns: Recency, Frequency, Monetary (optional: T = customer age in days)", "tr": "Gerekli sütunlar: Recency, Frequency, Monetary (opsiyonel: T = gün cinsinden müşteri yaşı)"},
+        "clv_horizon": {"en": "CLV Horizon (days)", "tr": "CLV Ufku (gün)"},
+        "crm_export": {"en": "📤 CRM Export", "tr": "📤 CRM Dışa Aktarım"},
+        "crm_format": {"en": "File Format", "tr": "Dosya Formatı"},
+        "crm_prepare": {"en": "Prepare Export", "tr": "Dışa Aktarımı Hazırla"},
+        "crm_download": {"en": "💾 Download (ZIP, partitioned by segment)", "tr": "💾 İndir (ZIP, segment bazlı bölümlenmiş)"},
+        "snapshot_label": {"en": "🔄 Compare with Previous Snapshot (CSV)", "tr": "🔄 Önceki Snapshot ile Karşılaştır (CSV)"},
+        "snapshot_help": {"en": "Columns: CustomerID, Segment", "tr": "Sütunlar: CustomerID, Segment"},
+        "snapshot_download": {"en": "💾 Download Current Snapshot", "tr": "💾 Güncel Snapshot'ı İndir"},
+        "migration_title": {"en": "Segment Migration Matrix (rows: previous, columns: current)", "tr": "Segment Geçiş Matrisi (satır: önceki, sütun: güncel)"},
+        "clv_error": {"en": "⚠️ Probabilistic CLV could not be fitted: {}", "tr": "⚠️ Olasılıksal CLV hesaplanamadı: {}"},
         "segment_stats": {"en": "Segment Statistics", "tr": "Segment İstatistikleri"},
+        "render_mode": {"en": "3D Rendering Mode", "tr": "3B Görselleştirme Modu"},
+        "render_options": {
+            "en": ["Auto", "Density Grid", "Stratified Sample", "All Points"],
+            "tr": ["Otomatik", "Yoğunluk Izgarası", "Tabakalı Örneklem", "Tüm Noktalar"]
+        },
+        "render_help": {
+            "en": "Large datasets are aggregated before plotting. Segment statistics always use the full data.",
+            "tr": "Büyük veri setleri çizimden önce özetlenir. Segment istatistikleri her zaman tüm veriyi kullanır."
+        },
         "marketing_actions": {"en": "💡 Marketing Actions by Segment", "tr": "💡 Segmentlere Göre Pazarlama Aksiyonları"}
     }
 
@@ -88,45 +118,27 @@ def run(lang='en'):
         help=content["upload_help"][lang]
     )
 
-    @st.cache_data
-    def get_rfm_data():
-        np.random.seed(42)
-        data = pd.concat([
-            pd.DataFrame({'Recency': np.random.randint(1, 30, 100), 'Frequency': np.random.randint(20, 50, 100), 'Monetary': np.random.normal(5000, 1000, 100)}),
-            pd.DataFrame({'Recency': np.random.randint(1, 30, 150), 'Frequency': np.random.randint(1, 5, 150), 'Monetary': np.random.normal(500, 100, 150)}),
-            pd.DataFrame({'Recency': np.random.randint(100, 365, 150), 'Frequency': np.random.randint(1, 10, 150), 'Monetary': np.random.normal(1000, 300, 150)}),
-            pd.DataFrame({'Recency': np.random.randint(30, 90, 100), 'Frequency': np.random.randint(5, 15, 100), 'Monetary': np.random.normal(2000, 500, 100)})
-        ]).reset_index(drop=True)
-        return data
+    get_rfm_data = st.cache_data(generate_rfm_data)
 
     # VERİ YÜKLEME KONTROLÜ
-    if uploaded_file is not None:
-        try:
-            df = pd.read_csv(uploaded_file)
-            if not all(col in df.columns for col in ['Recency', 'Frequency', 'Monetary']):
-                st.error("❌ CSV must contain: Recency, Frequency, Monetary columns")
+    with stage("ingest"):
+        if uploaded_file is not None:
+            try:
+                df = read_upload(uploaded_file)
+                if not all(col in df.columns for col in ['Recency', 'Frequency', 'Monetary']):
+                    st.error("❌ CSV must contain: Recency, Frequency, Monetary columns")
+                    df = get_rfm_data()
+                else:
+                    st.success("✅ Data uploaded successfully!" if lang == 'en' else "✅ Veri başarıyla yüklendi!")
+            except Exception as e:
+                st.error(f"Error: {e}")
                 df = get_rfm_data()
-            else:
-                st.success("✅ Data uploaded successfully!" if lang == 'en' else "✅ Veri başarıyla yüklendi!")
-        except Exception as e:
-            st.error(f"Error: {e}")
+        else:
+            st.info("Using demo data..." if lang == 'en' else "Demo verisi kullanılıyor...")
             df = get_rfm_data()
-    else:
-        st.info("Using demo data..." if lang == 'en' else "Demo verisi kullanılıyor...")
-        df = get_rfm_data()
-
-    scaler = StandardScaler()
-    scaled_data = scaler.fit_transform(df)
-    
-    kmeans = KMeans(n_clusters=4, random_state=42, n_init=10)
-    df['Cluster'] = kmeans.fit_predict(scaled_data)
 
-    # Silhouette Score (Kümeleme Kalitesi)
-    silhouette_avg = silhouette_score(scaled_data, df['Cluster'])
-
-    sorted_idx = df.groupby('Cluster')['Monetary'].mean().sort_values(ascending=False).index
-    mapping = {old: new for old, new in zip(sorted_idx, content["segments"][lang])}
-    df['Segment'] = df['Cluster'].map(mapping)
+    with stage("cluster"):
+        df, silhouette_avg, _ = run_job(cluster_rfm, df, content["segments"][lang], rows=len(df), lang=lang, cache=True)
 
     # PERFORMANS METRİĞİ
     st.subheader(content["performance"][lang])
@@ -145,24 +157,54 @@ def run(lang='en'):
         content["segments"][lang][3]: "#EF553B"
     }
 
-    fig = px.scatter_3d(
-        df, x='Recency', y='Frequency', z='Monetary', color='Segment',
-        color_discrete_map=color_map, opacity=0.6, size_max=10,
-        labels=content["axis"][lang], height=600
+    render_options = content["render_options"][lang]
+    render_mode = st.radio(
+        content["render_mode"][lang], render_options,
+        horizontal=True, help=content["render_help"][lang]
     )
+    mode_idx = render_options.index(render_mode)
+    if mode_idx == 0:
+        mode_idx = 3 if len(df) <= RENDER_POINT_BUDGET else 1
+
+    # Şekil sadece veri, segmentler, çizim modu veya dil değişince yeniden kurulur
+    def build_rfm_3d():
+        if mode_idx == 1:
+            # Yoğunluk modu: nokta boyutu hücredeki müşteri sayısını gösterir
+            plot_df = bin_rfm_3d(df)
+            fig = px.scatter_3d(
+                plot_df, x='Recency', y='Frequency', z='Monetary', color='Segment',
+                size='Count', hover_data=['Count'],
+                color_discrete_map=color_map, opacity=0.6, size_max=30,
+                labels=content["axis"][lang], height=600
+            )
+        else:
+            plot_df = sample_rfm(df) if mode_idx == 2 else df
+            fig = px.scatter_3d(
+                plot_df, x='Recency', y='Frequency', z='Monetary', color='Segment',
+                color_discrete_map=color_map, opacity=0.6, size_max=10,
+                labels=content["axis"][lang], height=600
+            )
     
-    fig.update_layout(
-        margin=dict(l=0, r=0, b=0, t=0),
-        legend=dict(
-            orientation="h",  
-            yanchor="bottom",
-            y=1.02,           
-            xanchor="right",
-            x=1               
+        fig.update_layout(
+            margin=dict(l=0, r=0, b=0, t=0),
+            legend=dict(
+                orientation="h",  
+                yanchor="bottom",
+                y=1.02,           
+                xanchor="right",
+                x=1               
+            )
         )
-    )
+        return fig, len(plot_df)
 
-    st.plotly_chart(fig, use_container_width=True)
+    payload = get_figure_cache().payload("rfm_3d", build_rfm_3d, df[RFM_COLUMNS + ['Segment']], mode_idx, lang)
+    plotted = payload['extra']
+    if plotted < len(df):
+        st.caption(
+            f"Rendering {plotted:,} of {len(df):,} customers" if lang == 'en'
+            else f"{len(df):,} müşteriden {plotted:,} nokta çiziliyor"
+        )
+    render_payload(payload)
 
     # SEGMENT İSTATİSTİKLERİ
     st.divider()
@@ -176,30 +218,91 @@ def run(lang='en'):
     
     segment_summary['Count'] = df.groupby('Segment').size()
     segment_summary['Percentage'] = (segment_summary['Count'] / len(df) * 100).round(1)
-    
+
+    # OLASILIKSAL CLV (BG/NBD + GAMMA-GAMMA)
+    horizon = st.select_slider(content["clv_horizon"][lang], options=[30, 90, 180, 365], value=90)
+    clv_pred = None
+    try:
+        with stage("clv_fit_predict"):
+            clv_pred, _, _ = predict_clv(df, horizon=horizon)
+        clv_by_segment = clv_pred.groupby(df['Segment']).mean()
+        segment_summary[f'Pred. Purchases ({horizon}d)'] = clv_by_segment['Predicted_Purchases'].round(2)
+        segment_summary[f'Pred. CLV ({horizon}d)'] = clv_by_segment['Predicted_CLV'].round(2)
+    except Exception as e:
+        st.warning(content["clv_error"][lang].format(e))
+
+    # KLASİK RFM SKORLARI (1-5)
+    with stage("rfm_scoring"):
+        rfm_scores = score_rfm(df, build_rfm_sketches([df]))
+    segment_summary['Avg RFM Score'] = rfm_scores['RFM_Score'].groupby(df['Segment']).mean().round(2)
+
+    # SEGMENT GEÇİŞLERİ (ÖNCEKİ SNAPSHOT İLE KARŞILAŞTIRMA)
+    customer_ids = df['CustomerID'].to_numpy() if 'CustomerID' in df.columns else df.index.to_numpy()
+    current_snapshot = segment_snapshot(customer_ids, df['Segment'], content["segments"][lang])
+    migration_matrix = None
+
+    prev_file = st.file_uploader(
+        content["snapshot_label"][lang],
+        type=["csv"],
+        help=content["snapshot_help"][lang]
+    )
+    if prev_file is not None:
+        try:
+            prev_df = read_upload(prev_file, columns=['CustomerID', 'Segment'])
+            # Önceki snapshot diğer dilde kaydedilmiş olabilir
+            to_current = dict(zip(content["segments"]["en"], content["segments"][lang]))
+            to_current.update(zip(content["segments"]["tr"], content["segments"][lang]))
+            prev_snapshot = segment_snapshot(
+                prev_df['CustomerID'].to_numpy(),
+                prev_df['Segment'].map(to_current),
+                content["segments"][lang]
+            )
+            with stage("segment_migration"):
+                migration_matrix, flows = segment_migration(prev_snapshot, current_snapshot)
+            segment_summary = segment_summary.join(flows[['Inflow', 'Outflow', 'Churn Rate %']])
+        except Exception as e:
+            st.error(f"Error: {e}")
+
     st.dataframe(segment_summary, use_container_width=True)
 
+    if migration_matrix is not None:
+        st.markdown("**" + content["migration_title"][lang] + "**")
+        st.dataframe(migration_matrix, use_container_width=True)
+
+    st.download_button(
+        content["snapshot_download"][lang],
+        pd.DataFrame({'CustomerID': customer_ids, 'Segment': df['Segment'].to_numpy()}).to_csv(index=False),
+        file_name="segment_snapshot.csv",
+        mime="text/csv"
+    )
+
     # PAZARLAMA AKSİYONLARI
     st.divider()
     st.subheader(content["marketing_actions"][lang])
     
-    actions = {
-        "en": {
-            "Champions": "🎯 **VIP Treatment:** Exclusive early access, loyalty rewards, personal account manager",
-            "Loyal": "💎 **Retention Focus:** Premium membership offers, cross-sell opportunities",
-            "Potential": "🚀 **Activation Campaigns:** Limited-time discounts, engagement emails",
-            "At Risk": "⚠️ **Win-back Strategy:** Survey for feedback, special reactivation offers"
-        },
-        "tr": {
-            "Şampiyonlar": "🎯 **VIP Muamele:** Özel erken erişim, sadakat ödülleri, kişisel hesap yöneticisi",
-            "Sadık": "💎 **Elde Tutma:** Premium üyelik teklifleri, çapraz satış fırsatları",
-            "Potansiyel": "🚀 **Aktivasyon:** Sınırlı süreli indirimler, etkileşim e-postaları",
-            "Riskli": "⚠️ **Geri Kazanma:** Geri bildirim anketi, özel reaktivasyon teklifleri"
-        }
-    }
-    
     for segment in content["segments"][lang]:
-        st.markdown(actions[lang][segment])
+        st.markdown(ACTIONS[lang][segment])
+
+    # CRM DIŞA AKTARIM
+    with st.expander(content["crm_export"][lang], expanded=False):
+        export_fmt = st.radio(content["crm_format"][lang], ["parquet", "csv"], horizontal=True)
+        if st.button(content["crm_prepare"][lang]):
+            extra = rfm_scores if clv_pred is None else rfm_scores.join(clv_pred[['Predicted_CLV']])
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                with stage("crm_export"):
+                    export_segments(df, tmp_dir, extra=extra, fmt=export_fmt)
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for root, _, files in os.walk(tmp_dir):
+                        for name in files:
+                            full_path = os.path.join(root, name)
+                            zf.write(full_path, os.path.relpath(full_path, tmp_dir))
+            st.download_button(
+                content["crm_download"][lang],
+                buffer.getvalue(),
+                file_name="crm_segments.zip",
+                mime="application/zip"
+            )
 
     if lang == 'tr':
         st.success("🎯 Strateji: En yüksek CLV'ye sahip 'Şampiyonlar' segmentine odaklanın.")
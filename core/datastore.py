@@ -0,0 +1,154 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import pandas as pd
+from core.memory import lean_enabled, lean_frame, downcast_table, sort_categories
+
+# İçerik adresli veri deposu: yüklenen CSV bir kez ayrıştırılır, Arrow IPC (Feather v2,
+# sıkıştırmasız) dosyası olarak diske yazılır ve sonraki okumalar bellek eşlemeyle yapılır.
+# Disk bütçesi aşılınca en uzun süredir kullanılmayan dosyalar silinir (LRU).
+# Düşük bellek modunda (core.memory) sütunlar okuma sırasında daraltılır.
+# Ayarlar: PORTFOLIO_DATA_DIR, PORTFOLIO_DATA_BUDGET_MB
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), "portfolio_datasets")
+DEFAULT_BUDGET_MB = 512
+
+
+class DatasetStore:
+    def __init__(self, root=None, budget_bytes=None):
+        self.root = root or os.environ.get("PORTFOLIO_DATA_DIR", DEFAULT_DIR)
+        if budget_bytes is None:
+            budget_bytes = float(os.environ.get("PORTFOLIO_DATA_BUDGET_MB", DEFAULT_BUDGET_MB)) * 2**20
+        self.budget_bytes = int(budget_bytes)
+        self._upload_keys = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def content_key(raw):
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.arrow")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, raw, reader=pd.read_csv):
+        # Ham dosya baytları -> anahtar. Aynı içerik zaten varsa ayrıştırma yapılmaz
+        key = self.content_key(raw)
+        path = self.path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return key, None
+        df = reader(io.BytesIO(raw))
+        self._write(path, df)
+        self.evict(keep=key)
+        return key, df
+
+    def _write(self, path, df):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Arrow'a çevrilemeyen karışık tipli sütunlar: depolamadan sadece bu çağrıda kullanılır
+            return
+        # Eşzamanlı oturumlar aynı dosyayı yazabilir: önce geçici dosya, sonra atomik yer değiştirme
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def read(self, key, columns=None):
+        # Sayısal sütunlar eşlenmiş dosyayı kopyalamadan gösterir (salt okunur)
+        import pyarrow as pa
+
+        path = self.path(key)
+        source = pa.memory_map(path)
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            missing = [c for c in columns if c not in table.column_names]
+            if missing:
+                raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+            table = table.select(columns)
+        os.utime(path)
+        if lean_enabled():
+            # Düşük bellek modu: daraltma Arrow tarafında, pandas'a tek dönüşüm
+            return sort_categories(downcast_table(table).to_pandas(split_blocks=True))
+        return table.to_pandas(split_blocks=True)
+
+    def load(self, raw, columns=None, reader=pd.read_csv):
+        key, df = self.put(raw, reader=reader)
+        if df is not None and key not in self:
+            return lean_frame(df if columns is None else df[columns])
+        return self.read(key, columns)
+
+    def load_upload(self, uploaded_file, columns=None):
+        # Streamlit UploadedFile: aynı yükleme (file_id) tekrar hash'lenmez
+        file_id = getattr(uploaded_file, 'file_id', None)
+        with self._lock:
+            key = self._upload_keys.get(file_id)
+        if key is not None and key in self:
+            return self.read(key, columns)
+        raw = uploaded_file.getvalue()
+        df = self.load(raw, columns)
+        if file_id is not None:
+            with self._lock:
+                self._upload_keys[file_id] = self.content_key(raw)
+        return df
+
+    def entries(self):
+        # (anahtar, boyut, son erişim) — en eskiden yeniye
+        items = []
+        for name in os.listdir(self.root):
+            if name.endswith(".arrow"):
+                try:
+                    stat = os.stat(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue
+                items.append((name[:-len(".arrow")], stat.st_size, stat.st_mtime))
+        return sorted(items, key=lambda item: item[2])
+
+    def usage_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for key, size, _ in entries:
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append(key)
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DatasetStore()
+        return _store
+
+
+def read_upload(uploaded_file, columns=None):
+    return get_store().load_upload(uploaded_file, columns)
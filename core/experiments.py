@@ -0,0 +1,560 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from core.jobs import parallel_map
+
+# Kontrol grubu tanıma deseni ("A", "Control", "Control (A)" ...)
+CONTROL_PATTERN = r'^\s*(?:a|control)\b'
+
+
+def two_proportion_ztest(conv_a, n_a, conv_b, n_b):
+    # Dizi girdileriyle çalışır: her eleman ayrı bir karşılaştırma
+    conv_a, n_a = np.asarray(conv_a, dtype=float), np.asarray(n_a, dtype=float)
+    conv_b, n_b = np.asarray(conv_b, dtype=float), np.asarray(n_b, dtype=float)
+    p1, p2 = conv_a / n_a, conv_b / n_b
+    p_pool = (conv_a + conv_b) / (n_a + n_b)
+    se = np.sqrt(p_pool * (1 - p_pool) * (1 / n_a + 1 / n_b))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = (p2 - p1) / se
+    p_value = 2 * stats.norm.sf(np.abs(z_score))
+    return z_score, p_value
+
+
+def benjamini_hochberg(p_values):
+    # FDR düzeltmeli q-değerleri (NaN'lar hesaba katılmaz)
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    order = valid[np.argsort(p_values[valid])]
+    m = len(order)
+    if m == 0:
+        return q_values
+    ranked = p_values[order] * m / np.arange(1, m + 1)
+    q_values[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q_values
+
+
+def _match_controls(df, control_pattern=CONTROL_PATTERN, keys=None):
+    # Her satır için aynı deneydeki (veya aynı keys grubundaki) ilk kontrol satırının konumu (-1: kontrol yok)
+    variant_col = 'Variant' if 'Variant' in df.columns else 'Group'
+    if keys is None:
+        keys = [col for col in ('Experiment', 'Metric') if col in df.columns]
+    if keys:
+        # dropna=False: boş anahtar (NaN) kendi grubunu oluşturur, ngroup() NaN döndürmez
+        group_ids = df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        # Experiment sütunu yok: tüm satırlar tek deney
+        group_ids = np.zeros(len(df), dtype=np.int64)
+    is_control = df[variant_col].astype(str).str.contains(control_pattern, case=False, regex=True).to_numpy()
+
+    n_groups = group_ids.max() + 1 if len(group_ids) else 0
+    control_row = np.full(n_groups, -1)
+    ctrl_idx = np.flatnonzero(is_control)
+    groups_with_control, first = np.unique(group_ids[ctrl_idx], return_index=True)
+    control_row[groups_with_control] = ctrl_idx[first]
+    ctrl = control_row[group_ids]
+    treatment = (ctrl >= 0) & (np.arange(len(df)) != ctrl)
+    return keys, variant_col, ctrl, treatment
+
+
+def control_and_test(df, control_pattern=CONTROL_PATTERN):
+    # Tek deney dosyası: kontrol satırı ve onunla eşleşen ilk test satırı (varyant adından bağımsız)
+    missing = [col for col in ('Visitors', 'Conversions') if col not in df.columns]
+    if 'Variant' not in df.columns and 'Group' not in df.columns:
+        missing.insert(0, 'Group')
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    _, variant_col, ctrl, treatment = _match_controls(df, control_pattern)
+    if not (ctrl >= 0).any():
+        raise ValueError(f"No control group in '{variant_col}': label it 'A' or 'Control'")
+    rows = np.flatnonzero(treatment)
+    if len(rows) == 0:
+        raise ValueError(f"No test group next to the control group in '{variant_col}'")
+    return df.iloc[ctrl[rows[0]]], df.iloc[rows[0]]
+
+
+def analyze_experiments(df, alpha=0.05, control_pattern=CONTROL_PATTERN):
+    # Uzun tablo: Experiment, [Metric], Variant/Group, Visitors, Conversions
+    # Her deneyde her varyant kontrol grubuyla karşılaştırılır
+    keys, variant_col, ctrl, treatment = _match_controls(df, control_pattern)
+    has_control = ctrl >= 0
+
+    visitors = df['Visitors'].to_numpy(dtype=float)
+    conversions = df['Conversions'].to_numpy(dtype=float)
+
+    ctrl_visitors = np.where(has_control, visitors[ctrl], np.nan)
+    ctrl_conversions = np.where(has_control, conversions[ctrl], np.nan)
+    z_score, p_value = two_proportion_ztest(ctrl_conversions, ctrl_visitors, conversions, visitors)
+
+    cvr = conversions / visitors * 100
+    ctrl_cvr = ctrl_conversions / ctrl_visitors * 100
+
+    result = df[keys + [variant_col, 'Visitors', 'Conversions']].copy()
+    result['CVR %'] = cvr.round(3)
+    result['Control CVR %'] = ctrl_cvr.round(3)
+    result['Uplift %'] = ((cvr - ctrl_cvr) / ctrl_cvr * 100).round(2)
+    result['Z'] = z_score.round(3)
+    result['p-value'] = p_value
+    result = result[treatment].reset_index(drop=True)
+    result['q-value (BH)'] = benjamini_hochberg(result['p-value'].to_numpy())
+    result['Significant'] = result['q-value (BH)'] < alpha
+    return result
+
+
+# --- KATMANLI (STRATIFIED) ANALİZ ---
+# Katman olarak kullanılmayacak sütunlar
+RESERVED_COLUMNS = {'Experiment', 'Metric', 'Group', 'Variant', 'Visitors', 'Conversions', 'Conversion_Rate'}
+
+
+def stratified_analysis(df, strata, alpha=0.05, control_pattern=CONTROL_PATTERN):
+    # Her dilim (ör. Device x Country x User_Type) için z-testi ve tüm dilimler üzerinden
+    # Cochran-Mantel-Haenszel birleşik tahmini; sonuç tek tabloda
+    base_keys = ['Experiment'] if 'Experiment' in df.columns else []
+    keys, variant_col, ctrl, treatment = _match_controls(df, control_pattern, keys=base_keys + list(strata))
+    rows = np.flatnonzero(treatment)
+    visitors = df['Visitors'].to_numpy(dtype=float)
+    conversions = df['Conversions'].to_numpy(dtype=float)
+    n_a, x_a = visitors[ctrl[rows]], conversions[ctrl[rows]]
+    n_b, x_b = visitors[rows], conversions[rows]
+
+    z_score, p_value = two_proportion_ztest(x_a, n_a, x_b, n_b)
+    cvr_a, cvr_b = x_a / n_a * 100, x_b / n_b * 100
+    slices = df.iloc[rows][keys + [variant_col]].reset_index(drop=True)
+    slices['Visitors A'] = n_a.astype(np.int64)
+    slices['Visitors B'] = n_b.astype(np.int64)
+    slices['CVR A %'] = cvr_a.round(3)
+    slices['CVR B %'] = cvr_b.round(3)
+    slices['Diff pp'] = (cvr_b - cvr_a).round(3)
+    slices['Z'] = z_score.round(3)
+    slices['p-value'] = p_value
+    slices['q-value (BH)'] = benjamini_hochberg(p_value)
+
+    # CMH: deney x varyant başına dilimler üzerinden toplamlar (bincount ile tek geçiş)
+    combo, combo_keys = pd.factorize(pd.MultiIndex.from_frame(slices[base_keys + [variant_col]]))
+    n = n_a + n_b
+    totals = x_a + x_b
+
+    def per_combo(values):
+        return np.bincount(combo, weights=values, minlength=len(combo_keys))
+
+    observed = per_combo(x_b)
+    expected = per_combo(n_b * totals / n)
+    variance = per_combo(n_a * n_b * totals * (n - totals) / (n ** 2 * np.maximum(n - 1, 1)))
+    cmh_stat = (observed - expected) ** 2 / variance
+    odds_ratio = per_combo(x_b * (n_a - x_a) / n) / per_combo((n_b - x_b) * x_a / n)
+    weights = n_a * n_b / n
+    risk_diff = per_combo(weights * (x_b / n_b - x_a / n_a)) / per_combo(weights)
+
+    combined = pd.DataFrame(list(combo_keys), columns=base_keys + [variant_col])
+    for col in strata:
+        combined[col] = 'All (CMH)'
+    combined['Visitors A'] = per_combo(n_a).astype(np.int64)
+    combined['Visitors B'] = per_combo(n_b).astype(np.int64)
+    combined['CVR A %'] = (per_combo(x_a) / combined['Visitors A'] * 100).round(3)
+    combined['CVR B %'] = (observed / combined['Visitors B'] * 100).round(3)
+    combined['Diff pp'] = (risk_diff * 100).round(3)
+    combined['Z'] = (np.sign(observed - expected) * np.sqrt(cmh_stat)).round(3)
+    combined['p-value'] = stats.chi2.sf(cmh_stat, 1)
+    combined['Odds Ratio (MH)'] = odds_ratio.round(4)
+
+    result = pd.concat([slices, combined[slices.columns.tolist()[:-1] + ['Odds Ratio (MH)']]], ignore_index=True)
+    result['Significant'] = np.where(result['q-value (BH)'].notna(), result['q-value (BH)'], result['p-value']) < alpha
+    return result
+
+
+# --- BAYESÇİ ANALİZ (BETA-BINOMIAL) ---
+def bayesian_ab(conv_a, n_a, conv_b, n_b, n_draws=20000, prior=(1.0, 1.0), ci=0.95,
+                seed=42, max_block=4_000_000, normal_min=50):
+    # Kredi aralıkları kapalı formdan. P(B > A) ve beklenen kayıp: her iki posteriorun
+    # parametreleri normal_min'den büyükse normal yaklaşımıyla kapalı formdan, aksi halde
+    # toplu posterior çekilişlerinden (satırlar bellek sınırı için bloklar halinde)
+    conv_a, n_a = np.atleast_1d(np.asarray(conv_a, dtype=float)), np.atleast_1d(np.asarray(n_a, dtype=float))
+    conv_b, n_b = np.atleast_1d(np.asarray(conv_b, dtype=float)), np.atleast_1d(np.asarray(n_b, dtype=float))
+    alpha_a, beta_a = prior[0] + conv_a, prior[1] + n_a - conv_a
+    alpha_b, beta_b = prior[0] + conv_b, prior[1] + n_b - conv_b
+
+    # Normal yaklaşımı: D = B - A ~ N(mu, sigma^2)
+    mean_a, mean_b = alpha_a / (alpha_a + beta_a), alpha_b / (alpha_b + beta_b)
+    var_a = mean_a * (1 - mean_a) / (alpha_a + beta_a + 1)
+    var_b = mean_b * (1 - mean_b) / (alpha_b + beta_b + 1)
+    mu, sigma = mean_b - mean_a, np.sqrt(var_a + var_b)
+    prob_b_better = stats.norm.cdf(mu / sigma)
+    loss_b = sigma * stats.norm.pdf(mu / sigma) - mu * stats.norm.cdf(-mu / sigma)
+    loss_a = loss_b + mu
+
+    sampled = np.flatnonzero(np.minimum.reduce([alpha_a, beta_a, alpha_b, beta_b]) < normal_min)
+    rng = np.random.default_rng(seed)
+    block = max(1, max_block // n_draws)
+    for start in range(0, len(sampled), block):
+        rows = sampled[start:start + block]
+        draws_a = rng.beta(alpha_a[rows], beta_a[rows], size=(n_draws, len(rows)))
+        draws_b = rng.beta(alpha_b[rows], beta_b[rows], size=(n_draws, len(rows)))
+        diff = draws_b - draws_a
+        prob_b_better[rows] = (diff > 0).mean(axis=0)
+        loss_b[rows] = np.maximum(-diff, 0).mean(axis=0)
+        loss_a[rows] = np.maximum(diff, 0).mean(axis=0)
+
+    tail = (1 - ci) / 2
+    return pd.DataFrame({
+        'P(B > A)': prob_b_better,
+        'Expected Loss (B)': loss_b,
+        'Expected Loss (A)': loss_a,
+        'CI A Low': stats.beta.ppf(tail, alpha_a, beta_a),
+        'CI A High': stats.beta.ppf(1 - tail, alpha_a, beta_a),
+        'CI B Low': stats.beta.ppf(tail, alpha_b, beta_b),
+        'CI B High': stats.beta.ppf(1 - tail, alpha_b, beta_b)
+    })
+
+
+def bayesian_experiments(df, n_draws=20000, control_pattern=CONTROL_PATTERN):
+    # Tüm deney portföyü için her varyantın kontrolle Bayesçi karşılaştırması
+    keys, variant_col, ctrl, treatment = _match_controls(df, control_pattern)
+    rows = np.flatnonzero(treatment)
+    visitors = df['Visitors'].to_numpy(dtype=float)
+    conversions = df['Conversions'].to_numpy(dtype=float)
+    posterior = bayesian_ab(conversions[ctrl[rows]], visitors[ctrl[rows]],
+                            conversions[rows], visitors[rows], n_draws=n_draws)
+    result = df.iloc[rows][keys + [variant_col]].reset_index(drop=True)
+    return pd.concat([result, posterior], axis=1)
+
+
+# --- BOOTSTRAP GÜVEN ARALIKLARI (GELİR VE SÜREKLİ METRİKLER) ---
+# Poisson(1) ağırlıkları için 16-bit ters CDF tablosu: uint16 rastgele sayılar tabloya bakılarak
+# ağırlığa çevrilir (poisson() çağrısından çok daha hızlı)
+_POISSON_TABLE = stats.poisson.ppf((np.arange(65536) + 0.5) / 65536, 1).astype(np.float32)
+
+
+def _bootstrap_block(args):
+    # Bir veri bloğu için tüm yeniden örneklemelerin ağırlıklı toplamları; veri kopyalanmaz
+    values, counts, n_resamples, seed = args
+    rng = np.random.default_rng(seed)
+    if counts is None:
+        weights = _POISSON_TABLE[rng.integers(0, 65536, size=(len(values), n_resamples), dtype=np.uint16)]
+    else:
+        # k kullanıcının Poisson(1) ağırlıklarının toplamı Poisson(k) dağılır
+        weights = rng.poisson(counts[:, None], size=(len(values), n_resamples)).astype(np.float32)
+    return values.astype(np.float32) @ weights, weights.sum(axis=0)
+
+
+def _bootstrap_tasks(values, n_resamples, seed_seq, max_cells):
+    # Tekrarlanan değerler (ör. gelir = 0) tek satıra indirilir, tekil değerler tablo ile ağırlıklanır
+    uniques, counts = np.unique(values, return_counts=True)
+    repeated = counts > 1
+    parts = [(uniques[~repeated], None), (uniques[repeated], counts[repeated].astype(float))]
+
+    rows = max(1, max_cells // n_resamples)
+    blocks_spec = [(part_values[i:i + rows], None if part_counts is None else part_counts[i:i + rows])
+                   for part_values, part_counts in parts for i in range(0, len(part_values), rows)]
+    seeds = seed_seq.spawn(len(blocks_spec))
+    return [(block_values, block_counts, n_resamples, s) for (block_values, block_counts), s in zip(blocks_spec, seeds)]
+
+
+def bootstrap_ci(values_a, values_b, n_resamples=10000, ci=0.95, seed=42, parallel=True,
+                 max_cells=4_000_000, parallel_cells=50_000_000):
+    # Poisson bootstrap: her kullanıcıya her örneklemde Poisson(1) ağırlık. Tekil değer x örneklem
+    # hücre sayısı parallel_cells'i (~0.3 sn) aşarsa bloklar paylaşılan iş havuzunda hesaplanır
+    values_a = np.asarray(values_a, dtype=float)
+    values_b = np.asarray(values_b, dtype=float)
+    seed_a, seed_b = np.random.SeedSequence(seed).spawn(2)
+    tasks_a = _bootstrap_tasks(values_a, n_resamples, seed_a, max_cells)
+    tasks_b = _bootstrap_tasks(values_b, n_resamples, seed_b, max_cells)
+    tasks = tasks_a + tasks_b
+
+    cells = sum(len(task[0]) for task in tasks) * n_resamples
+    if parallel and len(tasks) > 1 and cells >= parallel_cells:
+        blocks = parallel_map(_bootstrap_block, tasks, chunksize=8)
+    else:
+        blocks = map(_bootstrap_block, tasks)
+    # Blok sonuçları geldikçe toplanır (hepsi bellekte tutulmaz)
+    sums = np.zeros((2, 2, n_resamples))
+    for i, (block_sum, block_weight) in enumerate(blocks):
+        arm = sums[int(i >= len(tasks_a))]
+        arm[0] += block_sum
+        arm[1] += block_weight
+    means_a, means_b = sums[0, 0] / sums[0, 1], sums[1, 0] / sums[1, 1]
+
+    diff = means_b - means_a
+    uplift = diff / means_a * 100
+    tail = (1 - ci) / 2 * 100
+    # Artı-bir düzeltmesi: B örneklemle p-değeri 1/(B+1)'den küçük olamaz (sıfır p raporlanmaz)
+    extreme = min((diff <= 0).sum(), (diff >= 0).sum())
+    return {
+        'Mean A': values_a.mean(),
+        'Mean B': values_b.mean(),
+        'Diff': values_b.mean() - values_a.mean(),
+        'Diff CI': tuple(np.percentile(diff, [tail, 100 - tail])),
+        'Uplift CI %': tuple(np.percentile(uplift, [tail, 100 - tail])),
+        'CI A': tuple(np.percentile(means_a, [tail, 100 - tail])),
+        'CI B': tuple(np.percentile(means_b, [tail, 100 - tail])),
+        'p-value': min(1.0, 2 * (extreme + 1) / (n_resamples + 1))
+    }
+
+
+# --- CUPED VARYANS AZALTIMI ---
+class CupedMoments:
+    # Metrik (y) ve ön-dönem kovaryatı (x) için tek geçişli akış momentleri;
+    # parçalar Chan birleştirme formülüyle eklenir, düzeltilmiş kopya oluşturulmaz
+    def __init__(self):
+        self.n = 0
+        self.mean_y = 0.0
+        self.mean_x = 0.0
+        self.m2_y = 0.0
+        self.m2_x = 0.0
+        self.c_xy = 0.0
+
+    def update(self, metric, covariate):
+        y = np.asarray(metric, dtype=float)
+        x = np.asarray(covariate, dtype=float)
+        if len(y) == 0:
+            return self
+        chunk = CupedMoments()
+        chunk.n = len(y)
+        chunk.mean_y, chunk.mean_x = y.mean(), x.mean()
+        dy, dx = y - chunk.mean_y, x - chunk.mean_x
+        chunk.m2_y, chunk.m2_x, chunk.c_xy = dy @ dy, dx @ dx, dx @ dy
+        return self.merge(chunk)
+
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return self
+        delta_y, delta_x = other.mean_y - self.mean_y, other.mean_x - self.mean_x
+        factor = self.n * other.n / n
+        self.m2_y += other.m2_y + delta_y ** 2 * factor
+        self.m2_x += other.m2_x + delta_x ** 2 * factor
+        self.c_xy += other.c_xy + delta_x * delta_y * factor
+        self.mean_y += delta_y * other.n / n
+        self.mean_x += delta_x * other.n / n
+        self.n = n
+        return self
+
+    def combined(self, other):
+        return CupedMoments().merge(self).merge(other)
+
+
+def cuped_moments(metric, covariate, chunk_size=1_000_000):
+    moments = CupedMoments()
+    for start in range(0, len(metric), chunk_size):
+        moments.update(metric[start:start + chunk_size], covariate[start:start + chunk_size])
+    return moments
+
+
+def cuped_test(moments_a, moments_b, alpha=0.05, power=0.8):
+    # theta her iki grubun birleşik momentlerinden; düzeltilmiş ortalama ve varyanslar
+    # momentlerden kapalı formda hesaplanır
+    pooled = moments_a.combined(moments_b)
+    theta = pooled.c_xy / pooled.m2_x if pooled.m2_x > 0 else 0.0
+
+    def adjusted(m):
+        var_y = m.m2_y / (m.n - 1)
+        var_adj = (m.m2_y - 2 * theta * m.c_xy + theta ** 2 * m.m2_x) / (m.n - 1)
+        return m.mean_y - theta * (m.mean_x - pooled.mean_x), var_y, var_adj
+
+    mean_a, var_a, var_adj_a = adjusted(moments_a)
+    mean_b, var_b, var_adj_b = adjusted(moments_b)
+    diff = mean_b - mean_a
+    se = np.sqrt(var_adj_a / moments_a.n + var_adj_b / moments_b.n)
+    z_score = diff / se
+    reduction = 1 - (var_adj_a + var_adj_b) / (var_a + var_b)
+
+    # Gözlenen farkı yakalamak için grup başına gereken örneklem (CUPED öncesi / sonrası)
+    z_total = stats.norm.ppf(1 - alpha / 2) + stats.norm.ppf(power)
+    required_n = z_total ** 2 * (var_a + var_b) / diff ** 2 if diff != 0 else np.inf
+    return {
+        'Theta': theta,
+        'Mean A (CUPED)': mean_a,
+        'Mean B (CUPED)': mean_b,
+        'Diff': diff,
+        'Diff CI': (diff - stats.norm.ppf(1 - alpha / 2) * se, diff + stats.norm.ppf(1 - alpha / 2) * se),
+        'Z': z_score,
+        'p-value': 2 * stats.norm.sf(abs(z_score)),
+        'Variance Reduction %': reduction * 100,
+        'Required N': required_n,
+        'Required N (CUPED)': required_n * (1 - reduction)
+    }
+
+
+# --- HAM OLAY KAYITLARINDAN A/B SAYIMLARI ---
+class EventAggregator:
+    # (deney, varyant) başına tekil kullanıcıların 64-bit hash'leri tutulur. Her parçanın tekil
+    # hash'leri listeye eklenir; bekleyen parçalar tekilleştirilmiş diziden büyüyünce hepsi bir kez
+    # birleştirilir (her parçada union yerine amortize O(n log n), bellek en fazla ~2 kat)
+    def __init__(self, user_col='user_id', variant_col='variant', event_col='event',
+                 experiment_col='experiment', conversion_event='conversion'):
+        self.user_col = user_col
+        self.variant_col = variant_col
+        self.event_col = event_col
+        self.experiment_col = experiment_col
+        self.conversion_event = conversion_event
+        self.exposed = {}
+        self.converted = {}
+
+    def update(self, chunk):
+        has_experiment = self.experiment_col in chunk.columns
+        keys = [self.experiment_col, self.variant_col] if has_experiment else self.variant_col
+        groups = chunk.groupby(keys, sort=False).indices
+        hashes = pd.util.hash_array(chunk[self.user_col].astype(str).to_numpy())
+        is_conversion = (chunk[self.event_col].astype(str).str.lower() == self.conversion_event).to_numpy()
+
+        # Tüm olaylar maruz kalma sayılır; dönüşüm olayı aynı zamanda kullanıcının varyantta olduğunu gösterir
+        for key, idx in groups.items():
+            key = tuple(str(k) for k in key) if has_experiment else (None, str(key))
+            group_hashes = hashes[idx]
+            self._merge_into(self.exposed, key, np.unique(group_hashes))
+            self._merge_into(self.converted, key, np.unique(group_hashes[is_conversion[idx]]))
+        return self
+
+    def merge(self, other):
+        for key, parts in other.exposed.items():
+            self._merge_into(self.exposed, key, other._unique(parts))
+        for key, parts in other.converted.items():
+            self._merge_into(self.converted, key, other._unique(parts))
+        return self
+
+    @staticmethod
+    def _merge_into(store, key, users):
+        parts = store.setdefault(key, [])
+        parts.append(users)
+        if len(parts) > 1 and sum(len(part) for part in parts[1:]) > len(parts[0]):
+            store[key] = [np.unique(np.concatenate(parts))]
+
+    @staticmethod
+    def _unique(parts):
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def compact(self):
+        # Bekleyen parçalar tekilleştirilir (ör. işçiden dönmeden önce, daha küçük pickle)
+        for store in (self.exposed, self.converted):
+            for key, parts in store.items():
+                store[key] = [self._unique(parts)]
+        return self
+
+    def to_frame(self):
+        self.compact()
+        rows = []
+        for (experiment, variant), (users,) in self.exposed.items():
+            converted = self.converted.get((experiment, variant), [np.empty(0, dtype=np.uint64)])[0]
+            rows.append({
+                'Experiment': experiment,
+                'Group': variant,
+                'Visitors': len(users),
+                'Conversions': len(np.intersect1d(users, converted, assume_unique=True))
+            })
+        result = pd.DataFrame(rows, columns=['Experiment', 'Group', 'Visitors', 'Conversions'])
+        if result['Experiment'].isna().all():
+            result = result.drop(columns='Experiment')
+        return result
+
+
+def _aggregate_event_file(args):
+    path, chunksize, options = args
+    aggregator = EventAggregator(**options)
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        aggregator.update(chunk)
+    return aggregator.compact()
+
+
+def aggregate_event_files(paths, chunksize=1_000_000, parallel=True, **options):
+    # Her dosya parça parça okunur, kısmi sonuçlar birleştirilir. Birden fazla dosya paylaşılan
+    # iş havuzunda (core.jobs.parallel_map) okunur; tek dosyada süreçler arası kopyalama gereksiz
+    tasks = [(path, chunksize, options) for path in paths]
+    if not parallel or len(tasks) == 1:
+        return _merge_aggregators(map(_aggregate_event_file, tasks), options)
+    return _merge_aggregators(parallel_map(_aggregate_event_file, tasks), options)
+
+
+def _merge_aggregators(partials, options):
+    total = EventAggregator(**options)
+    for partial in partials:
+        total.merge(partial)
+    return total
+
+
+# --- SIRALI TEST (mSPRT, SÜREKLİ İZLEME) ---
+class SequentialMonitor:
+    # Deney başına O(1) durum: kümülatif sayımlar + her zaman geçerli (always-valid) p-değeri
+    # Normal yaklaşımlı mSPRT, fark için N(0, tau^2) karışım dağılımı
+    def __init__(self, alpha=0.05, tau=0.01):
+        self.alpha = alpha
+        self.tau2 = tau ** 2
+        self.index = {}
+        self.counts = np.zeros((0, 4))  # visitors_a, conversions_a, visitors_b, conversions_b
+        self.p_value = np.ones(0)
+
+    def _rows(self, experiments):
+        new = [e for e in pd.unique(np.asarray(experiments, dtype=object)) if e not in self.index]
+        if new:
+            start = len(self.index)
+            self.index.update({e: start + i for i, e in enumerate(new)})
+            self.counts = np.vstack([self.counts, np.zeros((len(new), 4))])
+            self.p_value = np.concatenate([self.p_value, np.ones(len(new))])
+        return np.array([self.index[e] for e in experiments], dtype=np.int64)
+
+    def update(self, experiments, visitors_a, conversions_a, visitors_b, conversions_b):
+        # Yeni gelen sayım parti(ler)i mevcut duruma eklenir; sadece etkilenen deneyler yeniden hesaplanır
+        rows = self._rows(experiments)
+        batch = np.column_stack([visitors_a, conversions_a, visitors_b, conversions_b]).astype(float)
+        np.add.at(self.counts, rows, batch)
+        touched = np.unique(rows)
+
+        n_a, c_a, n_b, c_b = self.counts[touched].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_a, p_b = c_a / n_a, c_b / n_b
+            variance = p_a * (1 - p_a) / n_a + p_b * (1 - p_b) / n_b
+            log_lambda = (0.5 * np.log(variance / (variance + self.tau2))
+                          + self.tau2 * (p_b - p_a) ** 2 / (2 * variance * (variance + self.tau2)))
+        current = np.where(variance > 0, np.minimum(1.0, np.exp(-log_lambda)), 1.0)
+        self.p_value[touched] = np.minimum(self.p_value[touched], current)
+        return self
+
+    def results(self):
+        n_a, c_a, n_b, c_b = self.counts.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cvr_a, cvr_b = c_a / n_a * 100, c_b / n_b * 100
+        return pd.DataFrame({
+            'Experiment': list(self.index),
+            'Visitors A': n_a.astype(np.int64),
+            'Visitors B': n_b.astype(np.int64),
+            'CVR A %': cvr_a.round(3),
+            'CVR B %': cvr_b.round(3),
+            'Uplift %': ((cvr_b - cvr_a) / cvr_a * 100).round(2),
+            'Always-valid p': self.p_value,
+            'Stop': self.p_value < self.alpha
+        })
+
+
+# --- MONTE CARLO GÜÇ SİMÜLASYONU ---
+def _simulate_power_block(args):
+    baseline, treated, n, n_sims, alpha, seed = args
+    rng = np.random.default_rng(seed)
+    # Her konfigürasyon için n_sims sentetik deney tek seferde çekilir
+    conv_a = rng.binomial(n[:, None], baseline[:, None], size=(len(n), n_sims))
+    conv_b = rng.binomial(n[:, None], treated[:, None], size=(len(n), n_sims))
+    _, p_value = two_proportion_ztest(conv_a, n[:, None], conv_b, n[:, None])
+    return np.mean(p_value < alpha, axis=1)
+
+
+def simulate_power(baselines, mdes, sample_sizes, n_sims=2000, alpha=0.05, seed=42,
+                   parallel=True, block_size=64, parallel_min=500_000):
+    # baselines: kontrol dönüşüm oranları, mdes: göreli minimum etki (0.1 = +%10),
+    # sample_sizes: grup başına ziyaretçi. Izgara bloklara bölünür; toplam deney sayısı parallel_min'i
+    # aşan büyük ızgaralar paylaşılan iş havuzunda (core.jobs.parallel_map), diğerleri bu süreçte
+    grid = np.array(np.meshgrid(baselines, mdes, sample_sizes, indexing='ij')).reshape(3, -1)
+    baseline, mde, n = grid[0], grid[1], grid[2].astype(np.int64)
+    treated = np.clip(baseline * (1 + mde), 0, 1)
+
+    starts = range(0, len(n), block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [(baseline[i:i + block_size], treated[i:i + block_size], n[i:i + block_size], n_sims, alpha, s)
+             for i, s in zip(starts, seeds)]
+    if not parallel or len(tasks) <= 1 or len(n) * n_sims < parallel_min:
+        blocks = list(map(_simulate_power_block, tasks))
+    else:
+        blocks = list(parallel_map(_simulate_power_block, tasks))
+
+    return pd.DataFrame({
+        'Baseline': baseline,
+        'MDE': mde,
+        'N': n,
+        'Power': np.concatenate(blocks) if blocks else np.empty(0)
+    })
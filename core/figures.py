@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from core.profiling import stage
+
+# Plotly şekil önbelleği: şekil, yalnızca bağlı olduğu girdilerden (veri, widget değerleri, dil)
+# üretilen anahtarla saklanır. Değer, Streamlit'in ön yüze gönderdiği JSON'un kendisidir;
+# girdiler değişmediyse yeniden çalıştırmada ne şekil kurulur ne de serileştirilir.
+# Oturumlar arası paylaşılır, toplam boyut bütçesini aşınca en eski kullanılanlar atılır (LRU).
+# Ayar: PORTFOLIO_FIGURE_CACHE_MB
+
+DEFAULT_BUDGET_MB = 64
+# plotly.js varsayılan yüksekliği (düzende yükseklik verilmemişse)
+DEFAULT_HEIGHT = 450
+
+
+def figure_key(name, *inputs):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(name.encode())
+    for value in inputs:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+            h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray):
+            h.update(repr((value.dtype, value.shape)).encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, pd.Index):
+            h.update(repr(list(value)).encode())
+        else:
+            h.update(repr(value).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def serialize(fig):
+    # st.plotly_chart ile aynı yol: doğrulanmış sözlük -> JSON
+    import plotly.io
+    import plotly.tools
+
+    figure = plotly.tools.return_figure_from_figure_or_data(fig, validate_figure=True)
+    height = figure.get("layout", {}).get("height")
+    return plotly.io.to_json(figure, validate=False), int(height) if height else DEFAULT_HEIGHT
+
+
+class FigureCache:
+    def __init__(self, budget_bytes=None):
+        if budget_bytes is None:
+            budget_bytes = float(os.environ.get("PORTFOLIO_FIGURE_CACHE_MB", DEFAULT_BUDGET_MB)) * 2**20
+        self.budget_bytes = int(budget_bytes)
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._items.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        size = len(payload['spec'])
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old['spec'])
+            self._items[key] = payload
+            self._bytes += size
+            while self._bytes > self.budget_bytes:
+                _, dropped = self._items.popitem(last=False)
+                self._bytes -= len(dropped['spec'])
+
+    def payload(self, name, build, *inputs):
+        # build() -> şekil veya (şekil, ek bilgi); ek bilgi (ör. çizilen nokta sayısı) JSON'la birlikte saklanır
+        key = figure_key(name, *inputs)
+        payload = self.get(key)
+        if payload is None:
+            with stage("figure_build"):
+                result = build()
+                fig, extra = result if isinstance(result, tuple) else (result, None)
+            with stage("figure_serialize"):
+                spec, height = serialize(fig)
+            payload = {'spec': spec, 'height': height, 'extra': extra}
+            self.put(key, payload)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self._bytes, 'budget_bytes': self.budget_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_figure_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FigureCache()
+        return _cache
@@ -0,0 +1,113 @@
+import copy
+import datetime
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+from xgboost.callback import TrainingCallback
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from core.profiling import stage
+from core.jobs import in_job, report_progress
+from core.governor import heavy_task
+from core import registry
+
+FEATURES = ['lag_7', 'rolling_mean', 'day_of_week']
+
+
+# --- VERİ İŞLEME FONKSİYONU ---
+def process_data(df_input):
+    # Geçersiz tarih filtresi ve sıralama tek bir take ile; sondaki NaN filtresi çoğunlukla
+    # kopyasız dilim (ilk 7 satır). Girdi değiştirilmez. Kayan ortalama ondalıklı kalır; sadece
+    # float32 Sales (düşük bellek modu) için float32'ye indirilir (tamsayıya çevrilmez: NaN içerir)
+    dates = pd.to_datetime(df_input['Date'], errors='coerce')
+    valid = np.flatnonzero(dates.notna().to_numpy())
+    order = valid[np.argsort(dates.to_numpy()[valid], kind='quicksort')]
+    df_input = df_input.assign(Date=dates).take(order)
+
+    # Feature Engineering
+    sales = df_input['Sales']
+    df_input['lag_7'] = sales.shift(7)
+    rolling_mean = sales.shift(1).rolling(7).mean()
+    if sales.dtype == np.float32:
+        rolling_mean = rolling_mean.astype(np.float32)
+    df_input['rolling_mean'] = rolling_mean
+    df_input['day_of_week'] = df_input['Date'].dt.dayofweek
+    keep = df_input.notna().all(axis=1).to_numpy()
+    return df_input.iloc[7:] if keep[7:].all() else df_input[keep]
+
+
+# --- SENTETİK VERİ ÜRETİCİ ---
+def generate_synthetic_data():
+    start_date = datetime.date(2023, 1, 1)
+    dates = pd.date_range(start=start_date, periods=730, freq='D')
+    trend = np.linspace(0, 50, 730)
+    seasonality = 20 * np.sin(np.linspace(0, 3 * np.pi, 730))
+    np.random.seed(42)
+    noise = np.random.normal(0, 10, 730)
+    sales = 100 + trend + seasonality + noise
+    return pd.DataFrame({"Date": dates, "Sales": np.maximum(sales, 0)})
+
+
+def forecast_metrics(y_true, predictions):
+    return {
+        'rmse': float(np.sqrt(mean_squared_error(y_true, predictions))),
+        'mae': float(mean_absolute_error(y_true, predictions)),
+        'r2': float(r2_score(y_true, predictions)),
+        'mape': float(np.mean(np.abs((y_true - predictions) / y_true)) * 100)
+    }
+
+
+class _ProgressCallback(TrainingCallback):
+    # Arka plan işinde her ağaçtan sonra ilerleme bildirir
+    def __init__(self, n_rounds):
+        super().__init__()
+        self.n_rounds = n_rounds
+
+    def after_iteration(self, model, epoch, evals_log):
+        report_progress((epoch + 1) / self.n_rounds)
+        return False
+
+
+# --- MODEL EĞİTİMİ VE TAHMİN ---
+def train_forecast(df, train_ratio=0.8, n_estimators=100, learning_rate=0.05, random_state=42, cache=False):
+    # df: process_data çıktısı. Zaman sırasına göre ilk %80 eğitim, kalan test.
+    # cache=True: aynı veri + parametrelerle eğitilmiş booster model kaydından yüklenir
+    X = df[FEATURES]
+    y = df['Sales']
+
+    split_point = int(len(X) * train_ratio)
+
+    X_train, y_train = X.iloc[:split_point], y.iloc[:split_point]
+    X_test, y_test = X.iloc[split_point:], y.iloc[split_point:]
+
+    params = {'train_ratio': train_ratio, 'n_estimators': n_estimators, 'learning_rate': learning_rate,
+              'random_state': random_state}
+    key, model = None, None
+    if cache:
+        with stage("registry_lookup"):
+            key, model, _ = registry.lookup("forecast", params, X_train, y_train)
+
+    with heavy_task("xgboost") as threads:
+        if model is None:
+            model = XGBRegressor(n_estimators=n_estimators, learning_rate=learning_rate, random_state=random_state,
+                                 callbacks=[_ProgressCallback(n_estimators)] if in_job() else None)
+            model.set_params(n_jobs=threads)
+            with stage("fit"):
+                model.fit(X_train, y_train)
+            registry.store("forecast", key, model, fmt='xgboost', params=params, rows=len(X_train),
+                           features=registry.schema(X_train), target='Sales')
+        else:
+            # Kayıttaki örnek oturumlar arasında paylaşılır; n_jobs (booster'a da yazılır) kopyada değiştirilir
+            model = copy.deepcopy(model)
+            model.set_params(n_jobs=threads)
+
+        with stage("predict"):
+            predictions = model.predict(X_test)
+    return {
+        'model': model,
+        'split_point': split_point,
+        'y_train': y_train,
+        'y_test': y_test,
+        'predictions': predictions,
+        'metrics': forecast_metrics(y_test, predictions),
+        'reorder_point': predictions.mean()
+    }
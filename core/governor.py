@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Merkezi CPU bütçesi: XGBoost, RandomForest ve K-Means her biri kendi iş parçacıklarını açtığında
+# eşzamanlı oturumlar çekirdekleri aşırı paylaştırır. Ağır görevler buradan iş parçacığı sayısı alır:
+# pay = bütçe / min(yük, üst sınır), kalan boş çekirdeklerle sınırlı. Yük, aktif + bekleyen
+# görev sayısının üstel ortalamasıdır; yoğun dönemde tek başına gelen görev de tüm çekirdekleri
+# almaz (çalışan fit'in iş parçacığı sayısı sonradan değiştirilemez).
+# Üst sınırı aşan ya da bütçe dolduğunda gelen görevler bir yuva boşalana kadar bekler.
+# Pay, tahminleyicilere çağrı başına verilir (n_jobs). BLAS/OpenMP havuzları süreç geneli olduğundan
+# görev başına değiştirilmez; governor oluşturulurken bir kez bütçe / üst sınır ile sınırlanır.
+# Ayarlar: PORTFOLIO_CPU_BUDGET (çekirdek), PORTFOLIO_MAX_HEAVY_JOBS
+
+HISTORY_SIZE = 200
+LOAD_DECAY = 0.7
+NATIVE_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _limit_native_pools(threads):
+    # Sonradan yüklenecek kütüphaneler ortam değişkenini, yüklenmiş olanlar threadpoolctl sınırını görür
+    from threadpoolctl import threadpool_limits
+
+    for var in NATIVE_THREAD_VARS:
+        os.environ[var] = str(threads)
+    threadpool_limits(limits=threads)
+
+
+class CpuGovernor:
+    def __init__(self, budget=None, max_heavy=None):
+        self.budget = max(1, budget or _env_int("PORTFOLIO_CPU_BUDGET", os.cpu_count() or 1))
+        self.max_heavy = max(1, max_heavy or _env_int("PORTFOLIO_MAX_HEAVY_JOBS", max(1, self.budget // 2)))
+        self._cond = threading.Condition()
+        self._active = {}
+        self._reserved = {}
+        self._waiting = 0
+        self.load = 0.0
+        self._next_id = 0
+        self._local = threading.local()
+        self.history = deque(maxlen=HISTORY_SIZE)
+
+    def used_threads(self):
+        return sum(self._active.values()) + sum(self._reserved.values())
+
+    def _allocate(self):
+        demand = len(self._active) + 1 + self._waiting
+        self.load = LOAD_DECAY * self.load + (1 - LOAD_DECAY) * demand
+        slots = min(self.max_heavy, max(len(self._active) + 1, round(self.load)))
+        share = max(1, self.budget // slots)
+        return max(1, min(share, self.budget - self.used_threads()))
+
+    def reserve(self, name, threads):
+        # Bu sürecin dışında çalışan iş parçacıkları (ör. arka plan iş havuzu) için ayrılan pay
+        with self._cond:
+            if threads > 0:
+                self._reserved[name] = threads
+            else:
+                self._reserved.pop(name, None)
+            self._cond.notify_all()
+
+    def native_threads(self):
+        # Her ağır görev yuvası aynı anda dolu olsa bile bütçeyi aşmayan süreç geneli native sınır
+        return max(1, self.budget // self.max_heavy)
+
+    @contextmanager
+    def task(self, name):
+        # Ağır görev: yuva bekler ve tahminleyiciye verilecek iş parçacığı sayısını döner
+        # İç içe ağır görev (aynı iş parçacığında) yeni yuva almaz, dıştakinin payını kullanır
+        held = getattr(self._local, 'threads', None)
+        if held is not None:
+            yield held
+            return
+
+        requested = time.perf_counter()
+        with self._cond:
+            self._waiting += 1
+            # Pay en az bir iş parçacığıdır; bütçe dolduysa bu süreçteki görevler bütçeyi aşmasın diye beklenir
+            while len(self._active) >= self.max_heavy or sum(self._active.values()) >= self.budget:
+                self._cond.wait()
+            self._waiting -= 1
+            task_id = self._next_id
+            self._next_id += 1
+            threads = self._allocate()
+            self._active[task_id] = threads
+            concurrent = len(self._active)
+        started = time.perf_counter()
+        self._local.threads = threads
+        try:
+            yield threads
+        finally:
+            self._local.threads = None
+            finished = time.perf_counter()
+            with self._cond:
+                del self._active[task_id]
+                self._cond.notify_all()
+                self.history.append({
+                    'task': name,
+                    'pid': os.getpid(),
+                    'threads': threads,
+                    'concurrent': concurrent,
+                    'wait_ms': round((started - requested) * 1000, 1),
+                    'run_ms': round((finished - started) * 1000, 1),
+                    'finished_at': time.time()
+                })
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'budget': self.budget,
+                'max_heavy': self.max_heavy,
+                'active_tasks': len(self._active),
+                'active_threads': sum(self._active.values()),
+                'waiting_tasks': self._waiting,
+                'load': round(self.load, 2),
+                'reserved_threads': dict(self._reserved)
+            }
+
+    def recent(self, n=20):
+        with self._cond:
+            return list(self.history)[-n:]
+
+    def record(self, entries):
+        # Başka süreçte (arka plan işçisi) tamamlanan görevlerin kayıtları
+        with self._cond:
+            self.history.extend(entries)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = CpuGovernor()
+            _limit_native_pools(_governor.native_threads())
+        return _governor
+
+
+def configure(budget=None, max_heavy=None):
+    # Süreç başına bütçe (ör. iş havuzu işçilerinde toplam bütçenin işçi sayısına bölümü)
+    global _governor
+    with _governor_lock:
+        _governor = CpuGovernor(budget, max_heavy)
+        _limit_native_pools(_governor.native_threads())
+        return _governor
+
+
+def heavy_task(name):
+    return get_governor().task(name)
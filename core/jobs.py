@@ -0,0 +1,294 @@
+import hashlib
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+from core import governor
+
+# Arka plan eğitim işleri: büyük veri setlerinde model eğitimi süreç havuzunda çalışır,
+# Streamlit oturumu ilerlemeyi sorgular. Aynı anahtarlı iş (aynı fonksiyon + veri + parametre)
+# çalışıyor, bitmiş veya başarısız olmuşsa yeniden başlatılmaz (başarısız iş sadece retry ile).
+# Küçük veri setleri (INLINE_ROWS altı) aynı iş parçacığında hemen çalıştırılır; süreç başlatma
+# maliyeti eğitimden büyük olur. Havuz süreç başına bir kez kurulur; parallel_map de aynı havuzu kullanır.
+# Ayarlar: PORTFOLIO_JOB_WORKERS
+
+INLINE_ROWS = 50_000
+MAX_FINISHED = 16
+PROGRESS_SLOTS = 256
+STARTUP_TIMEOUT = 120
+
+# İşçi süreç tarafı: paylaşılan ilerleme dizisi ve bu sürecin aktif iş yuvası
+_progress = None
+_slot = None
+
+
+def _init_worker(progress, cpu_budget, started):
+    global _progress
+    _progress = progress
+    # Her işçi toplam CPU bütçesinin kendi payı kadar iş parçacığı kullanır
+    governor.configure(budget=cpu_budget, max_heavy=1)
+    # Havuzdaki tüm işçiler başlayana kadar hiçbiri iş bitirip boşta kalmaz (bkz. JobExecutor._ensure_pool)
+    try:
+        started.wait(STARTUP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def _started():
+    return os.getpid()
+
+
+def _run_in_worker(slot, fn, args, kwargs):
+    # Sonuçla birlikte bu işte çalışan ağır görevlerin iş parçacığı kayıtları döner
+    global _slot
+    _slot = slot
+    gov = governor.get_governor()
+    mark = len(gov.history)
+    try:
+        return fn(*args, **kwargs), list(gov.history)[mark:]
+    finally:
+        _slot = None
+
+
+def in_job():
+    return _slot is not None
+
+
+def report_progress(fraction):
+    # Eğitim fonksiyonları çağırır; havuz dışında (satır içi çalıştırmada) etkisizdir
+    if _slot is not None:
+        _progress[_slot] = min(max(float(fraction), 0.0), 1.0)
+
+
+def job_key(fn, *args, **kwargs):
+    # DataFrame/Series içerik hash'i, diğer argümanlar repr ile
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{fn.__module__}.{fn.__qualname__}".encode())
+    for value in list(args) + sorted(kwargs.items()):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+            h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            h.update(repr(value).encode())
+    return h.hexdigest()
+
+
+@contextmanager
+def _hidden_main():
+    # Streamlit betiği __main__ olarak kurar; spawn edilen işçi çocuk hazırlığında (başlatıcıdan
+    # önce) ana modülü yeniden çalıştırır. Bu yüzden işçiler başlatılırken __main__ boş bir
+    # modülle değiştirilir. Sadece havuz kurulurken (süreç başına bir kez, kilit altında) kullanılır;
+    # geri alırken Streamlit bu arada kendi __main__'ini kurduysa ona dokunulmaz
+    with _main_lock:
+        saved = sys.modules.get('__main__')
+        sys.modules['__main__'] = _placeholder_main
+        try:
+            yield
+        finally:
+            if sys.modules.get('__main__') is _placeholder_main:
+                sys.modules['__main__'] = saved
+
+
+_placeholder_main = types.ModuleType('__main__')
+_main_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, key, future=None, slot=None, progress=None):
+        self.key = key
+        self.future = future
+        self.slot = slot
+        self.started = time.perf_counter()
+        self.finished = None
+        self._progress = progress
+        self._result = None
+        self._error = None
+
+    def done(self):
+        return self.finished is not None or (self.future is not None and self.future.done())
+
+    def failed(self):
+        # İptal edilen iş (ör. havuz kapatılırken bekleyen) de başarısız sayılır; exception() iptalde hata verir
+        if not self.done():
+            return False
+        if self.future is not None:
+            return self.future.cancelled() or self.future.exception() is not None
+        return self._error is not None
+
+    @property
+    def progress(self):
+        if self.done():
+            return 1.0
+        if self._progress is None or self.slot is None:
+            return 0.0
+        return self._progress[self.slot]
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def error(self):
+        if not self.failed():
+            return None
+        if self.future is None:
+            return self._error
+        if self.future.cancelled():
+            return CancelledError("job was cancelled")
+        return self.future.exception()
+
+    def result(self):
+        if self.future is not None:
+            return self.future.result()[0]
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class JobExecutor:
+    def __init__(self, max_workers=None, inline_rows=INLINE_ROWS):
+        if max_workers is None:
+            max_workers = int(os.environ.get("PORTFOLIO_JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+        self.max_workers = max_workers
+        self.inline_rows = inline_rows
+        self._jobs = OrderedDict()
+        self._free_slots = list(range(PROGRESS_SLOTS))
+        # Bitmiş future'ın geri çağrısı submit içinde aynı iş parçacığında çalışabilir
+        self._lock = threading.RLock()
+        self._pool = None
+        self._progress = None
+        self._pending = 0
+        self.worker_threads = max(1, governor.get_governor().budget // self.max_workers)
+
+    def _ensure_pool(self):
+        # Sunucu çok iş parçacıklı olduğu için fork yerine spawn. Havuz süreç boyunca yaşar ve tüm
+        # işçiler burada, tek bir __main__ değişimi altında başlatılır: her submit boşta işçi yoksa
+        # yeni süreç açar, işçiler başlatıcıdaki bariyerde beklediği için max_workers submit tam
+        # max_workers süreç başlatır. Sonraki submit'ler süreç başlatmaz, __main__'e dokunmaz
+        if self._pool is None:
+            ctx = mp.get_context("spawn")
+            self._progress = ctx.Array('d', PROGRESS_SLOTS, lock=False)
+            started = ctx.Barrier(self.max_workers)
+            pool = ProcessPoolExecutor(self.max_workers, mp_context=ctx, initializer=_init_worker,
+                                       initargs=(self._progress, self.worker_threads, started))
+            with _hidden_main():
+                for _ in range(self.max_workers):
+                    pool.submit(_started)
+            self._pool = pool
+        return self._pool
+
+    def submit(self, fn, *args, rows=None, retry=False, **kwargs):
+        # Başarısız iş, retry verilmedikçe yeniden başlatılmaz (hata her yeniden çalıştırmada gösterilir)
+        key = job_key(fn, *args, **kwargs)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (retry and job.failed()):
+                self._jobs.move_to_end(key)
+                return job
+            inline = rows is not None and rows < self.inline_rows
+            if not inline:
+                job = self._submit_pool(key, fn, args, kwargs)
+                self._remember(job)
+                return job
+        # Satır içi iş kilit dışında çalışır; aynı anda gelen aynı iş iki kez hesaplanabilir
+        job = Job(key)
+        try:
+            job._result = fn(*args, **kwargs)
+        except Exception as e:
+            job._error = e
+        job.finished = time.perf_counter()
+        with self._lock:
+            self._remember(job)
+        return job
+
+    def _submit_pool(self, key, fn, args, kwargs):
+        pool = self._ensure_pool()
+        slot = self._free_slots.pop() if self._free_slots else None
+        if slot is not None:
+            self._progress[slot] = 0.0
+        job = Job(key, slot=slot, progress=self._progress)
+        try:
+            job.future = pool.submit(_run_in_worker, slot, fn, args, kwargs)
+        except BrokenProcessPool:
+            # Bir işçi beklenmedik şekilde öldüyse (ör. bellek yetersizliği) havuz yeniden kurulur
+            self._pool = None
+            job.future = self._ensure_pool().submit(_run_in_worker, slot, fn, args, kwargs)
+        job.future.add_done_callback(lambda _: self._release(job))
+        self._pending += 1
+        self._update_reservation()
+        return job
+
+    def _release(self, job):
+        with self._lock:
+            job.finished = time.perf_counter()
+            if job.slot is not None:
+                self._free_slots.append(job.slot)
+                job.slot = None
+            self._pending -= 1
+            self._update_reservation()
+        if not job.future.cancelled() and job.future.exception() is None:
+            governor.get_governor().record(job.future.result()[1])
+
+    def _update_reservation(self):
+        # Havuzda çalışan işlerin çekirdekleri sunucu sürecindeki görevlere dağıtılmaz
+        governor.get_governor().reserve("job_pool", self.worker_threads * min(self._pending, self.max_workers))
+
+    def _remember(self, job):
+        self._jobs[job.key] = job
+        self._jobs.move_to_end(job.key)
+        # Sadece bitmiş işler atılır; çalışanlar sorgulanmaya devam eder
+        finished = [k for k, j in self._jobs.items() if j.done()]
+        for k in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self._jobs[k]
+
+    def map(self, fn, tasks, chunksize=1):
+        # Aynı uzun ömürlü havuzda sıralı sonuçlar (iş kaydı ve ilerleme olmadan)
+        with self._lock:
+            pool = self._ensure_pool()
+            try:
+                return pool.map(fn, tasks, chunksize=chunksize)
+            except BrokenProcessPool:
+                self._pool = None
+                return self._ensure_pool().map(fn, tasks, chunksize=chunksize)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+def submit_job(fn, *args, rows=None, retry=False, **kwargs):
+    return get_executor().submit(fn, *args, rows=rows, retry=retry, **kwargs)
+
+
+def parallel_map(fn, tasks, chunksize=1):
+    # Ağır ve bölünebilir hesaplar için. Tek çekirdekte ya da tek işçili havuzda süreçlere veri
+    # kopyalamak kazanç getirmez: görevler bu süreçte sırayla çalışır
+    executor = get_executor()
+    if executor.max_workers < 2 or (os.cpu_count() or 1) < 2:
+        return map(fn, tasks)
+    return executor.map(fn, tasks, chunksize=chunksize)
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Düşük bellek modu: sayısal sütunlar float32/int32'ye, metin sütunları (District, Segment)
+# kategoriye çevrilir. Küçük pod'larda büyük yüklemeler sığsın diye tahmin hassasiyetinden
+# (float32 ~7 basamak) feragat edilir. Sürece özel ayardır; arka plan işçileri ortamı devralır.
+# Ayar: PORTFOLIO_LEAN_MEMORY=1
+
+CATEGORY_COLUMNS = ('District', 'Segment')
+INT32 = np.iinfo(np.int32)
+
+
+def lean_enabled():
+    return os.environ.get("PORTFOLIO_LEAN_MEMORY", "0") == "1"
+
+
+def downcast_table(table, categories=CATEGORY_COLUMNS):
+    # Arrow tablosu pandas'a çevrilmeden önce daraltılır: float64 ara kopyası oluşmaz
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        if pa.types.is_float64(field.type):
+            fields.append(pa.field(field.name, pa.float32()))
+        elif pa.types.is_int64(field.type) and _fits_int32(pc.min_max(column).values()):
+            fields.append(pa.field(field.name, pa.int32()))
+        elif field.name in categories and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            fields.append(pa.field(field.name, pa.dictionary(pa.int32(), field.type)))
+        else:
+            fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+def _fits_int32(bounds):
+    low, high = (b.as_py() for b in bounds)
+    return low is None or (low >= INT32.min and high <= INT32.max)
+
+
+def downcast(df, categories=CATEGORY_COLUMNS):
+    # Sütunlar yerinde değiştirilir (yeni DataFrame oluşturulmaz)
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values.dtype) and values.dtype != np.float32:
+            df[col] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values.dtype) and values.dtype.itemsize > 4 and len(values) \
+                and INT32.min <= values.min() and values.max() <= INT32.max:
+            df[col] = values.astype(np.int32)
+        elif col in categories and not isinstance(values.dtype, pd.CategoricalDtype):
+            df[col] = values.astype('category')
+    return sort_categories(df, categories)
+
+
+def sort_categories(df, categories=CATEGORY_COLUMNS):
+    # Arrow sözlük sırası görülme sırasıdır; one-hot sütun sırası varsayılan modla aynı kalsın
+    for col in categories:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def lean_frame(df):
+    # Sayfalar ve toplu işler için: mod kapalıysa df olduğu gibi döner
+    return downcast(df) if lean_enabled() else df
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import nullcontext
+
+# Aşama bazlı süre / CPU / bellek ölçümü. Kapalıyken stage() paylaşılan boş bir bağlam döner
+# (tek bir özellik kontrolü kadar maliyet). Streamlit her oturumu kendi iş parçacığında
+# çalıştırdığı için aktif iz iş parçacığına özeldir.
+# Ortam değişkeni PORTFOLIO_PROFILE=1 ile her çalıştırmada açılır.
+
+logger = logging.getLogger("portfolio.profiling")
+
+ENV_FLAG = "PORTFOLIO_PROFILE"
+_NOOP = nullcontext()
+_local = threading.local()
+
+
+def env_enabled():
+    return os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes")
+
+
+def rss_bytes():
+    # Anlık RSS (Linux /proc); yoksa tepe RSS'e düşülür
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.records = []
+        self.origin = time.perf_counter()
+        self._depth = 0
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def total_ms(self):
+        return sum(r['wall_ms'] for r in self.records if r['depth'] == 0)
+
+    def to_chrome_trace(self):
+        # chrome://tracing ve Perfetto ile açılabilen "complete" olayları
+        events = [{
+            'name': r['stage'], 'cat': self.name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+            'ts': round(r['start_ms'] * 1000), 'dur': round(r['wall_ms'] * 1000),
+            'args': {'cpu_ms': r['cpu_ms'], 'mem_delta_mb': r['mem_delta_mb']}
+        } for r in self.records]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+class _Stage:
+    __slots__ = ('trace', 'name', 'wall', 'cpu', 'rss')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace._depth += 1
+        self.rss = rss_bytes()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        rss = rss_bytes()
+        trace = self.trace
+        trace._depth -= 1
+        record = {
+            'trace': trace.name,
+            'stage': self.name,
+            'depth': trace._depth,
+            'start_ms': round((self.wall - trace.origin) * 1000, 3),
+            'wall_ms': round((wall - self.wall) * 1000, 3),
+            'cpu_ms': round((cpu - self.cpu) * 1000, 3),
+            'mem_delta_mb': round((rss - self.rss) / 2**20, 2)
+        }
+        trace.records.append(record)
+        logger.info(json.dumps(record, ensure_ascii=False))
+        return False
+
+
+def enable_logging(level=logging.INFO):
+    # Yapılandırılmış (JSON) log satırlarını stderr'e yazar; tekrar çağrılırsa handler eklemez
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def start_trace(name, enabled=None):
+    # Yeni bir iz başlatır (enabled=None: ortam değişkenine bakılır); kapalıysa None
+    if enabled is None:
+        enabled = env_enabled()
+    _local.trace = Trace(name) if enabled else None
+    return _local.trace
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def stage(name):
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NOOP
+    return trace.stage(name)
@@ -0,0 +1,276 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Model kaydı: eğitilmiş modeller (XGBoost booster, RandomForest, scaler + KMeans) özellik
+# şemaları ve metrikleriyle birlikte diske yazılır; anahtar = model türü + veri hash'i + parametreler.
+# Meta veri (meta.json) hemen, model dosyası ilk kullanımda yüklenir (sklearn dizileri joblib ile
+# bellek eşlemeli). Kayıt biçimi veya kaydedildiği kütüphanenin sürümü değişen modeller geçersiz sayılır.
+# Model türü başına en fazla MAX_ENTRIES kayıt tutulur (en eskiler silinir).
+# Ayarlar: PORTFOLIO_MODEL_DIR, PORTFOLIO_MODEL_REGISTRY=0 (kapalı), PORTFOLIO_PREWARM_MODELS=1 (app.py)
+
+FORMAT_VERSION = 1
+# Kullanıcıya özel önbellek dizini (herkesin yazabildiği /tmp değil): joblib dosyaları unpickle edilir
+DEFAULT_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                           "portfolio", "models")
+MAX_LOADED = 8
+MAX_ENTRIES = 32
+
+
+def enabled():
+    return os.environ.get("PORTFOLIO_MODEL_REGISTRY", "1") != "0"
+
+
+# Kayıt biçimine göre sürümü izlenen kütüphaneler (dağıtım adları)
+FORMAT_LIBRARIES = {
+    'xgboost': ('xgboost',),
+    'joblib': ('scikit-learn', 'joblib')
+}
+
+
+@functools.lru_cache(maxsize=None)
+def library_versions(fmt):
+    # Paket meta verisinden okunur: kütüphaneler import edilmez
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for name in FORMAT_LIBRARIES[fmt]:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def dataset_hash(*frames):
+    h = hashlib.blake2b(digest_size=16)
+    for frame in frames:
+        h.update(repr(list(frame.columns) if isinstance(frame, pd.DataFrame) else frame.name).encode())
+        h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def model_key(kind, data_hash, params):
+    raw = json.dumps({'kind': kind, 'data': data_hash, 'params': params}, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def schema(frame):
+    return [{'name': str(c), 'dtype': str(t)} for c, t in frame.dtypes.items()]
+
+
+# Model türüne göre kaydet / yükle
+def _save_xgboost(model, path):
+    model.save_model(os.path.join(path, "model.ubj"))
+
+
+def _load_xgboost(path):
+    from xgboost import XGBRegressor
+    model = XGBRegressor()
+    model.load_model(os.path.join(path, "model.ubj"))
+    return model
+
+
+def _save_joblib(model, path):
+    import joblib
+    joblib.dump(model, os.path.join(path, "model.joblib"))
+
+
+def _load_joblib(path):
+    import joblib
+    return joblib.load(os.path.join(path, "model.joblib"), mmap_mode='r')
+
+
+FORMATS = {
+    'xgboost': (_save_xgboost, _load_xgboost),
+    'joblib': (_save_joblib, _load_joblib)
+}
+
+
+class UntrustedPathError(OSError):
+    pass
+
+
+def check_private(path):
+    # Başka kullanıcıya ait ya da grup/herkes tarafından yazılabilir dosya veya dizin yüklenmez
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise UntrustedPathError(f"refusing to load from untrusted path: {path}")
+
+
+class ModelEntry:
+    def __init__(self, registry, kind, key, meta):
+        self.registry = registry
+        self.kind = kind
+        self.key = key
+        self.meta = meta
+
+    @property
+    def path(self):
+        return self.registry.path(self.kind, self.key)
+
+    def load(self):
+        return self.registry._load(self)
+
+
+class ModelRegistry:
+    def __init__(self, root=None, max_loaded=MAX_LOADED):
+        self.root = root or os.environ.get("PORTFOLIO_MODEL_DIR", DEFAULT_DIR)
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+
+    def path(self, kind, key):
+        return os.path.join(self.root, kind, key)
+
+    def get(self, kind, key):
+        # Sadece meta veri okunur; model dosyası entry.load() ile yüklenir
+        try:
+            with open(os.path.join(self.path(kind, key), "meta.json")) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if meta.get('format_version') != FORMAT_VERSION or meta.get('format') not in FORMATS \
+                or meta.get('libraries') != library_versions(meta['format']):
+            return None
+        return ModelEntry(self, kind, key, meta)
+
+    def put(self, kind, key, model, fmt='joblib', **meta):
+        # Önce geçici dizine yazılır, sonra atomik olarak yerine taşınır (eşzamanlı oturumlar)
+        save, _ = FORMATS[fmt]
+        final = self.path(kind, key)
+        os.makedirs(os.path.dirname(final), mode=0o700, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(final), prefix=".tmp-")
+        meta = {
+            'kind': kind,
+            'key': key,
+            'format': fmt,
+            'format_version': FORMAT_VERSION,
+            'libraries': library_versions(fmt),
+            'created_at': time.time(),
+            **meta
+        }
+        try:
+            save(model, tmp)
+            with open(os.path.join(tmp, "meta.json"), 'w') as f:
+                json.dump(meta, f, indent=2, default=str)
+            # umask'tan bağımsız olarak sadece sahibi okuyup yazabilir (mkdtemp dizini zaten 0700)
+            for name in os.listdir(tmp):
+                os.chmod(os.path.join(tmp, name), 0o600)
+            if os.path.exists(final):
+                shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)
+        except OSError:
+            # Aynı anda başka oturum yazdıysa onun kaydı kullanılır
+            pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        entry = ModelEntry(self, kind, key, meta)
+        self._remember(entry, model)
+        self.evict(kind)
+        return entry
+
+    def evict(self, kind, max_entries=MAX_ENTRIES):
+        kind_dir = os.path.join(self.root, kind)
+        keys = []
+        for key in os.listdir(kind_dir):
+            if key.startswith("."):
+                continue
+            try:
+                keys.append((os.path.getmtime(os.path.join(kind_dir, key)), key))
+            except FileNotFoundError:
+                continue
+        removed = [key for _, key in sorted(keys)[:max(0, len(keys) - max_entries)]]
+        for key in removed:
+            shutil.rmtree(os.path.join(kind_dir, key), ignore_errors=True)
+        return removed
+
+    def _load(self, entry):
+        with self._lock:
+            model = self._loaded.get((entry.kind, entry.key))
+            if model is not None:
+                self._loaded.move_to_end((entry.kind, entry.key))
+                return model
+        _, load = FORMATS[entry.meta['format']]
+        # Kök dizinden model dosyalarına kadar tüm yol kullanıcıya özel olmalı
+        path = entry.path
+        for checked in (self.root, os.path.dirname(path), path, *(
+                os.path.join(path, name) for name in os.listdir(path))):
+            check_private(checked)
+        model = load(path)
+        self._remember(entry, model)
+        return model
+
+    def _remember(self, entry, model):
+        with self._lock:
+            self._loaded[(entry.kind, entry.key)] = model
+            self._loaded.move_to_end((entry.kind, entry.key))
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def fetch(self, kind, key):
+        # (model, meta) veya kayıt yoksa (None, None)
+        entry = self.get(kind, key)
+        if entry is None:
+            return None, None
+        try:
+            return entry.load(), entry.meta
+        except Exception:
+            # Bozuk/yarım kayıt: yeniden eğitilir ve üzerine yazılır
+            return None, None
+
+    def entries(self):
+        items = []
+        if not os.path.isdir(self.root):
+            return items
+        for kind in sorted(os.listdir(self.root)):
+            kind_dir = os.path.join(self.root, kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            for key in os.listdir(kind_dir):
+                if key.startswith("."):
+                    continue
+                entry = self.get(kind, key)
+                if entry is not None:
+                    items.append(entry.meta)
+        return sorted(items, key=lambda meta: meta['created_at'])
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def lookup(kind, params, *frames):
+    # Eğitim fonksiyonları için: (anahtar, model, meta); kayıt kapalıysa anahtar None
+    if not enabled():
+        return None, None, None
+    key = model_key(kind, dataset_hash(*frames), params)
+    model, meta = get_registry().fetch(kind, key)
+    return key, model, meta
+
+
+def store(kind, key, model, fmt='joblib', **meta):
+    if key is not None:
+        get_registry().put(kind, key, model, fmt=fmt, **meta)
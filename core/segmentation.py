@@ -0,0 +1,473 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import gammaln, betaln, digamma, hyp2f1
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import silhouette_score
+from core.profiling import stage
+from core.jobs import report_progress
+from core.governor import heavy_task
+from core import registry
+from core.memory import lean_enabled
+
+RFM_COLUMNS = ['Recency', 'Frequency', 'Monetary']
+
+SEGMENT_NAMES = {
+    "en": ["Champions", "Loyal", "Potential", "At Risk"],
+    "tr": ["Şampiyonlar", "Sadık", "Potansiyel", "Riskli"]
+}
+
+# Tarayıcıya gönderilecek maksimum nokta sayısı (üstünde yoğunluk modu)
+RENDER_POINT_BUDGET = 20000
+
+# Segmentlere göre pazarlama aksiyonları (ekranda ve CRM dışa aktarımında kullanılır)
+ACTIONS = {
+    "en": {
+        "Champions": "🎯 **VIP Treatment:** Exclusive early access, loyalty rewards, personal account manager",
+        "Loyal": "💎 **Retention Focus:** Premium membership offers, cross-sell opportunities",
+        "Potential": "🚀 **Activation Campaigns:** Limited-time discounts, engagement emails",
+        "At Risk": "⚠️ **Win-back Strategy:** Survey for feedback, special reactivation offers"
+    },
+    "tr": {
+        "Şampiyonlar": "🎯 **VIP Muamele:** Özel erken erişim, sadakat ödülleri, kişisel hesap yöneticisi",
+        "Sadık": "💎 **Elde Tutma:** Premium üyelik teklifleri, çapraz satış fırsatları",
+        "Potansiyel": "🚀 **Aktivasyon:** Sınırlı süreli indirimler, etkileşim e-postaları",
+        "Riskli": "⚠️ **Geri Kazanma:** Geri bildirim anketi, özel reaktivasyon teklifleri"
+    }
+}
+
+
+def generate_rfm_data():
+    np.random.seed(42)
+    data = pd.concat([
+        pd.DataFrame({'Recency': np.random.randint(1, 30, 100), 'Frequency': np.random.randint(20, 50, 100), 'Monetary': np.random.normal(5000, 1000, 100)}),
+        pd.DataFrame({'Recency': np.random.randint(1, 30, 150), 'Frequency': np.random.randint(1, 5, 150), 'Monetary': np.random.normal(500, 100, 150)}),
+        pd.DataFrame({'Recency': np.random.randint(100, 365, 150), 'Frequency': np.random.randint(1, 10, 150), 'Monetary': np.random.normal(1000, 300, 150)}),
+        pd.DataFrame({'Recency': np.random.randint(30, 90, 100), 'Frequency': np.random.randint(5, 15, 100), 'Monetary': np.random.normal(2000, 500, 100)})
+    ]).reset_index(drop=True)
+    return data
+
+
+def cluster_rfm(df, segment_names=SEGMENT_NAMES["en"], n_clusters=4, random_state=42, cache=False):
+    # StandardScaler + K-Means; kümeler ortalama harcamaya göre segment isimlerine eşlenir.
+    # Cluster ve Segment sütunları df'e eklenir. cache=True: aynı veri + parametrelerle eğitilmiş
+    # scaler/KMeans ve silhouette skoru model kaydından gelir (segment isimleri anahtara girmez)
+    params = {'n_clusters': n_clusters, 'random_state': random_state}
+    key, fitted, meta = None, None, None
+    if cache:
+        with stage("registry_lookup"):
+            key, fitted, meta = registry.lookup("segmentation", params, df[RFM_COLUMNS])
+
+    if fitted is not None:
+        scaler, kmeans = fitted
+        with stage("kmeans_predict"):
+            df['Cluster'] = kmeans.predict(scaler.transform(df[RFM_COLUMNS]))
+        silhouette_avg = meta['metrics']['silhouette']
+    else:
+        with stage("scale"):
+            scaler = StandardScaler()
+            scaled_data = scaler.fit_transform(df[RFM_COLUMNS])
+
+        # K-Means (OpenMP) ve silhouette (BLAS) çağrı başına iş parçacığı almaz; governor'ın süreç
+        # geneli native sınırı altında, ağır görev yuvasıyla çalışır
+        with heavy_task("kmeans"):
+            with stage("kmeans_fit"):
+                kmeans = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+                df['Cluster'] = kmeans.fit_predict(scaled_data)
+            report_progress(0.5)
+
+            # Silhouette Score (Kümeleme Kalitesi)
+            with stage("silhouette"):
+                silhouette_avg = silhouette_score(scaled_data, df['Cluster'])
+        registry.store("segmentation", key, (scaler, kmeans), params=params, rows=len(df),
+                       features=registry.schema(df[RFM_COLUMNS]), metrics={'silhouette': float(silhouette_avg)})
+
+    sorted_idx = df.groupby('Cluster')['Monetary'].mean().sort_values(ascending=False).index
+    if lean_enabled():
+        # Düşük bellek modu: Segment, ara metin sütunu oluşturmadan doğrudan kategori kodlarından
+        codes = np.full(n_clusters, -1, dtype=np.int8)
+        names = list(segment_names)[:len(sorted_idx)]
+        codes[sorted_idx.to_numpy()[:len(names)]] = np.arange(len(names))
+        df['Segment'] = pd.Categorical.from_codes(codes[df['Cluster'].to_numpy()], categories=names)
+    else:
+        mapping = {old: new for old, new in zip(sorted_idx, segment_names)}
+        df['Segment'] = df['Cluster'].map(mapping)
+    return df, silhouette_avg, (scaler, kmeans)
+
+
+def bin_rfm_3d(df, bins=16):
+    # Her segmenti 3B ızgaraya böl: hücre başına ortalama konum + müşteri sayısı
+    values = df[RFM_COLUMNS].to_numpy(dtype=float)
+    lo = values.min(axis=0)
+    span = values.max(axis=0) - lo
+    span[span == 0] = 1.0
+    idx = np.minimum(((values - lo) / span * bins).astype(np.int64), bins - 1)
+    cell = (idx[:, 0] * bins + idx[:, 1]) * bins + idx[:, 2]
+
+    grid = pd.DataFrame(values, columns=RFM_COLUMNS)
+    grid['Segment'] = df['Segment'].to_numpy()
+    grid['Cell'] = cell
+    binned = grid.groupby(['Segment', 'Cell'], sort=False, observed=True).agg(
+        Recency=('Recency', 'mean'),
+        Frequency=('Frequency', 'mean'),
+        Monetary=('Monetary', 'mean'),
+        Count=('Recency', 'size')
+    ).reset_index().drop(columns='Cell')
+    return binned
+
+
+def sample_rfm(df, budget=RENDER_POINT_BUDGET, seed=42):
+    # Segment oranlarını koruyan tabakalı örneklem
+    if len(df) <= budget:
+        return df
+    return df.groupby('Segment', group_keys=False, observed=True).sample(
+        frac=budget / len(df), random_state=seed
+    )
+
+
+# --- OLASILIKSAL CLV (BG/NBD + GAMMA-GAMMA) ---
+def rfm_to_bgnbd(df):
+    # RFM -> (x, t_x, T): tekrar alım sayısı, ilk-son alım arası süre, müşteri yaşı
+    # 'T' sütunu yoksa tüm müşterilerin gözlem penceresinin başında geldiği varsayılır
+    recency = df['Recency'].to_numpy(dtype=float)
+    T = df['T'].to_numpy(dtype=float) if 'T' in df.columns else np.full(len(df), recency.max())
+    x = np.maximum(df['Frequency'].to_numpy(dtype=float) - 1, 0)
+    t_x = np.where(x > 0, np.clip(T - recency, 0, None), 0.0)
+    return x, t_x, T
+
+
+def _unique_profiles(*cols):
+    # Aynı profile sahip müşteriler bir kez hesaplanır; counts olabilirlikte ağırlıktır
+    inverse = np.zeros(len(cols[0]), dtype=np.int64)
+    for col in cols:
+        codes, uniques = pd.factorize(col)
+        inverse = pd.factorize(inverse * len(uniques) + codes)[0]
+    # factorize kodları ilk görülme sırasıyla verir: kümülatif maksimumun arttığı yerler
+    first_idx = np.flatnonzero(np.diff(np.maximum.accumulate(inverse), prepend=-1) > 0)
+    profiles = np.column_stack([np.asarray(col)[first_idx] for col in cols])
+    return profiles, inverse, np.bincount(inverse)
+
+
+def _bgnbd_loglik(params, x, t_x, T):
+    r, alpha, a, b = params
+    a1 = gammaln(r + x) - gammaln(r) + r * np.log(alpha)
+    a2 = betaln(a, b + x) - betaln(a, b)
+    a3 = -(r + x) * np.log(alpha + T)
+    a4 = np.where(
+        x > 0,
+        np.log(a) - np.log(np.maximum(b + x - 1, 1e-12)) - (r + x) * np.log(alpha + t_x),
+        -np.inf
+    )
+    return a1 + a2 + np.logaddexp(a3, a4)
+
+
+def fit_bgnbd(x, t_x, T):
+    profiles, _, counts = _unique_profiles(x, t_x, T)
+    px_, ptx, pT = profiles.T
+    scale = 10.0 / pT.max()
+
+    def neg_ll(log_params):
+        return -(counts * _bgnbd_loglik(np.exp(log_params), px_, ptx * scale, pT * scale)).sum() / counts.sum()
+
+    res = minimize(neg_ll, np.zeros(4), method='Nelder-Mead', options={'maxiter': 2000, 'xatol': 1e-6, 'fatol': 1e-9})
+    r, alpha, a, b = np.exp(res.x)
+    return {'r': r, 'alpha': alpha / scale, 'a': a, 'b': b}
+
+
+def bgnbd_expected_purchases(params, t, x, t_x, T):
+    r, alpha, a, b = params['r'], params['alpha'], params['a'], params['b']
+    hyp = hyp2f1(r + x, b + x, a + b + x - 1, t / (alpha + T + t))
+    numerator = (a + b + x - 1) / (a - 1) * (1 - ((alpha + T) / (alpha + T + t)) ** (r + x) * hyp)
+    denominator = 1 + (x > 0) * a / np.maximum(b + x - 1, 1e-12) * ((alpha + T) / (alpha + t_x)) ** (r + x)
+    return numerator / denominator
+
+
+def fit_gamma_gamma(x, m):
+    mask = (x > 0) & (m > 0)
+    if not mask.any():
+        # Model sadece tekrar alım yapan müşterilerin ortalama harcamasından öğrenir
+        raise ValueError("Gamma-Gamma needs customers with repeat purchases and positive spend; none found")
+    profiles, _, counts = _unique_profiles(x[mask], m[mask])
+    px_, pm = profiles.T
+    scale = 1.0 / np.average(pm, weights=counts)
+    pm = pm * scale
+
+    # Sadece x'e bağlı terimler tekil x değerleri üzerinde, m'ye bağlı sabitler
+    # yeterli istatistik olarak bir kez hesaplanır
+    xs, x_inv = np.unique(px_, return_inverse=True)
+    cx = np.bincount(x_inv, weights=counts)
+    s_xlogm = (counts * px_ * np.log(pm)).sum()
+    s_logm = (counts * np.log(pm)).sum()
+    n_total = counts.sum()
+
+    def neg_ll(log_params):
+        p, q, v = np.exp(log_params)
+        log_xmv = np.log(px_ * pm + v)
+        ll = ((cx * (gammaln(p * xs + q) - gammaln(p * xs) + p * xs * np.log(xs))).sum()
+              + n_total * (q * np.log(v) - gammaln(q))
+              + p * s_xlogm - s_logm
+              - (counts * (p * px_ + q) * log_xmv).sum())
+        d_p = ((cx * xs * (digamma(p * xs + q) - digamma(p * xs) + np.log(xs))).sum()
+               + s_xlogm - (counts * px_ * log_xmv).sum())
+        d_q = ((cx * digamma(p * xs + q)).sum()
+               + n_total * (np.log(v) - digamma(q)) - (counts * log_xmv).sum())
+        d_v = n_total * q / v - (counts * (p * px_ + q) / (px_ * pm + v)).sum()
+        grad = np.array([d_p * p, d_q * q, d_v * v])
+        return -ll / n_total, -grad / n_total
+
+    res = minimize(neg_ll, np.zeros(3), jac=True, method='L-BFGS-B')
+    p, q, v = np.exp(res.x)
+    return {'p': p, 'q': q, 'v': v / scale}
+
+
+def gamma_gamma_expected_value(params, x, m):
+    p, q, v = params['p'], params['q'], params['v']
+    return p * (v + x * np.where(x > 0, m, 0)) / (p * x + q - 1)
+
+
+def predict_clv(df, horizon=90):
+    # Müşteri başına beklenen alım sayısı ve beklenen değer (horizon gün)
+    x, t_x, T = rfm_to_bgnbd(df)
+    m = df['Monetary'].to_numpy(dtype=float) / np.maximum(df['Frequency'].to_numpy(dtype=float), 1)
+
+    bg_params = fit_bgnbd(x, t_x, T)
+    gg_params = fit_gamma_gamma(x, m)
+
+    profiles, inverse, _ = _unique_profiles(x, t_x, T)
+    purchases = bgnbd_expected_purchases(bg_params, horizon, *profiles.T)[inverse]
+    avg_value = gamma_gamma_expected_value(gg_params, x, m)
+
+    result = pd.DataFrame({
+        'Predicted_Purchases': purchases,
+        'Expected_Avg_Value': avg_value,
+        'Predicted_CLV': purchases * avg_value
+    }, index=df.index)
+    return result, bg_params, gg_params
+
+
+# --- AKIŞ TABANLI RFM SKORLAMA (KLL QUANTILE SKETCH) ---
+class KLLSketch:
+    # Birleştirilebilir yaklaşık quantile özeti: seviye h'deki her eleman 2^h ağırlık taşır
+    def __init__(self, k=200, seed=42):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                odd = len(items) % 2
+                promoted = items[:len(items) - odd][self.rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = items[len(items) - odd:]
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, qs):
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            # Boş özette (ör. tamamı NaN sütun) quantile tanımsız
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items)
+        cum_weights = np.cumsum(weights[order])
+        ranks = qs * cum_weights[-1]
+        pos = np.minimum(np.searchsorted(cum_weights, ranks, side='left'), len(items) - 1)
+        return items[order][pos]
+
+
+def build_rfm_sketches(chunks, k=200):
+    # chunks: DataFrame parçaları (ör. pd.read_csv(..., chunksize=...))
+    sketches = {col: KLLSketch(k) for col in RFM_COLUMNS}
+    for chunk in chunks:
+        for col in RFM_COLUMNS:
+            sketches[col].update(chunk[col].to_numpy(dtype=float))
+    return sketches
+
+
+def merge_rfm_sketches(*sketch_sets):
+    merged = {col: KLLSketch(sketch_sets[0][col].k) for col in RFM_COLUMNS}
+    for sketches in sketch_sets:
+        for col in RFM_COLUMNS:
+            merged[col].merge(sketches[col])
+    return merged
+
+
+def score_rfm(df, sketches):
+    # Klasik 1-5 RFM skorları; düşük Recency daha iyi olduğu için ters çevrilir
+    scores = pd.DataFrame(index=df.index)
+    for col in RFM_COLUMNS:
+        edges = sketches[col].quantile([0.2, 0.4, 0.6, 0.8])
+        score = np.searchsorted(edges, df[col].to_numpy(dtype=float), side='right') + 1
+        scores[f'{col[0]}_Score'] = (6 - score if col == 'Recency' else score).astype(np.int8)
+    scores['RFM_Score'] = scores[['R_Score', 'F_Score', 'M_Score']].sum(axis=1).astype(np.int8)
+    return scores
+
+
+# --- SEGMENT GEÇİŞ MATRİSİ (SNAPSHOT KARŞILAŞTIRMA) ---
+def segment_snapshot(customer_ids, segments, segment_names):
+    # Müşteri ID'sine göre sıralı, int8 segment kodları
+    ids = np.asarray(customer_ids)
+    order = np.argsort(ids, kind='stable')
+    # Listede olmayan ya da boş segmentler -1
+    codes = pd.Index(segment_names).get_indexer(np.asarray(segments, dtype=object)).astype(np.int8)
+    return {'ids': ids[order], 'codes': codes[order], 'segments': list(segment_names)}
+
+
+def save_snapshot(path, snapshot):
+    np.savez_compressed(path, ids=snapshot['ids'], codes=snapshot['codes'], segments=np.array(snapshot['segments']))
+
+
+def load_snapshot(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {'ids': data['ids'], 'codes': data['codes'], 'segments': data['segments'].tolist()}
+
+
+def segment_migration(prev, curr):
+    # Sıralı ID dizileri üzerinde tek geçişte eşleştirme; yeni müşteriler 'New' satırına,
+    # kaybedilenler 'Lost' sütununa, listede olmayan segmentler (kod -1) 'Unknown' satır/sütununa düşer
+    if list(prev['segments']) != list(curr['segments']):
+        raise ValueError(f"Snapshots use different segment lists: {list(prev['segments'])} "
+                         f"vs {list(curr['segments'])}")
+    segments = list(curr['segments'])
+    k = len(segments)
+    n = k + 2
+    rows, cols = segments + ['Unknown', 'New'], segments + ['Unknown', 'Lost']
+    if len(curr['ids']) == 0:
+        # Güncel görüntü boş: karşılaştırılacak müşteri yok, boş matris ve akış tablosu
+        matrix = pd.DataFrame(np.zeros((n, n), dtype=np.int64), index=rows, columns=cols)
+        flows = pd.DataFrame(columns=['Retained', 'Outflow', 'Inflow', 'Net Change', 'Churn Rate %'],
+                             index=pd.Index([], name='Segment'))
+        return matrix, flows
+    pos = np.searchsorted(curr['ids'], prev['ids'])
+    pos_clipped = np.minimum(pos, len(curr['ids']) - 1)
+    matched = (pos < len(curr['ids'])) & (curr['ids'][pos_clipped] == prev['ids'])
+
+    from_codes = np.where(prev['codes'] < 0, k, prev['codes']).astype(np.int64)
+    curr_codes = np.where(curr['codes'] < 0, k, curr['codes']).astype(np.int64)
+    to_codes = np.where(matched, curr_codes[pos_clipped], k + 1)
+
+    seen = np.zeros(len(curr['ids']), dtype=bool)
+    seen[pos_clipped[matched]] = True
+
+    cells = np.concatenate([from_codes * n + to_codes, (k + 1) * n + curr_codes[~seen]])
+    counts = np.bincount(cells, minlength=n * n).reshape(n, n)
+
+    matrix = pd.DataFrame(counts, index=rows, columns=cols)
+    diag = np.diag(counts)[:k]
+    outflow = counts[:k].sum(axis=1) - diag
+    inflow = counts[:, :k].sum(axis=0) - diag
+    prev_total = counts[:k].sum(axis=1)
+    flows = pd.DataFrame({
+        'Retained': diag,
+        'Outflow': outflow,
+        'Inflow': inflow,
+        'Net Change': inflow - outflow,
+        'Churn Rate %': np.round(outflow / np.maximum(prev_total, 1) * 100, 1)
+    }, index=pd.Index(segments, name='Segment'))
+    return matrix, flows
+
+
+# --- CRM DIŞA AKTARIM (PARÇALI, SEGMENT BAZLI BÖLÜMLENMİŞ) ---
+def export_segments(df, out_dir, extra=None, fmt='parquet', chunk_size=500_000):
+    # Her segment out_dir/<segment>/ altına yazılır; bellekte sadece bir parça tutulur
+    # extra: df ile aynı indekse sahip ek sütunlar (skorlar, CLV tahmini vb.)
+    segment_cat = pd.Categorical(df['Segment'])
+    lookup = {**ACTIONS['en'], **ACTIONS['tr']}
+    # Bilinmeyen segmentlerin eylemi boş metindir; tekrar eden metinler tek kategoriye indirilir
+    action_codes, action_text = pd.factorize(
+        np.array([lookup.get(name, '').replace('**', '') for name in segment_cat.categories], dtype=object)
+    )
+    # Sona eklenen -1: kod -1 (boş segment) eylemde de -1'e eşlenir
+    action_codes = np.append(action_codes, -1)
+    codes = segment_cat.codes
+    base_cols = [col for col in ['CustomerID'] + RFM_COLUMNS if col in df.columns]
+
+    writers = {}
+    row_counts = {}
+    try:
+        for start in range(0, len(df), chunk_size):
+            stop = min(start + chunk_size, len(df))
+            chunk_codes = codes[start:stop]
+            chunk = df.iloc[start:stop][base_cols]
+            if 'CustomerID' not in chunk.columns:
+                chunk.insert(0, 'CustomerID', df.index[start:stop])
+            if extra is not None:
+                chunk = pd.concat([chunk, extra.iloc[start:stop]], axis=1)
+            # Kategorik sütunlar kod dizisini kopyalamadan kullanır
+            chunk = chunk.assign(
+                Segment=pd.Categorical.from_codes(chunk_codes, segment_cat.categories),
+                Action=pd.Categorical.from_codes(action_codes[chunk_codes], action_text)
+            )
+
+            # Segmenti boş (NaN, kod -1) satırlar sıralamada başa gelir ve hiçbir klasöre yazılmaz
+            order = np.argsort(chunk_codes, kind='stable')
+            bounds = np.cumsum(np.bincount(chunk_codes + 1, minlength=len(segment_cat.categories) + 1))
+            for code, name in enumerate(segment_cat.categories):
+                if bounds[code] == bounds[code + 1]:
+                    continue
+                part = chunk.iloc[order[bounds[code]:bounds[code + 1]]]
+                if name not in writers:
+                    part_dir = os.path.join(out_dir, str(name))
+                    os.makedirs(part_dir, exist_ok=True)
+                    writers[name] = _open_part_writer(os.path.join(part_dir, f"part-0.{fmt}"), fmt, part)
+                writers[name](part)
+                row_counts[name] = row_counts.get(name, 0) + len(part)
+    finally:
+        for write in writers.values():
+            write(None)
+    return row_counts
+
+
+def _open_part_writer(path, fmt, first_part):
+    # part=None dosyayı kapatır
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(first_part, preserve_index=False)
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        # CSV'de kategorik sütunlar düz metin olarak yazılır
+        schema = pa.schema([
+            pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f for f in schema
+        ])
+        writer = pcsv.CSVWriter(path, schema)
+
+    def write(part):
+        if part is None:
+            writer.close()
+        else:
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            writer.write_table(table.cast(schema) if fmt != 'parquet' else table)
+    return write
@@ -0,0 +1,235 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from core.profiling import stage
+from core.jobs import in_job, report_progress
+from core.governor import heavy_task
+from core import registry
+
+# BÖLGE KATSAYILARI
+DISTRICTS = {
+    'Beşiktaş': {'base': 150000, 'mult': 2.0},
+    'Kadıköy': {'base': 130000, 'mult': 1.8},
+    'Şişli': {'base': 110000, 'mult': 1.6},
+    'Üsküdar': {'base': 95000, 'mult': 1.4},
+    'Başakşehir': {'base': 65000, 'mult': 1.1},
+    'Esenyurt': {'base': 35000, 'mult': 0.8}
+}
+
+PROPERTY_COLUMNS = ['District', 'Size', 'Age', 'Rooms']
+
+
+def generate_market_data(dist_map=DISTRICTS, n_samples=2000):
+    np.random.seed(42)
+    data = []
+    for _ in range(n_samples):
+        d_name = np.random.choice(list(dist_map.keys()))
+        d_props = dist_map[d_name]
+
+        size = np.random.randint(50, 250)
+        age = np.random.randint(0, 50)
+        rooms = np.random.randint(1, 6)
+
+        base_value = size * d_props['base'] * d_props['mult']
+        age_penalty_rate = 0.015 * age
+        if age > 30:
+            age_penalty_rate += 0.20
+
+        current_value = base_value * (1 - min(age_penalty_rate, 0.70))
+        room_bonus = rooms * 150000
+        final_price = current_value + room_bonus
+        final_price += np.random.normal(0, final_price * 0.05)
+
+        data.append([d_name, size, age, rooms, final_price])
+
+    return pd.DataFrame(data, columns=['District', 'Size', 'Age', 'Rooms', 'Price'])
+
+
+# MODEL EĞİTİMİ
+def train_valuation(df, n_estimators=100, max_depth=10, random_state=42, cache=False):
+    # cache=True: aynı veri + parametrelerle eğitilmiş orman ve eğitim metrikleri model kaydından gelir
+    with stage("feature_engineering"):
+        # One-hot sütunları tek birleştirmeyle (get_dummies(df) + drop iki tam kopya yapıyordu)
+        X = pd.concat([df.drop(columns=['District', 'Price']), pd.get_dummies(df['District'], prefix='District')],
+                      axis=1)
+        y = df['Price']
+
+    params = {'n_estimators': n_estimators, 'max_depth': max_depth, 'random_state': random_state}
+    key = None
+    if cache:
+        with stage("registry_lookup"):
+            key, model, meta = registry.lookup("valuation", params, X, y)
+        if model is not None:
+            return model, pd.Index([f['name'] for f in meta['features']]), meta['metrics']
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, max_depth=max_depth)
+    with heavy_task("random_forest") as threads:
+        model.set_params(n_jobs=threads)
+        with stage("fit"):
+            if in_job():
+                # Arka plan işinde ağaçlar parça parça eklenir (warm_start); sonuç tek seferlik fit ile aynı
+                model.set_params(warm_start=True)
+                for n_trees in range(10, n_estimators + 10, 10):
+                    model.set_params(n_estimators=min(n_trees, n_estimators))
+                    model.fit(X, y)
+                    report_progress(0.9 * model.n_estimators / n_estimators)
+                model.set_params(warm_start=False)
+            else:
+                model.fit(X, y)
+
+        # MODEL PERFORMANSI (eğitim verisi üzerinde)
+        with stage("predict_train"):
+            train_pred = model.predict(X)
+    metrics = {
+        'mae': mean_absolute_error(y, train_pred),
+        'r2': r2_score(y, train_pred),
+        'mape': np.mean(np.abs((y - train_pred) / y)) * 100
+    }
+    registry.store("valuation", key, model, params=params, rows=len(X), features=registry.schema(X),
+                   target='Price', metrics={k: float(v) for k, v in metrics.items()})
+    return model, X.columns, metrics
+
+
+def encode_properties(properties, columns):
+    # Yeni ilanları eğitimdeki one-hot sütun düzenine hizala (bilinmeyen ilçe: tüm bayraklar 0)
+    X = pd.DataFrame(0, index=properties.index, columns=columns)
+    for col in ('Size', 'Age', 'Rooms'):
+        X[col] = properties[col].to_numpy()
+    district_cols = pd.Index(columns).get_indexer('District_' + properties['District'].astype(str))
+    known = district_cols >= 0
+    values = X.to_numpy(dtype=float)
+    values[np.flatnonzero(known), district_cols[known]] = 1
+    return pd.DataFrame(values, index=properties.index, columns=columns)
+
+
+def value_properties(model, columns, properties):
+    return model.predict(encode_properties(properties, columns))
+
+
+# --- AKAN İLANLARLA İLÇE FİYAT ENDEKSİ ---
+class DistrictPriceIndex:
+    # Zaman kovası (varsayılan 1 gün) ve ilçe başına (adet, toplam, kareler toplamı) tutulur; ilan
+    # eklemek O(1). window (kova sayısı) verilirse en yeni kovadan window kova geride kalanlar
+    # toplamdan düşülür, pencere dışındaki geç ilanlar atlanır. Kovalar geçmiş olarak saklanır
+    # (en fazla max_buckets), dışa aktarma kova x ilçe satırıdır
+    def __init__(self, bucket_seconds=86400, window=None, max_buckets=365):
+        self.bucket_seconds = bucket_seconds
+        self.window = window
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.totals = {}
+        self.latest = None
+        self.version = 0
+        self.sources = set()
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def copy(self):
+        # Bağımsız kopya (paylaşılan taban endeks değiştirilmeden oturuma özel güncellemeler için)
+        clone = DistrictPriceIndex(self.bucket_seconds, self.window, self.max_buckets)
+        with self._lock:
+            clone.buckets = {b: {d: list(v) for d, v in stats.items()} for b, stats in self.buckets.items()}
+            clone.totals = {d: list(v) for d, v in self.totals.items()}
+            clone.latest = self.latest
+            clone.version = self.version
+            clone.sources = set(self.sources)
+            clone._active = set(self._active)
+        return clone
+
+    def _accumulate(self, bucket, district, count, total, sumsq):
+        stats = self.buckets.setdefault(bucket, {}).setdefault(district, [0, 0.0, 0.0])
+        stats[0] += count
+        stats[1] += total
+        stats[2] += sumsq
+        if self.window is None or bucket > self.latest - self.window:
+            if self.window is not None:
+                self._active.add(bucket)
+            totals = self.totals.setdefault(district, [0, 0.0, 0.0])
+            totals[0] += count
+            totals[1] += total
+            totals[2] += sumsq
+
+    def _advance(self, bucket):
+        if self.latest is not None and bucket <= self.latest:
+            return
+        self.latest = bucket
+        if self.window is not None:
+            # Süresi dolan kovalar toplamdan düşülür (kova başına O(ilçe))
+            for old in sorted(b for b in self._active if b <= bucket - self.window):
+                self._active.discard(old)
+                for district, (count, total, sumsq) in self.buckets[old].items():
+                    totals = self.totals[district]
+                    totals[0] -= count
+                    totals[1] -= total
+                    totals[2] -= sumsq
+                    if totals[0] == 0:
+                        del self.totals[district]
+        # Geçmiş sınırı: penceredeki kovalar silinmez (toplamdan düşülmeleri gerekir)
+        inactive = sorted(b for b in self.buckets if b not in self._active)
+        for old in inactive[:max(0, len(self.buckets) - self.max_buckets)]:
+            del self.buckets[old]
+
+    def _late(self, bucket):
+        return self.window is not None and self.latest is not None and bucket <= self.latest - self.window
+
+    def add(self, district, price, ts=None):
+        bucket = int((time.time() if ts is None else ts) // self.bucket_seconds)
+        with self._lock:
+            if self._late(bucket):
+                return False
+            self._advance(bucket)
+            self._accumulate(bucket, district, 1, float(price), float(price) ** 2)
+            self.version += 1
+        return True
+
+    def update(self, districts, prices, timestamps=None, source=None):
+        # Toplu ekleme (ilk yükleme veya ilan partisi): önce kova x ilçe toplamları, sonra O(grup) birleştirme.
+        # source verilirse aynı parti ikinci kez eklenmez
+        if timestamps is None:
+            buckets = np.full(len(prices), int(time.time() // self.bucket_seconds))
+        else:
+            dates = pd.to_datetime(pd.Series(timestamps), errors='coerce')
+            # Tarihi okunamayan ilanlar (NaT) aşağıdaki dropna ile atlanır
+            buckets = ((dates - pd.Timestamp(0)).dt.total_seconds() // self.bucket_seconds).to_numpy()
+        prices = pd.Series(prices).to_numpy(dtype=float)
+        grouped = pd.DataFrame({
+            'bucket': buckets, 'district': pd.Series(districts).astype(str).to_numpy(),
+            'price': prices, 'sq': prices ** 2
+        }).dropna().groupby(['bucket', 'district'], sort=True).agg(
+            count=('price', 'size'), total=('price', 'sum'), sumsq=('sq', 'sum'))
+        with self._lock:
+            if source is not None:
+                if source in self.sources:
+                    return 0
+                self.sources.add(source)
+            added = 0
+            for (bucket, district), row in zip(grouped.index, grouped.itertuples(index=False)):
+                bucket = int(bucket)
+                if self._late(bucket):
+                    continue
+                self._advance(bucket)
+                self._accumulate(bucket, district, int(row.count), row.total, row.sumsq)
+                added += int(row.count)
+            self.version += 1
+        return added
+
+    @staticmethod
+    def _describe(count, total, sumsq):
+        mean = total / count
+        var = max(sumsq - total * mean, 0.0) / (count - 1) if count > 1 else 0.0
+        return mean, np.sqrt(var)
+
+    def snapshot(self):
+        # Pencere içi ilçe istatistikleri, ortalama fiyata göre artan
+        with self._lock:
+            rows = [(d, c, *self._describe(c, t, s)) for d, (c, t, s) in self.totals.items() if c > 0]
+        return pd.DataFrame(rows, columns=['District', 'Count', 'Mean', 'Std']).sort_values('Mean', ignore_index=True)
+
+    def history(self):
+        with self._lock:
+            rows = [(pd.Timestamp(b * self.bucket_seconds, unit='s'), d, c, *self._describe(c, t, s))
+                    for b in sorted(self.buckets) for d, (c, t, s) in sorted(self.buckets[b].items())]
+        return pd.DataFrame(rows, columns=['Period', 'District', 'Count', 'Mean', 'Std'])
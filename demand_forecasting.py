@@ -2,9 +2,10 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from xgboost import XGBRegressor
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import datetime
+from core.forecasting import process_data, generate_synthetic_data, train_forecast
+from core.profiling import stage
+from core.datastore import read_upload
+from ui_helpers import run_job, cached_plotly_chart
 
 def run(lang='en'):
     # --- DİL AYARLARI ---
@@ -71,37 +72,19 @@ def run(lang='en'):
     # --- DOSYA YÜKLEME ALANI ---
     uploaded_file = st.file_uploader(content["upload_label"][lang], type=["csv"], help=content["upload_help"][lang])
 
-    # --- VERİ İŞLEME FONKSİYONU ---
-    def process_data(df_input):
-        df_input['Date'] = pd.to_datetime(df_input['Date'], errors='coerce')
-        df_input = df_input.dropna(subset=['Date'])
-        df_input = df_input.sort_values('Date')
-        
-        # Feature Engineering
-        df_input['lag_7'] = df_input['Sales'].shift(7)
-        df_input['rolling_mean'] = df_input['Sales'].shift(1).rolling(7).mean()
-        df_input['day_of_week'] = df_input['Date'].dt.dayofweek
-        return df_input.dropna()
-
     # --- SENTETİK VERİ ÜRETİCİ ---
-    @st.cache_data
-    def generate_synthetic_data():
-        start_date = datetime.date(2023, 1, 1)
-        dates = pd.date_range(start=start_date, periods=730, freq='D')
-        trend = np.linspace(0, 50, 730)
-        seasonality = 20 * np.sin(np.linspace(0, 3 * np.pi, 730))
-        noise = np.random.normal(0, 10, 730)
-        sales = 100 + trend + seasonality + noise
-        return pd.DataFrame({"Date": dates, "Sales": np.maximum(sales, 0)})
+    get_synthetic_data = st.cache_data(generate_synthetic_data)
 
     # --- AKIŞ KONTROLÜ ---
     df = None
     
     if uploaded_file is not None:
         try:
-            df_uploaded = pd.read_csv(uploaded_file)
+            with stage("ingest"):
+                df_uploaded = read_upload(uploaded_file)
             if 'Date' in df_uploaded.columns and 'Sales' in df_uploaded.columns:
-                df = process_data(df_uploaded)
+                with stage("feature_engineering"):
+                    df = process_data(df_uploaded)
                 st.success("✅ Veri başarıyla yüklendi!" if lang == 'tr' else "✅ Data uploaded successfully!")
             else:
                 st.error(content["error_cols"][lang])
@@ -111,28 +94,20 @@ def run(lang='en'):
     if df is None:
         if uploaded_file is None:
             st.info(content["use_demo"][lang])
-        df_raw = generate_synthetic_data()
-        df = process_data(df_raw)
+        with stage("ingest"):
+            df_raw = get_synthetic_data()
+        with stage("feature_engineering"):
+            df = process_data(df_raw)
 
     # --- MODEL EĞİTİMİ ---
-    X = df[['lag_7', 'rolling_mean', 'day_of_week']]
-    y = df['Sales']
-
-    split_point = int(len(X) * 0.8)
-    
-    X_train, y_train = X.iloc[:split_point], y.iloc[:split_point]
-    X_test, y_test = X.iloc[split_point:], y.iloc[split_point:]
+    with stage("train_forecast"):
+        forecast = run_job(train_forecast, df, rows=len(df), lang=lang, cache=True)
+    split_point = forecast['split_point']
+    y_train, y_test = forecast['y_train'], forecast['y_test']
+    predictions = forecast['predictions']
 
-    model = XGBRegressor(n_estimators=100, learning_rate=0.05, random_state=42)
-    model.fit(X_train, y_train)
-    
-    predictions = model.predict(X_test)
-    
     # PERFORMANS METRİKLERİ
-    rmse = np.sqrt(mean_squared_error(y_test, predictions))
-    mae = mean_absolute_error(y_test, predictions)
-    r2 = r2_score(y_test, predictions)
-    mape = np.mean(np.abs((y_test - predictions) / y_test)) * 100
+    rmse, mae, r2, mape = (forecast['metrics'][k] for k in ('rmse', 'mae', 'r2', 'mape'))
 
     # --- PERFORMANS KARTLARI ---
     st.subheader(content["performance"][lang])
@@ -144,42 +119,44 @@ def run(lang='en'):
     col4.metric("MAPE", f"{mape:.1f}%", help="Mean Absolute Percentage Error")
 
     # --- GRAFİK KISMI ---
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=df['Date'].iloc[:split_point], 
-        y=y_train, 
-        name="Geçmiş/History",
-        line=dict(color='gray', width=1),
-        opacity=0.6
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df['Date'].iloc[split_point:], 
-        y=y_test, 
-        name="Gerçek/Actual",
-        line=dict(color='#636EFA', width=2)
-    ))
-
-    fig.add_trace(go.Scatter(
-        x=df['Date'].iloc[split_point:], 
-        y=predictions, 
-        name="AI Tahmini/Forecast",
-        line=dict(color='#EF553B', width=3, dash='dot')
-    ))
-
-    split_date = df['Date'].iloc[split_point]
-    fig.add_vline(x=split_date, line_width=2, line_dash="dash", line_color="green")
-
-    fig.update_layout(
-        title=content["chart_title"][lang],
-        template="plotly_white",
-        hovermode="x unified",
-        height=500
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    reorder_point = predictions.mean()
+    with stage("figure_build"):
+        fig = go.Figure()
+
+        fig.add_trace(go.Scatter(
+            x=df['Date'].iloc[:split_point], 
+            y=y_train, 
+            name="Geçmiş/History",
+            line=dict(color='gray', width=1),
+            opacity=0.6
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=df['Date'].iloc[split_point:], 
+            y=y_test, 
+            name="Gerçek/Actual",
+            line=dict(color='#636EFA', width=2)
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=df['Date'].iloc[split_point:], 
+            y=predictions, 
+            name="AI Tahmini/Forecast",
+            line=dict(color='#EF553B', width=3, dash='dot')
+        ))
+
+        split_date = df['Date'].iloc[split_point]
+        fig.add_vline(x=split_date, line_width=2, line_dash="dash", line_color="green")
+
+        fig.update_layout(
+            title=content["chart_title"][lang],
+            template="plotly_white",
+            hovermode="x unified",
+            height=500
+        )
+    with stage("figure_render"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    reorder_point = forecast['reorder_point']
     st.info(content["alert"][lang].format(reorder_point))
 
     # --- ROI HESAPLAYICI ---
@@ -210,24 +187,26 @@ def run(lang='en'):
     
     st.success(content["savings"][lang].format(savings))
     
-    # Mini görselleştirme
-    savings_breakdown = pd.DataFrame({
-        'Category': ['Before AI' if lang == 'en' else 'AI Öncesi', 
-                     'After AI' if lang == 'en' else 'AI Sonrası'],
-        'Cost': [monthly_sales * (overstock_rate / 100) * 12, 
-                 monthly_sales * (overstock_rate / 100) * 12 - savings]
-    })
-    
-    fig_roi = go.Figure(data=[
-        go.Bar(x=savings_breakdown['Category'], 
-               y=savings_breakdown['Cost'],
-               marker_color=['#EF553B', '#00CC96'])
-    ])
-    
-    fig_roi.update_layout(
-        title="Annual Inventory Cost Comparison" if lang == 'en' else "Yıllık Stok Maliyeti Karşılaştırması",
-        showlegend=False,
-        height=300
-    )
-    
-    st.plotly_chart(fig_roi, use_container_width=True)
+    # Mini görselleştirme (sadece ROI girdileri ve dil değişince yeniden kurulur)
+    def build_roi():
+        savings_breakdown = pd.DataFrame({
+            'Category': ['Before AI' if lang == 'en' else 'AI Öncesi', 
+                         'After AI' if lang == 'en' else 'AI Sonrası'],
+            'Cost': [monthly_sales * (overstock_rate / 100) * 12, 
+                     monthly_sales * (overstock_rate / 100) * 12 - savings]
+        })
+
+        fig_roi = go.Figure(data=[
+            go.Bar(x=savings_breakdown['Category'], 
+                   y=savings_breakdown['Cost'],
+                   marker_color=['#EF553B', '#00CC96'])
+        ])
+
+        fig_roi.update_layout(
+            title="Annual Inventory Cost Comparison" if lang == 'en' else "Yıllık Stok Maliyeti Karşılaştırması",
+            showlegend=False,
+            height=300
+        )
+        return fig_roi
+
+    cached_plotly_chart("roi_bar", build_roi, monthly_sales, overstock_rate, lang)
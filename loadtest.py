@@ -0,0 +1,241 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from core.profiling import rss_bytes
+
+# Eşzamanlı oturum yük testi: her sanal kullanıcı ayrı bir AppTest örneğidir (ağ yok, tek süreç =
+# tek pod). Kullanıcılar menü sayfaları arasında dolaşır ve tipik widget etkileşimleri yapar;
+# her yeniden çalıştırmanın süresi ölçülür. Her oturum sayısı temiz bir süreçte, önce tüm sayfalar
+# bir kez ısıtılarak çalıştırılır; bellek artışı ısınma sonrası taban değere göre hesaplanır.
+# Örnek: python loadtest.py --sessions 1 4 8 --duration 60 --output load.json
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PAGES = ['home', 'forecast', 'clv', 'pricing', 'abtest']
+
+
+# Sayfa başına tipik etkileşimler (İngilizce arayüz). Her adım widget'ı o anki ağaçtan bulur,
+# değerini değiştirir ve sonra yeniden çalıştırılır; widget yoksa adım atlanır (None).
+# Böylece bir değişiklik sonraki widget'ın kimliğini değiştirse de eski referans kullanılmaz.
+def _widget(at, kind, label=None, index=0):
+    widgets = [w for w in getattr(at.main, kind) if label is None or w.label == label]
+    return widgets[index] if index < len(widgets) else None
+
+
+def _set(widget, value_fn):
+    if widget is None:
+        return None
+    return widget.set_value(value_fn(widget))
+
+
+def _choice(rng):
+    return lambda w: w.options[int(rng.integers(len(w.options)))]
+
+
+INTERACTIONS = {
+    'forecast': [
+        lambda at, rng: _set(_widget(at, 'number_input'), lambda w: int(rng.choice([200000, 500000, 1000000]))),
+        lambda at, rng: _set(_widget(at, 'slider'), lambda w: int(rng.integers(5, 41)))
+    ],
+    'clv': [
+        lambda at, rng: _set(_widget(at, 'select_slider'), lambda w: int(rng.choice([30, 90, 180, 365]))),
+        lambda at, rng: _set(_widget(at, 'radio'), _choice(rng))
+    ],
+    'pricing': [
+        lambda at, rng: _set(_widget(at, 'selectbox'), _choice(rng)),
+        lambda at, rng: _set(_widget(at, 'slider'), lambda w: int(rng.integers(50, 251)))
+    ],
+    'abtest': [
+        lambda at, rng: _set(_widget(at, 'slider', "Conversion Rate (B) %"), lambda w: round(float(rng.uniform(1.0, 20.0)), 1)),
+        lambda at, rng: _set(_widget(at, 'number_input', "Visitors (B)"), lambda w: int(rng.choice([5000, 10000, 50000])))
+    ]
+}
+# Art arda bu kadar hatadan sonra oturum yeniden kurulur; MAX_RESTARTS aşılırsa oturum durur
+MAX_CONSECUTIVE_ERRORS = 3
+MAX_RESTARTS = 2
+ERROR_BACKOFF_S = 0.5
+# Hatalar ölçülen yeniden çalıştırmaların bu oranını aşarsa çıkış kodu sıfırdan farklıdır
+MAX_ERROR_RATE = 0.5
+
+
+def _session(session_id, pages, deadline, timeout, samples, errors, seed):
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(seed)
+    state = {'at': None, 'failures': 0, 'restarts': 0}
+
+    def timed(page, action, step):
+        # step(at) -> False: widget bulunamadı, ölçüm yapılmaz
+        at = state['at']
+        start = time.perf_counter()
+        try:
+            if step(at) is False:
+                return True
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+            samples.append({'session': session_id, 'page': page, 'action': action,
+                            'seconds': time.perf_counter() - start})
+            state['failures'] = 0
+            return True
+        except Exception as e:
+            errors.append({'session': session_id, 'page': page, 'action': action,
+                           'error': f"{type(e).__name__}: {e}"[:200]})
+            state['failures'] += 1
+            time.sleep(ERROR_BACKOFF_S * state['failures'])
+            return False
+
+    def start_session():
+        state['at'] = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        return timed('home', 'load', lambda at: at.run()) and \
+            timed('home', 'language', lambda at: at.selectbox[0].select("English").run())
+
+    def interact(page):
+        def step(at):
+            acted = False
+            for action in INTERACTIONS[page]:
+                if action(at, rng) is not None:
+                    at.run()
+                    acted = True
+                    if at.exception:
+                        raise RuntimeError(at.exception[0].message)
+            return acted
+        return step
+
+    def navigate(page):
+        def step(at):
+            radio = at.sidebar.radio[0]
+            radio.set_value(radio.options[PAGES.index(page)]).run()
+        return step
+
+    ok = start_session()
+    while time.perf_counter() < deadline:
+        if not ok or state['failures'] >= MAX_CONSECUTIVE_ERRORS:
+            # Bozulan oturum (eski widget kimlikleri, yarım kalan çalıştırma) baştan kurulur
+            if state['restarts'] >= MAX_RESTARTS:
+                errors.append({'session': session_id, 'page': None, 'action': 'abort',
+                               'error': f"stopped after {MAX_RESTARTS} restarts"})
+                return
+            state['restarts'] += 1
+            state['failures'] = 0
+            ok = start_session()
+            continue
+        page = pages[int(rng.integers(len(pages)))]
+        if not timed(page, 'navigate', navigate(page)):
+            continue
+        if page in INTERACTIONS and time.perf_counter() < deadline:
+            timed(page, 'interact', interact(page))
+
+
+def _warmup(pages, timeout):
+    # Modül yüklemeleri ve önbellekler ölçüme girmesin
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    at.selectbox[0].select("English").run()
+    for page in pages:
+        at.sidebar.radio[0].set_value(at.sidebar.radio[0].options[PAGES.index(page)]).run()
+
+
+def run_level(n_sessions, pages, duration, timeout, seed=0):
+    _warmup(pages, timeout)
+    samples, errors = [], []
+    peak = [rss_bytes()]
+    baseline = peak[0]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.is_set():
+            peak[0] = max(peak[0], rss_bytes())
+            time.sleep(0.2)
+
+    monitor = threading.Thread(target=sample_memory, daemon=True)
+    monitor.start()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=_session, args=(i, pages, deadline, timeout, samples, errors, seed + i))
+               for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    monitor.join()
+
+    # İlk yükleme (load, language) gecikme istatistiklerine katılmaz; soğuk başlangıç ayrı raporlanır
+    reruns = [s for s in samples if s['action'] in ('navigate', 'interact')]
+    latencies = np.array([s['seconds'] for s in reruns]) * 1000
+    by_page = {}
+    for page in pages:
+        page_lat = np.array([s['seconds'] for s in reruns if s['page'] == page]) * 1000
+        if len(page_lat):
+            by_page[page] = {'reruns': len(page_lat), **_percentiles(page_lat)}
+    cold = [s['seconds'] for s in samples if s['action'] == 'load']
+    attempts = len(reruns) + len(errors)
+    error_rate = len(errors) / attempts if attempts else 1.0
+    return {
+        'sessions': n_sessions,
+        'duration_s': round(elapsed, 2),
+        'reruns': len(reruns),
+        'errors': len(errors),
+        'error_rate': round(error_rate, 3),
+        'failed': error_rate > MAX_ERROR_RATE or not reruns,
+        'throughput_rps': round(len(reruns) / elapsed, 2),
+        **_percentiles(latencies),
+        'cold_load_ms': round(float(np.mean(cold)) * 1000, 1) if cold else None,
+        'rss_baseline_mb': round(baseline / 2**20, 1),
+        'rss_peak_mb': round(peak[0] / 2**20, 1),
+        'mb_per_session': round((peak[0] - baseline) / 2**20 / n_sessions, 1),
+        'pages': by_page,
+        'error_samples': errors[:5]
+    }
+
+
+def _percentiles(values):
+    if not len(values):
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless concurrent-session load test (Streamlit AppTest, no network).")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Concurrent session counts")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds per session count")
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES)
+    parser.add_argument('--timeout', type=float, default=120, help="Per-rerun timeout (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='loadtest_results.json')
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.sessions:
+        with ProcessPoolExecutor(1, mp_context=mp.get_context("spawn")) as executor:
+            result = executor.submit(run_level, n, args.pages, args.duration, args.timeout, args.seed).result()
+        results.append(result)
+        print(json.dumps({k: v for k, v in result.items() if k not in ('pages', 'error_samples')}), flush=True)
+
+    with open(args.output, 'w') as f:
+        json.dump({'cpu_count': os.cpu_count(), 'pages': args.pages, 'duration_s': args.duration,
+                   'results': results}, f, indent=2)
+    print(f"Saved {len(results)} session levels to {args.output}")
+    failed = [r['sessions'] for r in results if r['failed']]
+    if failed:
+        # Hata ağırlıklı ölçümler gecikme sonucu olarak kullanılmamalı
+        print(f"FAILED: errors dominate at session counts {failed} (error rate > {MAX_ERROR_RATE:.0%}); "
+              f"see error_samples in {args.output}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
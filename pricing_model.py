@@ -3,8 +3,28 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error, r2_score
+from core.valuation import DISTRICTS, PROPERTY_COLUMNS, DistrictPriceIndex, generate_market_data, train_valuation, value_properties
+from core.profiling import stage
+from core.datastore import read_upload
+from ui_helpers import run_job, cached_plotly_chart
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def market_index(source, window, _df):
+    # Veri kaynağı (+ pencere) başına taban endeks; oturumlar arası paylaşılır ve hiç değiştirilmez
+    index = DistrictPriceIndex(window=window)
+    index.update(_df['District'], _df['Price'], _df['Date'] if 'Date' in _df.columns else None)
+    return index
+
+
+def session_index(source, window, df):
+    # Yeni ilan partileri oturuma özel kopyaya eklenir (başka kullanıcıların endeksi değişmez);
+    # veri kaynağı veya pencere değişince kopya tabandan yeniden alınır
+    state = st.session_state.get("market_index")
+    if state is None or state[0] != (source, window):
+        state = ((source, window), market_index(source, window, df).copy())
+        st.session_state["market_index"] = state
+    return state[1]
+
 
 def run(lang='en'):
     content = {
@@ -56,18 +76,20 @@ def run(lang='en'):
         },
         "upload_label": {"en": "📂 Upload Real Estate Data (CSV)", "tr": "📂 Emlak Verisi Yükleyin (CSV)"},
         "upload_help": {"en": "Columns: District, Size, Age, Rooms, Price", "tr": "Sütunlar: District, Size, Age, Rooms, Price"},
-        "explainability": {"en": "🔍 Feature Importance", "tr": "🔍 Özellik Önem Sıralaması"}
+        "explainability": {"en": "🔍 Feature Importance", "tr": "🔍 Özellik Önem Sıralaması"},
+        "index_title": {"en": "📈 Market Index (Streaming Listings)", "tr": "📈 Piyasa Endeksi (Akan İlanlar)"},
+        "index_upload": {"en": "➕ Add New Listings (CSV)", "tr": "➕ Yeni İlan Ekle (CSV)"},
+        "index_help": {"en": "Columns: District, Price (optional: Date)", "tr": "Sütunlar: District, Price (opsiyonel: Date)"},
+        "index_added": {"en": "✅ {:,} listings added to the index", "tr": "✅ Endekse {:,} ilan eklendi"},
+        "index_stats": {"en": "{:,} listings · {} districts · {} daily periods", "tr": "{:,} ilan · {} ilçe · {} günlük dönem"},
+        "index_download": {"en": "⬇️ Index History (CSV)", "tr": "⬇️ Endeks Geçmişi (CSV)"},
+        "index_window": {"en": "Window (days, 0 = all)", "tr": "Pencere (gün, 0 = tümü)"},
+        "index_window_help": {"en": "Only listings from the last N days (relative to the newest listing) count toward district averages",
+                              "tr": "İlçe ortalamalarına sadece en yeni ilana göre son N gündeki ilanlar katılır"}
     }
 
     # BÖLGE KATSAYILARI
-    districts = {
-        'Beşiktaş': {'base': 150000, 'mult': 2.0},
-        'Kadıköy': {'base': 130000, 'mult': 1.8},
-        'Şişli': {'base': 110000, 'mult': 1.6},
-        'Üsküdar': {'base': 95000, 'mult': 1.4},
-        'Başakşehir': {'base': 65000, 'mult': 1.1},
-        'Esenyurt': {'base': 35000, 'mult': 0.8}
-    }
+    districts = DISTRICTS
 
     with st.expander(content["summary"][lang], expanded=True):
         c1, c2, c3 = st.columns(3)
@@ -88,62 +110,58 @@ def run(lang='en'):
         help=content["upload_help"][lang]
     )
 
-    @st.cache_data
-    def generate_market_data(_dist_map):
-        np.random.seed(42)
-        data = []
-        for _ in range(2000):
-            d_name = np.random.choice(list(_dist_map.keys()))
-            d_props = _dist_map[d_name]
-            
-            size = np.random.randint(50, 250)
-            age = np.random.randint(0, 50)
-            rooms = np.random.randint(1, 6)
-            
-            base_value = size * d_props['base'] * d_props['mult']
-            age_penalty_rate = 0.015 * age
-            if age > 30:
-                age_penalty_rate += 0.20
-            
-            current_value = base_value * (1 - min(age_penalty_rate, 0.70))
-            room_bonus = rooms * 150000
-            final_price = current_value + room_bonus
-            final_price += np.random.normal(0, final_price * 0.05)
-            
-            data.append([d_name, size, age, rooms, final_price])
-            
-        return pd.DataFrame(data, columns=['District', 'Size', 'Age', 'Rooms', 'Price'])
+    get_market_data = st.cache_data(generate_market_data)
 
     # VERİ KONTROLÜ
-    if uploaded_file is not None:
-        try:
-            df = pd.read_csv(uploaded_file)
-            required_cols = ['District', 'Size', 'Age', 'Rooms', 'Price']
-            if not all(col in df.columns for col in required_cols):
-                st.error(f"❌ CSV must contain: {', '.join(required_cols)}")
-                df = generate_market_data(districts)
-            else:
-                st.success("✅ Custom data loaded!" if lang == 'en' else "✅ Özel veri yüklendi!")
-        except Exception as e:
-            st.error(f"Error: {e}")
-            df = generate_market_data(districts)
-    else:
-        st.info("Using synthetic Istanbul data..." if lang == 'en' else "Sentetik İstanbul verisi kullanılıyor...")
-        df = generate_market_data(districts)
+    source = "demo"
+    with stage("ingest"):
+        if uploaded_file is not None:
+            try:
+                df = read_upload(uploaded_file)
+                required_cols = ['District', 'Size', 'Age', 'Rooms', 'Price']
+                if not all(col in df.columns for col in required_cols):
+                    st.error(f"❌ CSV must contain: {', '.join(required_cols)}")
+                    df = get_market_data(districts)
+                else:
+                    source = getattr(uploaded_file, 'file_id', "upload")
+                    st.success("✅ Custom data loaded!" if lang == 'en' else "✅ Özel veri yüklendi!")
+            except Exception as e:
+                st.error(f"Error: {e}")
+                df = get_market_data(districts)
+        else:
+            st.info("Using synthetic Istanbul data..." if lang == 'en' else "Sentetik İstanbul verisi kullanılıyor...")
+            df = get_market_data(districts)
 
-    # MODEL EĞİTİMİ
-    df_encoded = pd.get_dummies(df, columns=['District'])
-    X = df_encoded.drop('Price', axis=1)
-    y = df_encoded['Price']
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-    model.fit(X, y)
+    # PİYASA ENDEKSİ: ilçe ortalamaları her çalıştırmada tüm veriden değil, artımlı endeksten okunur
+    with st.expander(content["index_title"][lang], expanded=False):
+        window_days = st.number_input(content["index_window"][lang], min_value=0, max_value=3650, value=0,
+                                      step=30, help=content["index_window_help"][lang], key="index_window")
+        with stage("price_index"):
+            index = session_index(source, int(window_days) or None, df)
+        new_listings = st.file_uploader(content["index_upload"][lang], type=["csv"], help=content["index_help"][lang])
+        if new_listings is not None:
+            try:
+                batch = read_upload(new_listings)
+                added = index.update(batch['District'], batch['Price'],
+                                     batch['Date'] if 'Date' in batch.columns else None,
+                                     source=getattr(new_listings, 'file_id', None))
+                if added:
+                    st.success(content["index_added"][lang].format(added))
+            except Exception as e:
+                st.error(f"Error: {e}")
+        index_df = index.snapshot()
+        history = index.history()
+        st.caption(content["index_stats"][lang].format(
+            int(index_df['Count'].sum()), len(index_df), history['Period'].nunique()))
+        st.download_button(content["index_download"][lang], history.to_csv(index=False),
+                           file_name="district_price_index.csv", mime="text/csv")
 
-    # MODEL PERFORMANSI
-    train_pred = model.predict(X)
-    mae = mean_absolute_error(y, train_pred)
-    r2 = r2_score(y, train_pred)
-    mape = np.mean(np.abs((y - train_pred) / y)) * 100
+    # MODEL EĞİTİMİ
+    with stage("train_valuation"):
+        # Sadece ilan özellikleri (ör. endeks için yüklenen Date sütunu modele girmez)
+        model, feature_columns, train_metrics = run_job(train_valuation, df[PROPERTY_COLUMNS + ['Price']],
+                                                         rows=len(df), lang=lang, cache=True)
+    mae, r2, mape = train_metrics['mae'], train_metrics['r2'], train_metrics['mape']
 
     st.subheader(content["performance"][lang])
     col1, col2, col3 = st.columns(3)
@@ -164,15 +182,9 @@ def run(lang='en'):
         s_rooms = st.radio(labels[3], [1, 2, 3, 4, 5], index=2, horizontal=True)
 
     # TAHMİN
-    input_row = pd.DataFrame(columns=X.columns)
-    input_row.loc[0] = 0
-    input_row['Size'] = s_size
-    input_row['Age'] = s_age
-    input_row['Rooms'] = s_rooms
-    if f'District_{s_dist}' in input_row.columns:
-        input_row[f'District_{s_dist}'] = 1
-
-    prediction = model.predict(input_row)[0]
+    input_row = pd.DataFrame({'District': [s_dist], 'Size': [s_size], 'Age': [s_age], 'Rooms': [s_rooms]})
+    with stage("predict"):
+        prediction = value_properties(model, feature_columns, input_row)[0]
 
     with c2:
         st.subheader(labels[4])
@@ -186,71 +198,76 @@ def run(lang='en'):
         elif s_age > 30:
             st.warning("⚠️ High depreciation due to building age > 30.")
 
-        # BÖLGE KARŞILAŞTıRMA GRAFİĞİ
-        avg_price = df.groupby('District')['Price'].mean().sort_values()
-        fig_district = px.bar(
-            x=avg_price.index,
-            y=avg_price.values,
-            color=avg_price.values,
-            color_continuous_scale="Blues",
-            labels={'x': 'District', 'y': 'Avg Price (₺)'}
-        )
-        fig_district.update_layout(
-            xaxis_title=None,
-            yaxis_title=None,
-            margin=dict(t=0, b=0, l=0, r=0),
-            height=250,
-            showlegend=False
-        )
-        st.plotly_chart(fig_district, use_container_width=True)
+        # BÖLGE KARŞILAŞTıRMA GRAFİĞİ (endeks değişince yeniden kurulur, widget'lardan bağımsız)
+        def build_district():
+            fig_district = px.bar(
+                x=index_df['District'].to_numpy(),
+                y=index_df['Mean'].to_numpy(),
+                color=index_df['Mean'].to_numpy(),
+                color_continuous_scale="Blues",
+                labels={'x': 'District', 'y': 'Avg Price (₺)'}
+            )
+            fig_district.update_layout(
+                xaxis_title=None,
+                yaxis_title=None,
+                margin=dict(t=0, b=0, l=0, r=0),
+                height=250,
+                showlegend=False
+            )
+            return fig_district
+
+        cached_plotly_chart("district_bar", build_district, index_df[['District', 'Mean']])
 
     # FEATURE IMPORTANCE
     st.divider()
     st.subheader(content["explainability"][lang])
     
-    feature_importance = pd.DataFrame({
-        'Feature': X.columns,
-        'Importance': model.feature_importances_
-    }).sort_values('Importance', ascending=False).head(10)
-    
-    fig_importance = px.bar(
-        feature_importance,
-        x='Importance',
-        y='Feature',
-        orientation='h',
-        color='Importance',
-        color_continuous_scale='Viridis'
-    )
+    importances = model.feature_importances_
+
+    def build_importance():
+        feature_importance = pd.DataFrame({
+            'Feature': feature_columns,
+            'Importance': importances
+        }).sort_values('Importance', ascending=False).head(10)
     
-    fig_importance.update_layout(
-        showlegend=False,
-        height=400,
-        xaxis_title="Importance Score" if lang == 'en' else "Önem Skoru",
-        yaxis_title=""
-    )
+        fig_importance = px.bar(
+            feature_importance,
+            x='Importance',
+            y='Feature',
+            orientation='h',
+            color='Importance',
+            color_continuous_scale='Viridis'
+        )
     
-    st.plotly_chart(fig_importance, use_container_width=True)
+        fig_importance.update_layout(
+            showlegend=False,
+            height=400,
+            xaxis_title="Importance Score" if lang == 'en' else "Önem Skoru",
+            yaxis_title=""
+        )
+        return fig_importance
+
+    cached_plotly_chart("feature_importance", build_importance, list(feature_columns), importances, lang)
 
     # COMPARISON TABLE
     st.divider()
     st.markdown("### " + ("📋 District Price Comparison" if lang == 'en' else "📋 İlçe Fiyat Karşılaştırması"))
     
-    comparison_data = []
-    for dist_name in districts.keys():
-        test_input = input_row.copy()
-        test_input.loc[:] = 0
-        test_input['Size'] = s_size
-        test_input['Age'] = s_age
-        test_input['Rooms'] = s_rooms
-        if f'District_{dist_name}' in test_input.columns:
-            test_input[f'District_{dist_name}'] = 1
-        
-        pred_price = model.predict(test_input)[0]
-        comparison_data.append({
-            'District' if lang == 'en' else 'İlçe': dist_name,
-            'Estimated Price (₺)' if lang == 'en' else 'Tahmini Fiyat (₺)': f"₺{pred_price:,.0f}",
-            'Unit Price (₺/m²)' if lang == 'en' else 'Birim Fiyat (₺/m²)': f"₺{pred_price/s_size:,.0f}"
-        })
+    # Tüm ilçeler tek toplu tahmin çağrısıyla
+    district_names = list(districts.keys())
+    comparison_rows = pd.DataFrame({
+        'District': district_names,
+        'Size': s_size,
+        'Age': s_age,
+        'Rooms': s_rooms
+    })
+    with stage("predict"):
+        comparison_prices = value_properties(model, feature_columns, comparison_rows)
+    comparison_data = [{
+        'District' if lang == 'en' else 'İlçe': dist_name,
+        'Estimated Price (₺)' if lang == 'en' else 'Tahmini Fiyat (₺)': f"₺{pred_price:,.0f}",
+        'Unit Price (₺/m²)' if lang == 'en' else 'Birim Fiyat (₺/m²)': f"₺{pred_price/s_size:,.0f}"
+    } for dist_name, pred_price in zip(district_names, comparison_prices)]
     
     comparison_df = pd.DataFrame(comparison_data)
     st.dataframe(comparison_df, use_container_width=True, hide_index=True)
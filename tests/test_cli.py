@@ -0,0 +1,64 @@
+import json
+
+import pandas as pd
+
+import cli
+from core.forecasting import generate_synthetic_data
+from core.segmentation import generate_rfm_data
+from core.valuation import generate_market_data
+
+
+def run(capsys, argv):
+    code = cli.main(argv)
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return code, lines
+
+
+def test_abtest_adds_experiment_from_file_name(tmp_path, capsys):
+    path = tmp_path / 'landing.csv'
+    pd.DataFrame({'Group': ['Control', 'Test'], 'Visitors': [10_000, 10_000],
+                  'Conversions': [500, 650]}).to_csv(path, index=False)
+    code, lines = run(capsys, ['abtest', str(path), '--out', str(tmp_path / 'out'), '--workers', '1'])
+    assert code == 0
+    assert lines[0]['status'] == 'ok' and lines[0]['significant'] == 1
+    result = pd.read_csv(tmp_path / 'out' / 'landing_abtest.csv')
+    assert result['Experiment'].tolist() == ['landing']
+
+
+def test_failed_file_is_reported_and_sets_exit_code(tmp_path, capsys):
+    good, bad = tmp_path / 'rfm.csv', tmp_path / 'broken.csv'
+    generate_rfm_data().to_csv(good, index=False)
+    pd.DataFrame({'Recency': [1, 2]}).to_csv(bad, index=False)
+    code, lines = run(capsys, ['segment', str(good), str(bad), '--out', str(tmp_path), '--workers', '1'])
+    assert code == 1
+    status = {line['file']: line['status'] for line in lines}
+    assert status == {str(good): 'ok', str(bad): 'error'}
+    segments = pd.read_csv(tmp_path / 'rfm_segments.csv')
+    assert sum(lines[0]['segments'].values()) == len(segments)
+
+
+def test_forecast_in_worker_processes(tmp_path, capsys):
+    paths = []
+    for name in ('store_a', 'store_b'):
+        path = tmp_path / f'{name}.csv'
+        generate_synthetic_data().to_csv(path, index=False)
+        paths.append(str(path))
+    code, lines = run(capsys, ['forecast', *paths, '--out', str(tmp_path), '--workers', '2'])
+    assert code == 0
+    assert sorted(line['file'] for line in lines) == paths
+    assert all(isinstance(line['mae'], float) for line in lines)
+    forecast = pd.read_csv(tmp_path / 'store_a_forecast.csv')
+    assert list(forecast.columns) == ['Date', 'Actual', 'Forecast']
+
+
+def test_value_trains_on_property_columns_only(tmp_path, capsys):
+    # Eğitim dosyasındaki fazladan sütunlar (ör. Date) modele girmez; tahmin dosyasında olmasalar da çalışır
+    train = tmp_path / 'listings.csv'
+    market = generate_market_data(n_samples=300)
+    market.assign(Date=pd.date_range('2024-01-01', periods=len(market), freq='h')).to_csv(train, index=False)
+    path = tmp_path / 'new.csv'
+    market.drop(columns='Price').head(20).to_csv(path, index=False)
+    code, lines = run(capsys, ['value', str(path), '--train', str(train), '--out', str(tmp_path), '--workers', '1'])
+    assert code == 0 and lines[0]['status'] == 'ok'
+    result = pd.read_csv(tmp_path / 'new_valuation.csv')
+    assert result['Estimated_Price'].gt(0).all()
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.datastore import DatasetStore
+
+
+def csv_bytes(n=1_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'District': rng.choice(['Kadıköy', 'Beşiktaş'], n), 'Size': rng.integers(50, 200, n),
+                       'Price': rng.random(n) * 1e6})
+    return df.to_csv(index=False).encode()
+
+
+class CountingReader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, buffer):
+        self.calls += 1
+        return pd.read_csv(buffer)
+
+
+class FakeUpload:
+    def __init__(self, raw, file_id):
+        self.raw, self.file_id, self.reads = raw, file_id, 0
+
+    def getvalue(self):
+        self.reads += 1
+        return self.raw
+
+
+def test_same_content_is_parsed_once(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    reader = CountingReader()
+    raw = csv_bytes()
+    first = store.load(raw, reader=reader)
+    second = store.load(raw, reader=reader)
+    assert reader.calls == 1
+    pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    assert len(list(tmp_path.glob('*.arrow'))) == 1
+
+
+def test_read_selects_columns_and_reports_missing(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    key, _ = store.put(csv_bytes())
+    df = store.read(key, columns=['Size', 'Price'])
+    assert list(df.columns) == ['Size', 'Price']
+    with pytest.raises(ValueError, match="Missing"):
+        store.read(key, columns=['Size', 'Missing'])
+
+
+def test_upload_is_hashed_once_per_file_id(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    upload = FakeUpload(csv_bytes(), file_id='f1')
+    store.load_upload(upload)
+    store.load_upload(upload)
+    assert upload.reads == 1
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    store = DatasetStore(root=str(tmp_path), budget_bytes=2**30)
+    keys = []
+    for seed in range(3):
+        key, _ = store.put(csv_bytes(seed=seed))
+        os.utime(store.path(key), (seed, seed))
+        keys.append(key)
+    # Yeniden kullanılan ilk dosya en yeni olur; yeni dosya bütçeyi aşınca en eski (ikinci) dosya silinir
+    store.put(csv_bytes(seed=0))
+    store.budget_bytes = int(3.5 * os.path.getsize(store.path(keys[0])))
+    new_key, _ = store.put(csv_bytes(seed=3))
+    assert keys[1] not in store
+    assert all(key in store for key in (keys[0], keys[2], new_key))
+
+
+def test_unstorable_frame_is_still_returned(tmp_path):
+    store = DatasetStore(root=str(tmp_path))
+    raw = b'a,b\n1,x\n2,3\n'
+    df = store.load(raw, reader=lambda buffer: pd.DataFrame({'a': [1, 2], 'b': ['x', 3]}))
+    assert df['b'].tolist() == ['x', 3]
+    assert not list(tmp_path.glob('*.arrow'))
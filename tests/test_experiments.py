@@ -0,0 +1,332 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import integrate, stats
+
+from core import jobs
+from core.experiments import (
+    CupedMoments, EventAggregator, SequentialMonitor, aggregate_event_files, analyze_experiments, bayesian_ab,
+    bayesian_experiments, bootstrap_ci, benjamini_hochberg, control_and_test, cuped_moments, cuped_test, simulate_power,
+    stratified_analysis
+)
+from core.jobs import JobExecutor
+
+
+def test_benjamini_hochberg_q_values():
+    p = np.array([0.01, 0.04, 0.03, 0.005])
+    # Sıralı: 0.005*4/1, 0.01*4/2, 0.03*4/3, 0.04*4/4 -> 0.02, 0.02, 0.04, 0.04
+    assert benjamini_hochberg(p) == pytest.approx([0.02, 0.04, 0.04, 0.02])
+
+
+def test_benjamini_hochberg_monotone_and_nan():
+    q = benjamini_hochberg([0.9, np.nan, 0.02, 0.021, 0.5])
+    assert np.isnan(q[1])
+    # Dört geçerli p-değeri: 0.02*4/1 = 0.08, 0.021*4/2 = 0.042 -> kümülatif minimum 0.042
+    assert q[[2, 3]] == pytest.approx([0.042, 0.042])
+    assert q[4] == pytest.approx(0.5 * 4 / 3)
+    assert q[0] == pytest.approx(0.9)
+
+
+def test_analyze_experiments_compares_each_variant_with_its_control():
+    df = pd.DataFrame({
+        'Experiment': ['e1', 'e1', 'e1', 'e2', 'e2'],
+        'Variant': ['A', 'B', 'C', 'Test', 'Control'],
+        'Visitors': [1000] * 5,
+        'Conversions': [100, 130, 90, 12, 10]
+    })
+    result = analyze_experiments(df)
+    assert result['Variant'].tolist() == ['B', 'C', 'Test']
+    assert result['Control CVR %'].tolist() == pytest.approx([10.0, 10.0, 1.0])
+    assert (result['q-value (BH)'] >= result['p-value']).all()
+
+
+@pytest.mark.parametrize('groups', [['control', 'treatment'], ['Treatment', 'Control'], ['A', 'variant_2']])
+def test_control_and_test_does_not_depend_on_test_label(groups):
+    df = pd.DataFrame({'Group': groups, 'Visitors': [1000, 1000], 'Conversions': [50, 60]})
+    control, test = control_and_test(df)
+    assert control['Conversions'] == (50 if groups[0] != 'Treatment' else 60)
+    assert control['Group'] != test['Group']
+
+
+def test_control_and_test_with_variant_column_and_no_experiment():
+    df = pd.DataFrame({'Variant': ['B', 'A'], 'Visitors': [500, 400], 'Conversions': [30, 20]})
+    control, test = control_and_test(df)
+    assert control['Variant'] == 'A' and test['Variant'] == 'B'
+
+
+@pytest.mark.parametrize('df, message', [
+    (pd.DataFrame({'Group': ['X', 'Y'], 'Visitors': [1, 1], 'Conversions': [0, 0]}), "No control group"),
+    (pd.DataFrame({'Group': ['Control'], 'Visitors': [1], 'Conversions': [0]}), "No test group"),
+    (pd.DataFrame({'Group': ['A', 'B'], 'Revenue': [1.0, 2.0]}), "Missing columns"),
+])
+def test_control_and_test_reports_unusable_files(df, message):
+    with pytest.raises(ValueError, match=message):
+        control_and_test(df)
+
+
+def test_msprt_p_value_never_increases():
+    monitor = SequentialMonitor(alpha=0.05, tau=0.01)
+    rng = np.random.default_rng(0)
+    previous = 1.0
+    for _ in range(30):
+        conv_a, conv_b = rng.binomial(1000, 0.10), rng.binomial(1000, 0.10)
+        monitor.update(['exp'], [1000], [conv_a], [1000], [conv_b])
+        assert monitor.p_value[0] <= previous
+        previous = monitor.p_value[0]
+
+
+def test_msprt_controls_type_one_error_under_peeking():
+    # 500 A/A deneyi, her biri 50 kez izlenir: always-valid p ile yanlış alarm oranı alpha'yı aşmaz
+    rng = np.random.default_rng(1)
+    experiments = np.arange(500)
+    monitor = SequentialMonitor(alpha=0.05, tau=0.01)
+    naive_hits = np.zeros(500, dtype=bool)
+    totals = np.zeros((500, 4))
+    for _ in range(50):
+        batch = np.column_stack([
+            np.full(500, 200), rng.binomial(200, 0.1, 500), np.full(500, 200), rng.binomial(200, 0.1, 500)
+        ])
+        monitor.update(experiments, *batch.T)
+        totals += batch
+        n_a, c_a, n_b, c_b = totals.T
+        pooled = (c_a + c_b) / (n_a + n_b)
+        z = (c_b / n_b - c_a / n_a) / np.sqrt(pooled * (1 - pooled) * (1 / n_a + 1 / n_b))
+        naive_hits |= 2 * stats.norm.sf(np.abs(z)) < 0.05
+    assert (monitor.p_value < 0.05).mean() <= 0.06
+    # Aynı verilerde her bakışta klasik z-testi çok daha sık yanlış alarm verir
+    assert naive_hits.mean() > 0.15
+
+
+def test_msprt_detects_large_effect():
+    monitor = SequentialMonitor(alpha=0.05, tau=0.01)
+    monitor.update(['exp'], [20_000], [2_000], [20_000], [2_600])
+    assert monitor.results()['Stop'].iloc[0]
+
+
+def exact_prob_b_better(alpha_a, beta_a, alpha_b, beta_b):
+    # P(B > A) = integral f_B(x) F_A(x) dx
+    value, _ = integrate.quad(lambda x: stats.beta.pdf(x, alpha_b, beta_b) * stats.beta.cdf(x, alpha_a, beta_a), 0, 1)
+    return value
+
+
+def test_bayesian_ab_small_counts_match_exact_integral():
+    # Küçük sayımlar örneklemeyle; satırlar küçük bloklara bölünse de sonuç doğru kalır
+    conv_a, n_a = np.array([3, 10, 0]), np.array([10, 40, 5])
+    conv_b, n_b = np.array([6, 12, 1]), np.array([10, 40, 5])
+    posterior = bayesian_ab(conv_a, n_a, conv_b, n_b, n_draws=200_000, max_block=200_000)
+    for i in range(3):
+        exact = exact_prob_b_better(1 + conv_a[i], 1 + n_a[i] - conv_a[i], 1 + conv_b[i], 1 + n_b[i] - conv_b[i])
+        assert posterior['P(B > A)'].iloc[i] == pytest.approx(exact, abs=0.005)
+    assert posterior['CI A Low'].iloc[0] == pytest.approx(stats.beta.ppf(0.025, 4, 8))
+
+
+def test_bayesian_ab_normal_approximation_matches_sampling():
+    args = ([480, 1000], [10_000, 10_000], [520, 1010], [10_000, 10_000])
+    closed = bayesian_ab(*args)
+    sampled = bayesian_ab(*args, n_draws=400_000, normal_min=np.inf)
+    assert closed['P(B > A)'].to_numpy() == pytest.approx(sampled['P(B > A)'].to_numpy(), abs=0.005)
+    assert closed['Expected Loss (B)'].to_numpy() == pytest.approx(sampled['Expected Loss (B)'].to_numpy(), rel=0.05)
+    # Kayıp(A) - Kayıp(B) = E[max(B - A, 0)] - E[max(A - B, 0)] = E[B] - E[A]
+    diff = closed['Expected Loss (A)'] - closed['Expected Loss (B)']
+    mean_a = (1 + np.array(args[0])) / (2 + np.array(args[1]))
+    mean_b = (1 + np.array(args[2])) / (2 + np.array(args[3]))
+    assert diff.to_numpy() == pytest.approx(mean_b - mean_a)
+
+
+def test_bayesian_experiments_rows_follow_treatments():
+    df = pd.DataFrame({
+        'Experiment': ['e1', 'e1', 'e2', 'e2', 'e2'],
+        'Variant': ['B', 'A', 'Control', 'T1', 'T2'],
+        'Visitors': [1000] * 5,
+        'Conversions': [100, 100, 10, 30, 1]
+    })
+    result = bayesian_experiments(df)
+    assert result[['Experiment', 'Variant']].values.tolist() == [['e1', 'B'], ['e2', 'T1'], ['e2', 'T2']]
+    assert result['P(B > A)'].iloc[0] == pytest.approx(0.5, abs=0.02)
+    assert result['P(B > A)'].iloc[1] > 0.99 > 0.01 > result['P(B > A)'].iloc[2]
+
+
+def test_cuped_moments_merge_matches_full_sample():
+    rng = np.random.default_rng(2)
+    x = rng.gamma(2, 10, 10_001)
+    y = 0.8 * x + rng.normal(0, 5, len(x))
+    merged = cuped_moments(y, x, chunk_size=997)
+    assert merged.n == len(y)
+    assert merged.mean_y == pytest.approx(y.mean())
+    assert merged.mean_x == pytest.approx(x.mean())
+    assert merged.m2_y == pytest.approx(((y - y.mean()) ** 2).sum())
+    assert merged.m2_x == pytest.approx(((x - x.mean()) ** 2).sum())
+    assert merged.c_xy == pytest.approx(((x - x.mean()) * (y - y.mean())).sum())
+
+    left, right = CupedMoments().update(y[:4000], x[:4000]), CupedMoments().update(y[4000:], x[4000:])
+    pooled = left.combined(right)
+    assert pooled.c_xy == pytest.approx(merged.c_xy)
+    # combined() girdileri değiştirmez
+    assert left.n == 4000 and right.n == len(y) - 4000
+
+
+def test_cuped_theta_is_pooled_ols_slope():
+    rng = np.random.default_rng(3)
+    x_a, x_b = rng.normal(50, 10, 5000), rng.normal(50, 10, 5000)
+    y_a, y_b = 2 * x_a + rng.normal(0, 5, 5000), 2 * x_b + 1 + rng.normal(0, 5, 5000)
+    result = cuped_test(cuped_moments(y_a, x_a), cuped_moments(y_b, x_b))
+    x, y = np.concatenate([x_a, x_b]), np.concatenate([y_a, y_b])
+    assert result['Theta'] == pytest.approx(np.cov(x, y)[0, 1] / np.var(x, ddof=1))
+    assert result['Variance Reduction %'] > 80
+    assert result['Diff'] == pytest.approx(1, abs=0.4)
+
+
+def stratified_frame():
+    # İki dilim, her birinde odds oranı tam 2 (kontrol 10/100 ve 30/80; test 20/110 ve 60/110)
+    return pd.DataFrame({
+        'Device': ['mobile', 'mobile', 'desktop', 'desktop'],
+        'Group': ['Control', 'Test', 'Control', 'Test'],
+        'Visitors': [100, 110, 80, 110],
+        'Conversions': [10, 20, 30, 60]
+    })
+
+
+def test_cmh_and_mantel_haenszel_textbook_example():
+    df = stratified_frame()
+    result = stratified_analysis(df, ['Device'])
+    combined = result[result['Device'] == 'All (CMH)'].iloc[0]
+    # Dilimlerde ortak odds oranı 2 ise Mantel-Haenszel tahmini de tam 2'dir
+    assert combined['Odds Ratio (MH)'] == pytest.approx(2.0)
+
+    # CMH: gözlenen - beklenen (hipergeometrik ortalama) toplamının karesi / varyans toplamı
+    observed = expected = variance = 0.0
+    for (n_a, x_a), (n_b, x_b) in [((100, 10), (110, 20)), ((80, 30), (110, 60))]:
+        dist = stats.hypergeom(n_a + n_b, x_a + x_b, n_b)
+        observed += x_b
+        expected += dist.mean()
+        variance += dist.var()
+    cmh = (observed - expected) ** 2 / variance
+    assert combined['p-value'] == pytest.approx(stats.chi2.sf(cmh, 1))
+    assert combined['Z'] == pytest.approx(np.sqrt(cmh), abs=1e-3)
+
+
+def test_stratified_analysis_keeps_missing_strata():
+    df = pd.concat([stratified_frame(), pd.DataFrame({
+        'Device': [None, None], 'Group': ['Control', 'Test'], 'Visitors': [50, 50], 'Conversions': [5, 9]
+    })], ignore_index=True)
+    result = stratified_analysis(df, ['Device'])
+    slices = result[result['Device'] != 'All (CMH)']
+    assert len(slices) == 3
+    assert slices['Device'].isna().sum() == 1
+    assert result['Visitors A'].iloc[-1] == 230
+
+
+def test_analyze_experiments_with_missing_experiment_key():
+    df = pd.DataFrame({
+        'Experiment': ['e1', 'e1', None, None, 'e2', 'e2'],
+        'Variant': ['A', 'B', 'A', 'B', 'Control', 'Test'],
+        'Visitors': [1000] * 6,
+        'Conversions': [100, 120, 50, 70, 10, 12]
+    })
+    result = analyze_experiments(df)
+    assert len(result) == 3
+    assert result['Experiment'].isna().sum() == 1
+
+
+def test_event_aggregator_counts_unique_users_across_chunks():
+    rng = np.random.default_rng(4)
+    n = 50_000
+    events = pd.DataFrame({
+        'user_id': rng.integers(0, 5_000, n),
+        'variant': rng.choice(['A', 'B'], n),
+        'event': rng.choice(['exposure', 'conversion'], n, p=[0.9, 0.1])
+    })
+    aggregator = EventAggregator()
+    for start in range(0, n, 1_000):
+        aggregator.update(events.iloc[start:start + 1_000])
+    result = aggregator.to_frame().set_index('Group')
+    expected = events.groupby('variant')['user_id'].nunique()
+    converted = events[events['event'] == 'conversion'].groupby('variant')['user_id'].nunique()
+    assert result['Visitors'].to_dict() == expected.to_dict()
+    assert result['Conversions'].to_dict() == converted.to_dict()
+
+
+@pytest.fixture
+def worker_pool(monkeypatch):
+    # Tek çekirdekli makinede de paylaşılan havuzdan geçen yolu çalıştırır
+    executor = JobExecutor(max_workers=2)
+    monkeypatch.setattr(jobs, '_executor', executor)
+    monkeypatch.setattr(jobs.os, 'cpu_count', lambda: 2)
+    yield executor
+    executor.shutdown()
+
+
+def test_aggregate_event_files_matches_single_pass(tmp_path, worker_pool):
+    # Dosyalar arasında tekrar eden kullanıcılar bir kez sayılır
+    rng = np.random.default_rng(5)
+    n = 30_000
+    events = pd.DataFrame({
+        'user_id': rng.integers(0, 3_000, n),
+        'variant': rng.choice(['A', 'B'], n),
+        'event': rng.choice(['exposure', 'conversion'], n, p=[0.8, 0.2])
+    })
+    paths = []
+    for i, start in enumerate(range(0, n, 10_000)):
+        paths.append(tmp_path / f'events_{i}.csv')
+        events.iloc[start:start + 10_000].to_csv(paths[-1], index=False)
+    expected = EventAggregator().update(events).to_frame()
+    for parallel in (False, True):
+        result = aggregate_event_files(paths, chunksize=4_000, parallel=parallel).to_frame()
+        pd.testing.assert_frame_equal(result, expected)
+    assert worker_pool._pool is not None
+
+
+def test_simulate_power_matches_normal_approximation():
+    table = simulate_power([0.1], [0.2], [500, 2_000, 8_000], n_sims=4_000)
+    # İki oranlı z-testinin yaklaşık gücü: Phi(|p2 - p1| / se - z_{alpha/2})
+    p1, p2 = 0.1, 0.12
+    se = np.sqrt((p1 * (1 - p1) + p2 * (1 - p2)) / table['N'].to_numpy())
+    expected = stats.norm.cdf(abs(p2 - p1) / se - stats.norm.ppf(0.975))
+    assert table['Power'].to_numpy() == pytest.approx(expected, abs=0.03)
+    assert table['Power'].is_monotonic_increasing
+
+
+def test_simulate_power_grid_and_pool_path(worker_pool):
+    args = ([0.05, 0.1], [0.1, 0.3], [1_000, 5_000, 20_000])
+    serial = simulate_power(*args, n_sims=500, block_size=4, parallel=False)
+    pooled = simulate_power(*args, n_sims=500, block_size=4, parallel_min=0)
+    assert len(serial) == 12
+    assert serial[['Baseline', 'MDE', 'N']].drop_duplicates().shape[0] == 12
+    # Bloklar kendi tohumlarıyla: havuzda da aynı sonuç
+    pd.testing.assert_frame_equal(serial, pooled)
+    assert worker_pool._pool is not None
+
+
+def revenue_sample(n, uplift, seed):
+    # Kullanıcıların çoğu sıfır gelir (tekrarlı değerler), alıcılar log-normal
+    rng = np.random.default_rng(seed)
+    buyers = rng.random(n) < 0.1
+    return np.where(buyers, rng.lognormal(3 + uplift, 1, n).round(2), 0.0)
+
+
+def test_bootstrap_ci_matches_normal_theory():
+    a, b = revenue_sample(20_000, 0.0, 6), revenue_sample(20_000, 0.1, 7)
+    result = bootstrap_ci(a, b, n_resamples=4_000)
+    se = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    diff = b.mean() - a.mean()
+    low, high = result['Diff CI']
+    assert result['Diff'] == pytest.approx(diff)
+    assert low == pytest.approx(diff - 1.96 * se, abs=0.15 * se)
+    assert high == pytest.approx(diff + 1.96 * se, abs=0.15 * se)
+    z_p = 2 * stats.norm.sf(abs(diff) / se)
+    assert result['p-value'] == pytest.approx(z_p, abs=0.03)
+
+
+def test_bootstrap_p_value_is_never_zero():
+    a, b = revenue_sample(5_000, 0.0, 8), revenue_sample(5_000, 1.0, 9)
+    result = bootstrap_ci(a, b, n_resamples=999)
+    # Hiçbir örneklemde fark sıfırın altına düşmez: p = 2 / (B + 1)
+    assert result['p-value'] == pytest.approx(2 / 1000)
+
+
+def test_bootstrap_pool_path_matches_serial(worker_pool):
+    a, b = revenue_sample(3_000, 0.0, 10), revenue_sample(3_000, 0.2, 11)
+    serial = bootstrap_ci(a, b, n_resamples=500, parallel=False, max_cells=20_000)
+    pooled = bootstrap_ci(a, b, n_resamples=500, parallel_cells=0, max_cells=20_000)
+    assert serial == pooled
+    assert worker_pool._pool is not None
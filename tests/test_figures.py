@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io
+
+from core.figures import DEFAULT_HEIGHT, FigureCache, figure_key, serialize
+
+
+def scatter(df, height=None):
+    fig = go.Figure(go.Scatter(x=df['x'], y=df['y'], mode='markers'))
+    if height:
+        fig.update_layout(height=height)
+    return fig
+
+
+def frame(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'x': rng.random(n), 'y': rng.random(n)})
+
+
+def test_figure_key_depends_on_inputs():
+    df = frame()
+    assert figure_key("chart", df, 'en') == figure_key("chart", df.copy(), 'en')
+    assert figure_key("chart", df, 'en') != figure_key("chart", df, 'tr')
+    assert figure_key("chart", df, 'en') != figure_key("other", df, 'en')
+    changed = df.copy()
+    changed.iloc[0, 0] += 1
+    assert figure_key("chart", df) != figure_key("chart", changed)
+    # Aynı değerler, farklı sütun adı
+    assert figure_key("chart", df) != figure_key("chart", df.rename(columns={'x': 'z'}))
+    assert figure_key("chart", np.arange(4)) != figure_key("chart", np.arange(4).reshape(2, 2))
+
+
+def test_serialize_matches_plotly_json():
+    fig = scatter(frame(), height=300)
+    spec, height = serialize(fig)
+    assert height == 300
+    assert json.loads(spec)['data'] == json.loads(plotly.io.to_json(fig))['data']
+    assert serialize(scatter(frame()))[1] == DEFAULT_HEIGHT
+
+
+def test_payload_builds_once_per_input():
+    cache = FigureCache(budget_bytes=2**20)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return scatter(df), len(df)
+
+    df = frame()
+    first = cache.payload("chart", build, df, 'en')
+    second = cache.payload("chart", build, df, 'en')
+    assert len(calls) == 1
+    assert second is first
+    assert first['extra'] == len(df)
+    cache.payload("chart", build, df, 'tr')
+    assert len(calls) == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_cache_evicts_least_recently_used_within_budget():
+    payloads = [{'spec': 'x' * 400, 'height': DEFAULT_HEIGHT, 'extra': None} for _ in range(3)]
+    cache = FigureCache(budget_bytes=1000)
+    cache.put('a', payloads[0])
+    cache.put('b', payloads[1])
+    assert cache.get('a') is payloads[0]
+    cache.put('c', payloads[2])
+    assert cache.get('b') is None
+    assert cache.get('a') is payloads[0]
+    assert cache.stats()['bytes'] == 800
+    # Bütçeden büyük şekil saklanmaz, mevcut kayıtları da düşürmez
+    cache.put('d', {'spec': 'x' * 2000, 'height': DEFAULT_HEIGHT, 'extra': None})
+    assert cache.get('d') is None
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from core.forecasting import forecast_metrics, process_data
+
+
+def sales_frame(dtype):
+    dates = pd.date_range('2024-01-01', periods=60, freq='D')
+    sales = (100 + 10 * np.sin(np.arange(60))).round().astype(dtype)
+    # Karışık sıra ve okunamayan bir tarih: sıralanır, NaT satırı atılır
+    df = pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Sales': sales}).sample(frac=1, random_state=0)
+    df.iloc[5, 0] = 'not a date'
+    return df
+
+
+def test_process_data_integer_sales():
+    df = sales_frame(np.int64)
+    result = process_data(df)
+    assert len(result) == 59 - 7
+    assert result['Date'].is_monotonic_increasing
+    assert result['rolling_mean'].dtype == np.float64
+    assert not result.isna().any().any()
+    # Girdi değiştirilmez
+    assert not pd.api.types.is_datetime64_any_dtype(df['Date'])
+
+
+def test_process_data_float32_sales_stay_float32():
+    result = process_data(sales_frame(np.float32))
+    assert result['rolling_mean'].dtype == np.float32
+
+
+def test_forecast_metrics_are_plain_floats():
+    y_true = pd.Series([100.0, 110.0, 120.0, 130.0])
+    metrics = forecast_metrics(y_true, np.array([101.0, 108.0, 123.0, 129.0], dtype=np.float32))
+    assert all(type(value) is float for value in metrics.values())
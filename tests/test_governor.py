@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+import pytest
+from threadpoolctl import threadpool_info
+
+from core import governor
+from core.governor import CpuGovernor
+
+
+def native_limits():
+    return sorted((pool['filepath'], pool['num_threads']) for pool in threadpool_info())
+
+
+def run_overlapping(gov, n_tasks, hold=0.2):
+    # Görevler aynı anda çalışır; her birinin aldığı pay, gördüğü native sınır ve o anki toplam kaydedilir
+    shares, limits, peak = [], [], []
+    lock = threading.Lock()
+
+    def work():
+        with gov.task("test") as threads:
+            with lock:
+                shares.append(threads)
+                limits.append(native_limits())
+                peak.append(gov.snapshot()['active_threads'])
+            threading.Event().wait(hold)
+
+    workers = [threading.Thread(target=work) for _ in range(n_tasks)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    return shares, limits, peak
+
+
+def test_overlapping_tasks_stay_within_budget():
+    gov = CpuGovernor(budget=8, max_heavy=2)
+    # Yoğun dönem: yük ortalaması yüksekken gelen görevler bütçeyi paylaşır
+    gov.load = 2.0
+    shares, _, peak = run_overlapping(gov, 2)
+    assert shares == [4, 4]
+    assert max(peak) == 8
+    assert all(entry['concurrent'] <= 2 for entry in gov.recent())
+    assert gov.snapshot()['active_tasks'] == 0
+
+
+def test_task_waits_when_budget_is_used_up():
+    # İlk görev tüm bütçeyi aldıysa ikincisi bir iş parçacığıyla bütçeyi aşmak yerine bekler
+    gov = CpuGovernor(budget=8, max_heavy=2)
+    shares, _, peak = run_overlapping(gov, 3, hold=0.1)
+    assert len(shares) == 3
+    assert max(peak) <= gov.budget
+
+
+def test_tasks_do_not_change_native_pools():
+    # Çağrı başına paylar threadpoolctl ile süreç geneline yazılmaz; eşzamanlı oturumlar birbirini etkilemez
+    np.dot(np.ones((50, 50)), np.ones((50, 50)))
+    before = native_limits()
+    gov = CpuGovernor(budget=8, max_heavy=2)
+    _, limits, _ = run_overlapping(gov, 2)
+    assert all(seen == before for seen in limits)
+    assert native_limits() == before
+
+
+def test_extra_task_waits_for_a_slot():
+    gov = CpuGovernor(budget=4, max_heavy=1)
+    run_overlapping(gov, 3, hold=0.1)
+    history = gov.recent()
+    assert len(history) == 3
+    assert all(entry['concurrent'] == 1 for entry in history)
+    # En az iki görev bir öncekinin bitmesini beklemiş olmalı
+    assert sum(entry['wait_ms'] >= 50 for entry in history) >= 2
+
+
+def test_nested_task_reuses_outer_share():
+    gov = CpuGovernor(budget=4, max_heavy=1)
+    with gov.task("outer") as outer:
+        # max_heavy=1 iken yeni yuva istenseydi burada kilitlenirdi
+        with gov.task("inner") as inner:
+            assert inner == outer
+            assert gov.snapshot()['active_tasks'] == 1
+    assert [entry['task'] for entry in gov.recent()] == ["outer"]
+
+
+def test_configure_sets_native_limit_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(governor, '_limit_native_pools', calls.append)
+    monkeypatch.setattr(governor, '_governor', None)
+    gov = governor.configure(budget=6, max_heavy=3)
+    assert calls == [2]
+    with gov.task("a"), gov.task("b"):
+        pass
+    assert calls == [2]
+    assert gov.native_threads() == 2
+
+
+@pytest.fixture(autouse=True)
+def restore_governor():
+    saved = governor._governor
+    yield
+    governor._governor = saved
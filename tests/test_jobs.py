@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+from concurrent.futures import CancelledError, Future
+
+import pandas as pd
+import pytest
+
+from core import jobs
+from core.jobs import Job, JobExecutor, in_job, job_key, parallel_map, report_progress
+
+
+def double(df):
+    return df['x'].sum() * 2
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def wait_for(path, timeout=60):
+    # İlerleme bildirir, test dosyayı oluşturana kadar bekler
+    report_progress(0.5)
+    deadline = time.time() + timeout
+    while not os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.02)
+    return in_job(), os.getpid()
+
+
+def task_pid(_):
+    return os.getpid()
+
+
+def poll(job, timeout=120):
+    deadline = time.time() + timeout
+    while not job.done() and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.done()
+
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def test_job_key_depends_on_content_and_arguments():
+    df = pd.DataFrame({'x': [1, 2, 3]})
+    assert job_key(double, df) == job_key(double, df.copy())
+    assert job_key(double, df) != job_key(double, df.assign(x=[1, 2, 4]))
+    assert job_key(double, df, scale=1) != job_key(double, df, scale=2)
+
+
+def test_inline_job_result_and_reuse(executor):
+    df = pd.DataFrame({'x': [1, 2, 3]})
+    job = executor.submit(double, df, rows=len(df))
+    assert job.done() and not job.failed()
+    assert job.result() == 12 and job.progress == 1.0
+    assert executor.submit(double, df, rows=len(df)) is job
+
+
+def test_inline_failure_is_kept_until_retry(executor):
+    job = executor.submit(fail, "boom", rows=1)
+    assert job.failed()
+    assert isinstance(job.error, ValueError)
+    with pytest.raises(ValueError, match="boom"):
+        job.result()
+    # Başarısız iş her yeniden çalıştırmada tekrar başlatılmaz, sadece retry ile
+    assert executor.submit(fail, "boom", rows=1) is job
+    assert executor.submit(fail, "boom", rows=1, retry=True) is not job
+
+
+def test_cancelled_future_counts_as_failed():
+    future = Future()
+    future.cancel()
+    job = Job("key", future=future)
+    assert job.done() and job.failed()
+    assert isinstance(job.error, CancelledError)
+
+
+def test_pool_job_reports_progress_and_result(executor, tmp_path):
+    release = tmp_path / "release"
+    job = executor.submit(wait_for, str(release))
+    deadline = time.time() + 120
+    while job.progress < 0.5 and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.progress == 0.5 and not job.done()
+    release.touch()
+    poll(job)
+    inside_job, pid = job.result()
+    assert inside_job and pid != os.getpid()
+    assert job.progress == 1.0 and job.error is None
+
+
+def test_pool_job_failure(executor):
+    job = executor.submit(fail, "worker boom")
+    poll(job)
+    assert job.failed()
+    assert isinstance(job.error, ValueError) and "worker boom" in str(job.error)
+
+
+def test_pool_starts_all_workers_once_and_is_reused(executor):
+    main = sys.modules['__main__']
+    executor.submit(double, pd.DataFrame({'x': [1]}))
+    pool = executor._pool
+    assert len(pool._processes) == executor.max_workers
+    assert sys.modules['__main__'] is main
+    first = set(executor.map(task_pid, range(8)))
+    second = set(executor.map(task_pid, range(8)))
+    assert executor._pool is pool
+    assert first | second <= set(pool._processes)
+
+
+def test_parallel_map_runs_in_process_with_a_single_worker(monkeypatch):
+    monkeypatch.setattr(jobs, '_executor', JobExecutor(max_workers=1))
+    assert set(parallel_map(task_pid, range(4))) == {os.getpid()}
+    assert jobs._executor._pool is None
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from core.memory import downcast, downcast_table, lean_frame
+
+
+def listings(n=6):
+    return pd.DataFrame({
+        'District': ['Kadıköy', 'Beşiktaş', 'Üsküdar', 'Beşiktaş', 'Kadıköy', 'Şişli'][:n],
+        'Size': np.linspace(60.0, 160.0, n),
+        'Rooms': np.arange(1, n + 1, dtype=np.int64),
+        'Id': np.arange(n, dtype=np.int64) + 2**40,
+        'Note': ['a'] * n
+    })
+
+
+def test_downcast_frame():
+    df = downcast(listings())
+    assert df['Size'].dtype == np.float32
+    assert df['Rooms'].dtype == np.int32
+    # int32'ye sığmayan değerler korunur
+    assert df['Id'].dtype == np.int64
+    assert df['Id'].iloc[0] == 2**40
+    assert isinstance(df['District'].dtype, pd.CategoricalDtype)
+    assert list(df['District'].cat.categories) == sorted(df['District'].unique())
+    # Kategori listesinde olmayan metin sütunları değişmez
+    assert not isinstance(df['Note'].dtype, pd.CategoricalDtype)
+
+
+def test_downcast_table_matches_frame():
+    source = listings()
+    table = downcast_table(pa.Table.from_pandas(source, preserve_index=False))
+    assert table.schema.field('Size').type == pa.float32()
+    assert table.schema.field('Rooms').type == pa.int32()
+    assert table.schema.field('Id').type == pa.int64()
+    assert pa.types.is_dictionary(table.schema.field('District').type)
+    # Arrow yolu pandas'a çevrildikten sonra doğrudan daraltmayla aynı tipleri ve kategori sırasını verir
+    from_table = downcast(table.to_pandas())
+    expected = downcast(source.copy())
+    pd.testing.assert_frame_equal(from_table, expected)
+
+
+def test_downcast_empty_and_null_columns():
+    df = downcast(pd.DataFrame({'Rooms': pd.Series([], dtype=np.int64), 'Size': pd.Series([], dtype=float)}))
+    assert df['Rooms'].dtype == np.int64
+    assert df['Size'].dtype == np.float32
+    table = downcast_table(pa.table({'Rooms': pa.array([None, None], pa.int64())}))
+    assert table.schema.field('Rooms').type == pa.int32()
+
+
+def test_lean_frame_is_opt_in(monkeypatch):
+    monkeypatch.delenv("PORTFOLIO_LEAN_MEMORY", raising=False)
+    df = listings()
+    assert lean_frame(df)['Size'].dtype == np.float64
+    monkeypatch.setenv("PORTFOLIO_LEAN_MEMORY", "1")
+    assert lean_frame(listings())['Size'].dtype == np.float32
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from core import registry as registry_module
+from core.forecasting import generate_synthetic_data, process_data, train_forecast
+from core.governor import CpuGovernor
+from core.registry import ModelRegistry, UntrustedPathError, check_private
+
+
+def fitted_scaler():
+    return StandardScaler().fit(np.arange(20, dtype=float).reshape(10, 2))
+
+
+def test_registry_round_trip(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path / "models"))
+    registry.put("scaler", "k1", fitted_scaler(), rows=10)
+    fresh = ModelRegistry(root=registry.root)
+    model, meta = fresh.fetch("scaler", "k1")
+    assert meta['rows'] == 10
+    assert set(meta['libraries']) == {'scikit-learn', 'joblib'}
+    assert model.mean_ == pytest.approx([9.0, 10.0])
+    assert os.stat(registry.root).st_mode & 0o777 == 0o700
+
+
+def test_registry_refuses_writable_artifacts(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path / "models"))
+    registry.put("scaler", "k1", fitted_scaler())
+    path = os.path.join(registry.path("scaler", "k1"), "model.joblib")
+    os.chmod(path, 0o666)
+    with pytest.raises(UntrustedPathError):
+        check_private(path)
+    # Güvenilmeyen kayıt yüklenmez, yeniden eğitim için (None, None) döner
+    assert ModelRegistry(root=registry.root).fetch("scaler", "k1") == (None, None)
+
+
+def test_registry_metadata_does_not_import_model_libraries(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path / "models"))
+    registry.put("scaler", "k1", fitted_scaler())
+    code = (
+        "import sys; from core.registry import ModelRegistry; "
+        f"assert ModelRegistry(root={registry.root!r}).entries(); "
+        "print('sklearn' in sys.modules, 'xgboost' in sys.modules)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['False', 'False']
+
+
+def test_cached_forecast_model_is_not_mutated(tmp_path, monkeypatch):
+    # Kayıttaki örnek tüm oturumlarca paylaşılır; bir oturumun payı (n_jobs) ona yazılmamalı
+    monkeypatch.setattr(registry_module, '_registry', ModelRegistry(root=str(tmp_path / "models")))
+    monkeypatch.setenv("PORTFOLIO_MODEL_REGISTRY", "1")
+    df = process_data(generate_synthetic_data())
+    monkeypatch.setattr('core.governor._governor', CpuGovernor(budget=3, max_heavy=1))
+    first = train_forecast(df, n_estimators=20, cache=True)
+    (cached,) = registry_module.get_registry()._loaded.values()
+    assert cached is first['model']
+    assert cached.get_params()['n_jobs'] == 3
+
+    monkeypatch.setattr('core.governor._governor', CpuGovernor(budget=2, max_heavy=1))
+    second = train_forecast(df, n_estimators=20, cache=True)
+    assert second['model'] is not cached
+    assert second['model'].get_params()['n_jobs'] == 2
+    assert cached.get_params()['n_jobs'] == 3
+    assert second['predictions'] == pytest.approx(first['predictions'])
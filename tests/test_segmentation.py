@@ -0,0 +1,171 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.segmentation import (
+    KLLSketch, export_segments, fit_bgnbd, fit_gamma_gamma, segment_migration, segment_snapshot
+)
+
+SEGMENTS = ['Champions', 'Loyal', 'Potential', 'At Risk']
+
+
+def simulate_bgnbd(n, r, alpha, a, b, T, seed=0):
+    # Her müşteri: lambda ~ Gamma(r, alpha), p ~ Beta(a, b); her tekrar alımdan sonra p olasılıkla ayrılır
+    rng = np.random.default_rng(seed)
+    lam = rng.gamma(r, 1 / alpha, n)
+    p = rng.beta(a, b, n)
+    x = np.zeros(n)
+    t_x = np.zeros(n)
+    for i in range(n):
+        t = 0.0
+        while True:
+            t += rng.exponential(1 / lam[i])
+            if t > T:
+                break
+            x[i] += 1
+            t_x[i] = t
+            if rng.random() < p[i]:
+                break
+    return x, t_x, np.full(n, float(T))
+
+
+def test_bgnbd_recovers_parameters():
+    true = {'r': 0.25, 'alpha': 4.0, 'a': 0.8, 'b': 2.5}
+    x, t_x, T = simulate_bgnbd(20_000, T=40, **true)
+    params = fit_bgnbd(x, t_x, T)
+    for name, value in true.items():
+        assert params[name] == pytest.approx(value, rel=0.25), name
+
+
+def test_gamma_gamma_recovers_parameters():
+    rng = np.random.default_rng(1)
+    p, q, v = 6.0, 4.0, 15.0
+    n = 20_000
+    nu = rng.gamma(q, 1 / v, n)
+    x = rng.integers(1, 10, n).astype(float)
+    # x işlemin ortalaması: Gamma(p * x, nu * x)
+    m = rng.gamma(p * x, 1 / (nu * x))
+    params = fit_gamma_gamma(x, m)
+    assert params['p'] == pytest.approx(p, rel=0.15)
+    assert params['q'] == pytest.approx(q, rel=0.15)
+    assert params['v'] == pytest.approx(v, rel=0.2)
+
+
+def test_gamma_gamma_without_repeat_buyers():
+    x = np.zeros(50)
+    m = np.full(50, 20.0)
+    with pytest.raises(ValueError, match="repeat purchases"):
+        fit_gamma_gamma(x, m)
+
+
+def rank_error(sketch, values, qs):
+    estimates = sketch.quantile(qs)
+    ranks = np.searchsorted(np.sort(values), estimates, side='right') / len(values)
+    return np.abs(ranks - qs).max()
+
+
+def test_kll_rank_error():
+    values = np.random.default_rng(2).lognormal(3, 1, 200_000)
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+    assert sketch.count == len(values)
+    assert rank_error(sketch, values, np.linspace(0.01, 0.99, 99)) < 0.02
+    # Özet girdiye göre küçük kalmalı
+    assert sum(len(level) for level in sketch.levels) < 2_000
+
+
+def test_kll_merge_matches_single_stream():
+    values = np.random.default_rng(3).normal(size=100_000)
+    left, right = KLLSketch(k=200, seed=1), KLLSketch(k=200, seed=2)
+    left.update(values[:30_000])
+    right.update(values[30_000:])
+    merged = left.merge(right)
+    assert merged.count == len(values)
+    assert rank_error(merged, values, np.linspace(0.01, 0.99, 99)) < 0.02
+
+
+def test_kll_empty_sketch_returns_nan():
+    sketch = KLLSketch().update([np.nan, np.nan])
+    assert sketch.count == 0
+    assert np.isnan(sketch.quantile([0.2, 0.8])).all()
+    assert np.isnan(sketch.quantile(0.5))
+
+
+def test_segment_migration_empty_current_snapshot():
+    prev = segment_snapshot([1, 2, 3], ['Loyal', 'Champions', 'At Risk'], SEGMENTS)
+    curr = segment_snapshot([], [], SEGMENTS)
+    matrix, flows = segment_migration(prev, curr)
+    assert matrix.shape == (6, 6)
+    assert matrix.to_numpy().sum() == 0
+    assert flows.empty
+
+
+def test_segment_migration_counts():
+    prev = segment_snapshot([1, 2, 3, 4], ['Loyal', 'Champions', 'At Risk', 'Loyal'], SEGMENTS)
+    curr = segment_snapshot([2, 3, 4, 5], ['Champions', 'Loyal', 'Loyal', 'Potential'], SEGMENTS)
+    matrix, flows = segment_migration(prev, curr)
+    assert matrix.loc['Loyal', 'Lost'] == 1
+    assert matrix.loc['At Risk', 'Loyal'] == 1
+    assert matrix.loc['New', 'Potential'] == 1
+    assert flows.loc['Champions', 'Retained'] == 1
+    assert matrix.to_numpy().sum() == 5
+
+
+def test_segment_migration_unknown_segments_are_not_new():
+    # Önceki görüntüde listede olmayan segment (kod -1) yeni müşteri sayılmaz
+    prev = segment_snapshot([1, 2, 3], ['Loyal', 'Retired', 'Loyal'], SEGMENTS)
+    curr = segment_snapshot([1, 2, 3, 4], ['Loyal', 'Champions', 'Gone', 'Potential'], SEGMENTS)
+    matrix, flows = segment_migration(prev, curr)
+    assert matrix.loc['Unknown', 'Champions'] == 1
+    assert matrix.loc['Loyal', 'Unknown'] == 1
+    assert matrix.loc['New'].sum() == 1
+    assert matrix.loc['New', 'Potential'] == 1
+    assert flows.loc['Champions', 'Inflow'] == 1
+    assert flows.loc['Loyal', 'Outflow'] == 1
+
+
+def test_segment_migration_rejects_different_segment_lists():
+    prev = segment_snapshot([1], ['Loyal'], SEGMENTS)
+    curr = segment_snapshot([1], ['Loyal'], SEGMENTS[::-1])
+    with pytest.raises(ValueError, match="different segment lists"):
+        segment_migration(prev, curr)
+
+
+def test_export_segments_unknown_and_missing_segments(tmp_path):
+    n = 1_000
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({
+        'CustomerID': np.arange(n),
+        'Recency': rng.random(n), 'Frequency': rng.random(n), 'Monetary': rng.random(n),
+        # --clusters > 4: adı ve eylemi olmayan segmentler ve boş (NaN) segmentler
+        'Segment': rng.choice(['Champions', 'Loyal', 'Segment 5', 'Segment 6', None], n)
+    })
+    counts = export_segments(df, tmp_path, chunk_size=300)
+    assert sum(counts.values()) == df['Segment'].notna().sum()
+    assert counts == df['Segment'].value_counts().to_dict()
+    part = pd.read_parquet(tmp_path / 'Segment 5')
+    assert (part['Segment'] == 'Segment 5').all()
+    assert (part['Action'] == '').all()
+    assert part['CustomerID'].is_monotonic_increasing
+
+
+def test_export_segments_memory_is_bounded_by_chunk(tmp_path):
+    n = 1_000_000
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({
+        'CustomerID': np.arange(n),
+        'Recency': rng.random(n), 'Frequency': rng.random(n), 'Monetary': rng.random(n),
+        'Segment': pd.Categorical.from_codes(rng.integers(0, 4, n), SEGMENTS)
+    })
+    frame_bytes = df.memory_usage(deep=True).sum()
+    tracemalloc.start()
+    try:
+        export_segments(df, tmp_path, chunk_size=50_000)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Sütun seçimi tüm tabloyu kopyalasaydı tepe bellek en az tablo boyutu kadar olurdu
+    assert peak < frame_bytes / 2
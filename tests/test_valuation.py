@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.valuation import DistrictPriceIndex
+
+
+def test_index_add_matches_batch_statistics():
+    rng = np.random.default_rng(0)
+    districts = rng.choice(['Kadıköy', 'Beşiktaş', 'Üsküdar'], 1_000)
+    prices = rng.lognormal(15, 0.3, 1_000)
+    index = DistrictPriceIndex()
+    for district, price in zip(districts, prices):
+        assert index.add(district, price, ts=0)
+
+    expected = pd.DataFrame({'District': districts, 'Price': prices}).groupby('District')['Price'].agg(
+        ['size', 'mean', 'std'])
+    snapshot = index.snapshot().set_index('District')
+    assert snapshot['Count'].to_dict() == expected['size'].to_dict()
+    assert snapshot['Mean'].to_numpy() == pytest.approx(expected.loc[snapshot.index, 'mean'].to_numpy())
+    assert snapshot['Std'].to_numpy() == pytest.approx(expected.loc[snapshot.index, 'std'].to_numpy())
+    assert snapshot['Mean'].is_monotonic_increasing
+
+    batch = DistrictPriceIndex()
+    assert batch.update(districts, prices, timestamps=pd.to_datetime(np.zeros(1_000), unit='s')) == 1_000
+    pd.testing.assert_frame_equal(batch.snapshot(), index.snapshot())
+
+
+def test_index_window_expires_old_buckets():
+    index = DistrictPriceIndex(bucket_seconds=1, window=2)
+    index.add('A', 100, ts=0)
+    index.add('B', 300, ts=0)
+    index.add('A', 200, ts=1)
+    assert index.snapshot().set_index('District')['Count'].to_dict() == {'A': 2, 'B': 1}
+
+    # Kova 3 gelince 0 ve 1 pencere dışında kalır
+    index.add('A', 400, ts=3)
+    snapshot = index.snapshot()
+    assert snapshot['District'].tolist() == ['A']
+    assert snapshot['Mean'].iloc[0] == pytest.approx(400)
+
+    # Pencereden eski geç ilan sayılmaz; geçmiş ise tüm kovaları tutar
+    assert not index.add('B', 500, ts=0)
+    assert index.history()['Period'].nunique() == 3
+
+
+def test_index_update_skips_repeated_source():
+    index = DistrictPriceIndex()
+    assert index.update(['A', 'B'], [1.0, 2.0], source='batch-1') == 2
+    assert index.update(['A', 'B'], [1.0, 2.0], source='batch-1') == 0
+    assert int(index.snapshot()['Count'].sum()) == 2
+
+
+def test_index_copy_is_independent():
+    base = DistrictPriceIndex()
+    base.update(['A', 'A', 'B'], [1.0, 3.0, 5.0], timestamps=['2024-01-01'] * 3)
+    session = base.copy()
+    session.update(['A'], [10.0], timestamps=['2024-01-02'])
+    assert base.snapshot().set_index('District')['Count'].to_dict() == {'A': 2, 'B': 1}
+    assert session.snapshot().set_index('District')['Count'].to_dict() == {'A': 3, 'B': 1}
@@ -0,0 +1,84 @@
+import time
+import streamlit as st
+from core.jobs import submit_job
+from core.figures import get_figure_cache
+from core.profiling import stage, logger
+
+# Sayfalar arası ortak Streamlit yardımcıları
+
+POLL_SECONDS = 0.5
+# Doğrudan JSON yolunun denendiği Streamlit sürümleri (ana.alt); diğerlerinde genel API kullanılır
+DIRECT_CHART_VERSIONS = ("1.66",)
+
+
+def run_job(fn, *args, rows=None, lang='en', **kwargs):
+    # İşi gönderir (veya çalışan/bitmiş aynı işi bulur). Bitmemişse ilerleme çubuğu çizilir ve
+    # sayfa kısa bir beklemeden sonra yeniden çalıştırılır; bitmişse sonucu döner
+    job = submit_job(fn, *args, rows=rows, **kwargs)
+    if job.failed():
+        # Hata gösterilir ve sayfa durdurulur; iş sadece kullanıcı isterse yeniden başlatılır
+        st.error(("❌ Model training failed: " if lang == 'en' else "❌ Model eğitimi başarısız: ") + str(job.error))
+        if st.button("🔁 Retry" if lang == 'en' else "🔁 Tekrar Dene", key=f"retry_{job.key}"):
+            submit_job(fn, *args, rows=rows, retry=True, **kwargs)
+            st.rerun()
+        st.stop()
+    if job.done():
+        return job.result()
+    label = "Model arka planda eğitiliyor" if lang == 'tr' else "Training model in the background"
+    st.progress(job.progress, text=f"⏳ {label}… {job.progress:.0%} · {job.elapsed:.0f}s")
+    time.sleep(POLL_SECONDS)
+    st.rerun()
+
+
+def cached_plotly_chart(name, build, *inputs):
+    # Şekil sadece girdileri değiştiğinde kurulur ve serileştirilir; build()'in ek bilgisi döner
+    payload = get_figure_cache().payload(name, build, *inputs)
+    render_payload(payload)
+    return payload['extra']
+
+
+def render_payload(payload):
+    with stage("figure_render"):
+        plotly_json_chart(payload['spec'], payload['height'])
+
+
+def plotly_json_chart(spec, height):
+    # st.plotly_chart şekli her çağrıda yeniden doğrulayıp serileştirir; hazır JSON doğrudan
+    # aynı mesaj olarak gönderilir (genişlik 'stretch', seçim kapalı). Bu yol Streamlit'in iç
+    # yapısına dayanır: yalnızca denenmiş sürümlerde açıktır, herhangi bir hatada genel API'ye
+    # (JSON'dan şekil) dönülür ve süreç boyunca genel API kullanılır
+    global _direct_chart
+    if _direct_chart:
+        try:
+            _enqueue_plotly_json(spec, height)
+            return
+        except Exception as e:
+            _direct_chart = False
+            logger.warning("Direct Plotly JSON rendering disabled, using st.plotly_chart: %r", e)
+    import plotly.io
+    st.plotly_chart(plotly.io.from_json(spec), width='stretch')
+
+
+_direct_chart = ".".join(st.__version__.split(".")[:2]) in DIRECT_CHART_VERSIONS
+if not _direct_chart:
+    logger.info("Streamlit %s not in %s, using st.plotly_chart", st.__version__, DIRECT_CHART_VERSIONS)
+
+
+def _enqueue_plotly_json(spec, height):
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.layout_utils import LayoutConfig
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+
+    dg = st._main
+    proto = PlotlyChartProto()
+    proto.theme = "streamlit"
+    proto.form_id = current_form_id(dg)
+    proto.spec = spec
+    proto.config = "{}"
+    proto.id = compute_and_register_element_id(
+        "plotly_chart", user_key=None, key_as_main_identity=False, dg=dg,
+        plotly_spec=proto.spec, plotly_config=proto.config, selection_mode=("points", "box", "lasso"),
+        is_selection_activated=False, theme="streamlit", width="stretch", height=height, alt=None
+    )
+    dg._enqueue("plotly_chart", proto, layout_config=LayoutConfig(width="stretch", height=height))